@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import pickle
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import geopandas as gpd
+
+from pipeline_profiler import script_name, stage, start_run
+
+# --- 1. 사용자 설정 부분 ---
+GRID_GEOJSON_PATH = 'pre_data/2025_gj_wheat_grid_epsg_5179.geojson'  # 격자(구역) GeoJSON
+SAMPLE_DATA_PATH = 'pre_data/wheat_yeild_data.xlsx'  # 수확량/단백질 조사 엑셀
+GRID_KEY = 'code'  # 격자 쪽 조인 컬럼
+SAMPLE_KEY = 'soil_code'  # 조사 자료 쪽 조인 컬럼
+FIELD_COLUMN = 'field_code'  # 필드별로 나눌 기준 컬럼
+MERGED_OUTPUT_PATH = 'pre_data/wheat_grid_yield.geojson'  # 전체 결합 결과 (None이면 저장하지 않음)
+OUTPUT_FOLDER = 'geo_json_data'  # 필드별 GeoJSON 저장 폴더 (2.zonal_statistics.py의 입력 폴더)
+OUTPUT_FILENAME = 'wheat_yield_{code}.geojson'  # 필드별 파일 이름 형식
+WORKERS = os.cpu_count() or 4  # 필드별 GeoJSON을 동시에 저장할 스레드 수 (--workers 옵션으로 변경 가능)
+SAMPLE_CACHE_FILE = 'pre_data/.sample_data_cache.pkl'  # 읽은 엑셀 표를 자료형 그대로 저장하는 캐시 파일
+PROFILE_LOG_FILE = None  # 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
+# -------------------------
+
+SAMPLE_CACHE_VERSION = 1
+
+
+def load_sample_data(excel_path, cache_path=SAMPLE_CACHE_FILE):
+    """조사 엑셀을 읽는 함수 (엑셀의 크기/수정 시각이 같으면 캐시된 DataFrame을 바로 반환)
+
+    엑셀 파싱은 느리므로 한 번 읽은 표를 자료형(dtype)이 유지되는 pickle 파일로 저장해 두고,
+    엑셀이 바뀌었을 때만 다시 읽습니다.
+    """
+    stat = os.stat(excel_path)
+    fingerprint = (os.path.abspath(excel_path), stat.st_size, stat.st_mtime_ns)
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('version') == SAMPLE_CACHE_VERSION and cached.get('fingerprint') == fingerprint:
+                print(f"[캐시] 변경 사항이 없어 저장된 조사 자료를 사용합니다: {os.path.basename(excel_path)}")
+                return cached['frame']
+        except Exception as e:
+            print(f"[경고] 조사 자료 캐시를 읽을 수 없어 다시 만듭니다: {e}")
+
+    with stage('read_excel', excel_path):
+        frame = pd.read_excel(excel_path)
+
+    if cache_path:
+        cached = {
+            'version': SAMPLE_CACHE_VERSION,
+            'fingerprint': fingerprint,
+            'schema': {column: str(dtype) for column, dtype in frame.dtypes.items()},
+            'frame': frame,
+        }
+        tmp_path = cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"[경고] 조사 자료 캐시를 저장할 수 없습니다: {e}")
+    return frame
+
+
+def merge_grid_samples(grid_gdf, sample_df):
+    """격자와 조사 자료를 조인 컬럼으로 결합하고 조사 지점 코드 순으로 정렬하는 함수"""
+    merged = grid_gdf.merge(sample_df, left_on=GRID_KEY, right_on=SAMPLE_KEY, how='left')
+    merged = merged.sort_values(by=[SAMPLE_KEY], kind='stable').reset_index(drop=True)
+    return merged
+
+
+def split_by_field(merged_gdf):
+    """결합 결과를 필드 코드별 GeoDataFrame으로 한 번에 나누는 함수 ({필드 코드: GeoDataFrame})
+
+    필드마다 전체 표를 다시 걸러내지 않고 groupby 한 번으로 나누며, 필드 안의 행 순서는 유지합니다.
+    필드 코드가 없는 격자(조사 자료와 연결되지 않은 구역)는 제외됩니다.
+    """
+    return {code: part.reset_index(drop=True)
+            for code, part in merged_gdf.groupby(FIELD_COLUMN, sort=True)}
+
+
+def write_field_file(code, field_gdf, output_folder=OUTPUT_FOLDER):
+    """필드 하나의 GeoJSON 파일을 저장하고 경로를 반환하는 함수 (작업 스레드에서 실행)"""
+    output_path = os.path.join(output_folder, OUTPUT_FILENAME.format(code=code))
+    with stage('write_field', output_path, rows=len(field_gdf)):
+        field_gdf.to_file(output_path, driver='GeoJSON')
+    return output_path
+
+
+def write_field_files(parts, workers, output_folder=OUTPUT_FOLDER):
+    """필드별 GeoJSON 파일들을 스레드 풀로 동시에 저장하는 함수 (실패한 필드 수를 반환)"""
+    os.makedirs(output_folder, exist_ok=True)
+    failed = 0
+    # GDAL은 파일을 쓰는 동안 GIL을 놓으므로 스레드만으로도 여러 필드를 동시에 저장할 수 있습니다.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [(code, executor.submit(write_field_file, code, part, output_folder))
+                   for code, part in parts.items()]
+        for code, future in futures:
+            try:
+                output_path = future.result()
+                print(f"   [성공] {os.path.basename(output_path)} ({len(parts[code])}개 구역)")
+            except Exception as e:
+                print(f"   [오류] '{code}' 필드 저장 중 문제 발생: {e}")
+                failed += 1
+    return failed
+
+
+def main():
+    """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="격자 GeoJSON과 조사 엑셀을 결합해 필드별 GeoJSON으로 나누기")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="필드별 GeoJSON을 동시에 저장할 스레드 수 (기본값: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="조사 엑셀 캐시를 쓰지 않고 항상 엑셀을 다시 읽습니다.")
+    args = parser.parse_args()
+
+    print("필드별 GeoJSON 전처리 스크립트 실행 시작...")
+    start_time = time.perf_counter()
+
+    for path in (GRID_GEOJSON_PATH, SAMPLE_DATA_PATH):
+        if not os.path.exists(path):
+            print(f"[오류] 입력 파일이 없습니다: {path}")
+            return
+
+    # 1. 격자와 조사 자료 읽기 (엑셀은 바뀌지 않았으면 캐시에서 바로 읽음)
+    sample_df = load_sample_data(SAMPLE_DATA_PATH, None if args.no_cache else SAMPLE_CACHE_FILE)
+    with stage('read_grid', GRID_GEOJSON_PATH):
+        grid_gdf = gpd.read_file(GRID_GEOJSON_PATH)
+    print(f"격자 {len(grid_gdf)}개, 조사 자료 {len(sample_df)}행을 불러왔습니다.")
+
+    # 2. 조인 컬럼으로 결합
+    with stage('merge'):
+        merged = merge_grid_samples(grid_gdf, sample_df)
+    if MERGED_OUTPUT_PATH:
+        with stage('write_merged', MERGED_OUTPUT_PATH):
+            merged.to_file(MERGED_OUTPUT_PATH, driver='GeoJSON')
+        print(f"[성공] 전체 결합 결과 저장 완료: {MERGED_OUTPUT_PATH}")
+
+    # 3. groupby 한 번으로 필드별로 나눈 뒤 동시에 저장
+    with stage('split'):
+        parts = split_by_field(merged)
+    print(f"\n총 {len(parts)}개 필드를 최대 {args.workers}개씩 동시에 저장합니다...")
+    with stage('write_fields', fields=len(parts), workers=args.workers):
+        failed = write_field_files(parts, args.workers)
+
+    print(f"\n--- 모든 작업이 완료되었습니다. (소요 시간: {time.perf_counter() - start_time:.1f}초, 실패 {failed}개) ---")
+    print(f"결과물은 '{OUTPUT_FOLDER}' 폴더에 저장되었습니다.")
+
+
+if __name__ == '__main__':
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
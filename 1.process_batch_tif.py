@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import glob
+import json
+import argparse
+
+from class_statistics import ClassStatistics
+from pipeline_profiler import script_name, stage, start_run
+from raster_catalog import RasterStatsCatalog
+from raster_inventory import RasterInventory
+from raster_reader import iter_valid_values, read_decimated_values
 
 # --- 1. 사용자 설정 부분 ---
 QGIS_INSTALL_PATH = 'C:/Program Files/QGIS 3.40.10'  # 예시 경로
 INPUT_FOLDER = 'data'
 OUTPUT_FOLDER = 'result'
 OUTPUT_WIDTH_PX = 1200
+RASTER_EXTENSIONS = ('.tif', '.tiff')  # 렌더링할 래스터 확장자
+MEMORY_BUDGET_MB = 64  # 블록 단위로 읽을 때 한 번에 메모리에 올릴 최대 크기(MB)
+QUICK_LOOK_STATISTICS = False  # True면 전체 스캔 대신 OUTPUT_WIDTH_PX 해상도(오버뷰)에서 등급 통계를 근사 계산 (램프 최대값은 항상 정확한 값)
+RENDER_BACKEND = 'qgis'  # 'qgis' 또는 'numpy' (--backend 옵션으로 변경 가능, numpy는 QGIS 없이 동작)
+QGIS_BATCH_RENDER = False  # True면 하나의 QGIS 세션에서 여러 파일을 동시에 렌더링 (--batch)
+MAX_RENDER_JOBS = os.cpu_count() or 4  # --batch 모드에서 동시에 실행할 렌더링 작업 수
+STATS_CATALOG_FILE = 'raster_stats.sqlite'  # 파일별 최대값/등급 통계를 저장하는 래스터 통계 카탈로그(SQLite)
+VIRTUAL_WARP_CRS = None  # 예: 'EPSG:5179'면 numpy 방식에서 재투영 사본 없이 출력 해상도로 읽으며 즉석 재투영
+PROFILE_LOG_FILE = None  # 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
 # -------------------------
 
 # --- 식생 지수별 등급/색상/라벨 규칙집 ---
@@ -72,74 +88,64 @@ def setup_qgis_environment():
     print("QGIS 환경 설정 완료.")
 
 
-def print_class_statistics(provider, rules):
-    """래스터 데이터의 각 등급별 최소/최대/픽셀 수를 계산하고 출력하는 함수"""
-    print("   [분석] 각 등급별 통계 계산 시작...")
+def get_band_max(input_path, catalog):
+    """컬러 램프에 쓸 최대값을 카탈로그에서 가져오는 함수 (없거나 파일이 바뀌었으면 계산해 저장)
+
+    오버뷰 근사 최대값은 실제 최대값보다 작을 수 있어 램프 상단 색이 잘리므로
+    QUICK_LOOK_STATISTICS 설정과 관계없이 항상 전체 해상도의 정확한 최대값을 씁니다.
+    """
+    return catalog.statistics(input_path)['max']
+
+
+def compute_class_statistics(input_path, rules, quick_look=False):
+    """래스터 데이터의 등급별 통계 딕셔너리를 계산하는 함수"""
+    import rasterio
 
-    extent = provider.extent()
-    width = provider.xSize()
-    height = provider.ySize()
+    # 밴드를 블록 단위로 읽으며, 픽셀 단위 반복 대신 np.digitize/bincount로 분류합니다.
+    class_stats = ClassStatistics(rules)
+    with rasterio.open(input_path) as src:
+        if quick_look:
+            class_stats.update(read_decimated_values(src, 1, OUTPUT_WIDTH_PX))
+        else:
+            for values in iter_valid_values(src, 1, MEMORY_BUDGET_MB):
+                class_stats.update(values)
+    return class_stats.results()
 
-    class_pixels = {rule[2]: [] for rule in rules}
-    block = provider.block(1, extent, width, height)
 
-    # --- ★★★ 로직이 수정된 부분 ★★★ ---
-    # 5개의 등급 구간 경계값을 미리 변수로 지정합니다.
-    breaks = [r[0] for r in rules if isinstance(r[0], (int, float))]
+def print_class_statistics(input_path, rules, quick_look=False, catalog=None):
+    """래스터 데이터의 각 등급별 픽셀 수/최소/최대/평균을 계산하고 출력하는 함수
 
-    # 모든 픽셀을 하나씩 확인하며 if/elif/else로 명확하게 분류
-    for i in range(width * height):
-        value = block.value(i)
+    quick_look=True면 전체 해상도 대신 OUTPUT_WIDTH_PX 폭의 오버뷰에서 근사 통계를 계산합니다.
+    catalog가 있으면 같은 규칙집/방식으로 계산해 둔 결과를 먼저 조회하고, 없으면 계산해 저장합니다.
+    """
+    print(f"   [분석] 각 등급별 통계 계산 시작...{' (오버뷰 근사)' if quick_look else ''}")
 
-        if value <= breaks[0]:
-            class_pixels[rules[0][2]].append(value)
-        elif value <= breaks[1]:
-            class_pixels[rules[1][2]].append(value)
-        elif value <= breaks[2]:
-            class_pixels[rules[2][2]].append(value)
-        elif value <= breaks[3]:
-            class_pixels[rules[3][2]].append(value)
-        else:  # 나머지 모든 값 (마지막 등급)
-            class_pixels[rules[4][2]].append(value)
+    name = "class_stats:" + json.dumps([OUTPUT_WIDTH_PX if quick_look else None, rules])
+    results = catalog.lookup_extra(input_path, name) if catalog is not None else None
+    if results is None:
+        with stage('class_statistics', input_path, quick_look=quick_look):
+            results = compute_class_statistics(input_path, rules, quick_look)
+        if catalog is not None:
+            catalog.store_extra(input_path, name, results)
 
     # 분류된 픽셀들의 통계 출력
-    print("   -------------------------------------------------")
-    print("   | 범례 라벨         |  픽셀 수 |   최소값   |   최대값   |")
-    print("   -------------------------------------------------")
-    for label, pixels in class_pixels.items():
-        count = len(pixels)
+    print("   --------------------------------------------------------------")
+    print("   | 범례 라벨         |  픽셀 수 |   최소값   |   최대값   |   평균값   |")
+    print("   --------------------------------------------------------------")
+    for label, result in results.items():
+        count = result['count']
         if count > 0:
-            min_val = min(pixels)
-            max_val = max(pixels)
-            print(f"   | {label:<18}| {count:>8} | {min_val:>10.4f} | {max_val:>10.4f} |")
+            print(f"   | {label:<18}| {count:>8} | {result['min']:>10.4f} | {result['max']:>10.4f} "
+                  f"| {result['mean']:>10.4f} |")
         else:
             # nan 대신 '-'를 출력하여 더 깔끔하게 보여줍니다.
-            print(f"   | {label:<18}| {count:>8} |      -     |      -     |")
-    print("   -------------------------------------------------")
-
-def process_raster(input_path, output_path, rules):
-    """단일 GeoTIFF 파일을 처리하여 PNG로 저장하는 함수"""
-    from qgis.core import (QgsProject, QgsRasterLayer, QgsSingleBandPseudoColorRenderer,
-                           QgsColorRampShader, QgsRasterShader, QgsMapSettings,
-                           QgsMapRendererParallelJob, QgsRaster)
-    from PyQt5.QtCore import QSize, QEventLoop
-    from PyQt5.QtGui import QColor, QImage
-
-    print(f"-> 처리 시작: {os.path.basename(input_path)}")
-    project = QgsProject.instance()
-
-    raster_layer = QgsRasterLayer(input_path, os.path.basename(input_path))
-    if not raster_layer.isValid():
-        print(f"   [오류] 레이어를 불러올 수 없습니다. 건너<binary data, 2 bytes>니다.")
-        return
-
-    project.setCrs(raster_layer.crs())
-    project.addMapLayer(raster_layer)
+            print(f"   | {label:<18}| {count:>8} |      -     |      -     |      -     |")
+    print("   --------------------------------------------------------------")
 
-    provider = raster_layer.dataProvider()
-    # print_class_statistics(provider, rules)
-    stats = provider.bandStatistics(1)
-    max_value = stats.maximumValue
+def build_pseudocolor_renderer(provider, rules, max_value):
+    """규칙집으로 이산(Discrete) 컬러 램프 렌더러를 만드는 함수"""
+    from qgis.core import QgsSingleBandPseudoColorRenderer, QgsColorRampShader, QgsRasterShader
+    from PyQt5.QtGui import QColor
 
     # === ★★★ 변경된 부분: 새로운 규칙집으로 컬러맵 생성 ★★★ ===
     qgis_color_ramp_list = []
@@ -156,72 +162,235 @@ def process_raster(input_path, output_path, rules):
     color_ramp_shader.setColorRampItemList(qgis_color_ramp_list)
     raster_shader = QgsRasterShader()
     raster_shader.setRasterShaderFunction(color_ramp_shader)
-    renderer = QgsSingleBandPseudoColorRenderer(provider, 1, raster_shader)
-    raster_layer.setRenderer(renderer)
+    return QgsSingleBandPseudoColorRenderer(provider, 1, raster_shader)
+
+
+def build_map_settings(raster_layer):
+    """레이어 범위에 맞춰 OUTPUT_WIDTH_PX 폭의 렌더링 설정을 만드는 함수"""
+    from qgis.core import QgsMapSettings
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtGui import QColor
 
-    # 이미지 렌더링
     extent = raster_layer.extent()
     output_height = int(OUTPUT_WIDTH_PX * extent.height() / extent.width())
 
     settings = QgsMapSettings()
     settings.setLayers([raster_layer])
+    settings.setDestinationCrs(raster_layer.crs())
     settings.setExtent(extent)
     settings.setOutputSize(QSize(OUTPUT_WIDTH_PX, output_height))
     settings.setBackgroundColor(QColor(255, 255, 255, 0))
+    return settings
 
-    job = QgsMapRendererParallelJob(settings)
-    loop = QEventLoop()
-    job.finished.connect(loop.quit)
-    job.start()
-    loop.exec_()
 
-    image = job.renderedImage()
-    image.save(output_path, "png")
+def process_raster(input_path, output_path, rules, max_value=None, catalog=None):
+    """단일 GeoTIFF 파일을 처리하여 PNG로 저장하는 함수"""
+    from qgis.core import QgsProject, QgsRasterLayer, QgsMapRendererParallelJob
+    from PyQt5.QtCore import QEventLoop
+
+    print(f"-> 처리 시작: {os.path.basename(input_path)}")
+    project = QgsProject.instance()
+
+    raster_layer = QgsRasterLayer(input_path, os.path.basename(input_path))
+    if not raster_layer.isValid():
+        print(f"   [오류] 레이어를 불러올 수 없습니다. 건너<binary data, 2 bytes>니다.")
+        return
+
+    project.setCrs(raster_layer.crs())
+    project.addMapLayer(raster_layer)
+
+    provider = raster_layer.dataProvider()
+    print_class_statistics(input_path, rules, quick_look=QUICK_LOOK_STATISTICS, catalog=catalog)
+
+    if max_value is None:
+        stats = provider.bandStatistics(1)
+        max_value = stats.maximumValue
+
+    raster_layer.setRenderer(build_pseudocolor_renderer(provider, rules, max_value))
+
+    # 이미지 렌더링
+    settings = build_map_settings(raster_layer)
+
+    with stage('render', input_path):
+        job = QgsMapRendererParallelJob(settings)
+        loop = QEventLoop()
+        job.finished.connect(loop.quit)
+        job.start()
+        loop.exec_()
+
+    with stage('save', input_path):
+        image = job.renderedImage()
+        image.save(output_path, "png")
 
     print(f"   [성공] PNG 파일 저장 완료: {os.path.basename(output_path)}")
     project.removeMapLayer(raster_layer.id())
 
 
+def render_batch_qgis(tasks, max_values, max_jobs):
+    """여러 래스터를 하나의 QGIS 세션에서 동시에 렌더링하는 함수
+
+    tasks: [(입력 경로, 출력 경로, 규칙집, 지수 이름), ...]
+    지수 종류별로 렌더러 템플릿을 한 번만 만들어 복제해 쓰고, 최대 max_jobs개의
+    QgsMapRendererParallelJob을 동시에 실행하며 하나의 이벤트 루프에서 완료를 기다립니다.
+    템플릿의 'max' 경계값은 같은 지수 파일들의 캐시된 최대값 중 가장 큰 값을 사용하므로,
+    파일별 렌더러를 만들 때와 같은 색으로 칠해집니다.
+    """
+    from qgis.core import QgsRasterLayer, QgsMapRendererParallelJob
+    from PyQt5.QtCore import QEventLoop
+
+    index_max = {}
+    for input_path, _, _, index_name in tasks:
+        value = max_values.get(input_path)
+        if value is not None:
+            index_max[index_name] = max(index_max.get(index_name, value), value)
+
+    templates = {}
+    pending = list(tasks)
+    running = {}
+    loop = QEventLoop()
+
+    def start_next():
+        while pending and len(running) < max_jobs:
+            input_path, output_path, rules, index_name = pending.pop(0)
+            raster_layer = QgsRasterLayer(input_path, os.path.basename(input_path))
+            if not raster_layer.isValid():
+                print(f"   [오류] '{os.path.basename(input_path)}' 레이어를 불러올 수 없습니다. 건너<binary data, 2 bytes>니다.")
+                continue
+
+            provider = raster_layer.dataProvider()
+            if index_name not in templates:
+                max_value = index_max.get(index_name)
+                if max_value is None:
+                    max_value = provider.bandStatistics(1).maximumValue
+                templates[index_name] = build_pseudocolor_renderer(provider, rules, max_value)
+            raster_layer.setRenderer(templates[index_name].clone())
+
+            job = QgsMapRendererParallelJob(build_map_settings(raster_layer))
+            # 렌더링이 끝날 때까지 레이어와 작업 객체가 해제되지 않도록 참조를 보관합니다.
+            running[id(job)] = (job, raster_layer, output_path)
+            job.finished.connect(lambda job_id=id(job): on_finished(job_id))
+            job.start()
+
+        if not pending and not running:
+            loop.quit()
+
+    def on_finished(job_id):
+        job, _, output_path = running.pop(job_id)
+        job.renderedImage().save(output_path, "png")
+        print(f"   [성공] PNG 파일 저장 완료: {os.path.basename(output_path)}")
+        start_next()
+
+    start_next()
+    if running:
+        loop.exec_()
+
+
+def process_raster_numpy(input_path, output_path, rules, max_value=None, catalog=None):
+    """QGIS 없이 NumPy/Pillow로 단일 GeoTIFF 파일을 PNG로 저장하는 함수"""
+    from numpy_renderer import render_raster_png
+
+    print(f"-> 처리 시작: {os.path.basename(input_path)}")
+    print_class_statistics(input_path, rules, quick_look=QUICK_LOOK_STATISTICS, catalog=catalog)
+
+    with stage('render', input_path):
+        width, height = render_raster_png(input_path, output_path, rules, OUTPUT_WIDTH_PX, VIRTUAL_WARP_CRS)
+    print(f"   [성공] PNG 파일 저장 완료: {os.path.basename(output_path)} ({width}x{height})")
+
+
+def find_rule(file_path, index_name=None):
+    """파일 이름에 포함된 지수 이름으로 규칙집을 찾는 함수 (없으면 (None, None))
+
+    인벤토리에서 파싱한 지수 이름(index_name)이 있으면 규칙집에서 바로 찾고,
+    형식이 다른 파일 이름만 기존처럼 부분 문자열로 비교합니다.
+    """
+    if index_name and index_name.upper() in CLASSIFICATION_MAP:
+        return index_name.upper(), CLASSIFICATION_MAP[index_name.upper()]
+
+    filename = os.path.basename(file_path).upper()
+    # 규칙집의 키를 순회하며 파일 이름과 일치하는 규칙을 찾음
+    for index_name, rules in CLASSIFICATION_MAP.items():
+        if index_name in filename:
+            return index_name, rules
+    return None, None
+
+
 def main():
     """메인 실행 함수"""
-    setup_qgis_environment()
-    from qgis.core import QgsApplication
-
-    qgs = QgsApplication([], False)
-    qgs.initQgis()
+    parser = argparse.ArgumentParser(description="식생 지수 GeoTIFF 일괄 PNG 변환")
+    parser.add_argument('--backend', choices=['qgis', 'numpy'], default=RENDER_BACKEND,
+                        help="렌더링 방식 (qgis: QGIS 렌더러, numpy: QGIS 없이 NumPy/Pillow로 렌더링)")
+    parser.add_argument('--batch', action='store_true', default=QGIS_BATCH_RENDER,
+                        help="qgis 방식에서 여러 파일을 하나의 세션에서 동시에 렌더링합니다.")
+    parser.add_argument('--max-jobs', type=int, default=MAX_RENDER_JOBS,
+                        help="--batch 모드에서 동시에 실행할 렌더링 작업 수 (기본값: %(default)s)")
+    args = parser.parse_args()
+
+    qgs = None
+    if args.backend == 'qgis':
+        setup_qgis_environment()
+        from qgis.core import QgsApplication
+
+        with stage('qgis_init'):
+            qgs = QgsApplication([], False)
+            qgs.initQgis()
+        render = process_raster
+    else:
+        print("NumPy 렌더러를 사용합니다. (QGIS 불필요)")
+        render = process_raster_numpy
 
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
 
-    search_path = os.path.join(INPUT_FOLDER, '*.tif')
-    raster_files = glob.glob(search_path) + glob.glob(os.path.join(INPUT_FOLDER, '*.tiff'))
+    # 입력 폴더는 인벤토리로 한 번만 훑습니다. (바뀌지 않은 파일은 이전 기록을 재사용)
+    with stage('inventory'):
+        inventory = RasterInventory.open(INPUT_FOLDER, extensions=RASTER_EXTENSIONS)
+    raster_files = inventory.all_paths()
 
     if not raster_files:
         print(f"입력 폴더에 .tif 또는 .tiff 파일이 없습니다: {INPUT_FOLDER}")
-        qgs.exitQgis()
+        if qgs is not None:
+            qgs.exitQgis()
         return
 
     print(f"\n총 {len(raster_files)}개의 파일을 처리합니다...")
 
+    catalog = RasterStatsCatalog(STATS_CATALOG_FILE, MEMORY_BUDGET_MB)
+    tasks = []
+    max_values = {}
     for file_path in raster_files:
-        filename = os.path.basename(file_path).upper()
-
-        found_rule = False
-        # 규칙집의 키를 순회하며 파일 이름과 일치하는 규칙을 찾음
-        for index_name, rules in CLASSIFICATION_MAP.items():
-            if index_name in filename:
-                base_name = os.path.splitext(os.path.basename(file_path))[0]
-                output_path = os.path.join(OUTPUT_FOLDER, f"{base_name}.png")
-                process_raster(file_path, output_path, rules)
-                found_rule = True
-                break
-
-        if not found_rule:
+        info = inventory.info(file_path)
+        index_name, rules = find_rule(file_path, info['index'] if info else None)
+        if rules is None:
             print(f"-> '{os.path.basename(file_path)}' 파일에 해당하는 규칙을 찾을 수 없어 건너<binary data, 2 bytes>니다.")
+            continue
+
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        output_path = os.path.join(OUTPUT_FOLDER, f"{base_name}.png")
+        # 컬러 램프의 최대값은 통계 카탈로그에서 가져오므로 매번 전체 밴드를 스캔하지 않습니다.
+        if args.backend == 'qgis':
+            with stage('band_max', file_path):
+                max_values[file_path] = get_band_max(file_path, catalog)
+
+        if args.backend == 'qgis' and args.batch:
+            print(f"-> 처리 시작: {os.path.basename(file_path)}")
+            print_class_statistics(file_path, rules, quick_look=QUICK_LOOK_STATISTICS, catalog=catalog)
+            tasks.append((file_path, output_path, rules, index_name))
+        else:
+            with stage('process_file', file_path, backend=args.backend):
+                render(file_path, output_path, rules, max_values.get(file_path), catalog)
 
-    qgs.exitQgis()
+    catalog.close()
+
+    if tasks:
+        print(f"\n{len(tasks)}개의 파일을 최대 {args.max_jobs}개씩 동시에 렌더링합니다...")
+        with stage('batch_render', tasks=len(tasks), max_jobs=args.max_jobs):
+            render_batch_qgis(tasks, max_values, args.max_jobs)
+
+    if qgs is not None:
+        qgs.exitQgis()
     print("\n모든 작업이 완료되었습니다.")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
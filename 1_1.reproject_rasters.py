@@ -1,22 +1,177 @@
 # -*- coding: utf-8 -*-
 import os
 import glob
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import rasterio
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 from rasterio.crs import CRS
 import shutil
 
+from pipeline_profiler import script_name, stage, start_run
+from raster_writer import build_overviews, is_cog_layout, tiled_profile, write_cog
+from reproject_cache import ReprojectCache
+
 # --- 1. 사용자 설정 부분 ---
 INPUT_RASTER_FOLDER = 'drone_data'  ## 원본 데이터 저장 폴더
 OUTPUT_RASTER_FOLDER = 'drone_data_reprojected_5179'  ## 변환된 데이터 저장 폴더
 
 TARGET_CRS_STRING = 'EPSG:5179'  ## 변환원하는 자표계
+MEMORY_BUDGET_MB = 64  ## 재투영 시 GDAL이 한 번에 사용할 최대 작업 메모리(MB)
+
+## 재투영 캐시 설정 (None이면 제한 없음)
+RESAMPLING = 'nearest'  ## 리샘플링 방법 (rasterio Resampling 이름)
+TARGET_RESOLUTION = None  ## 목표 해상도(m), None이면 원본에서 자동 계산
+CACHE_MAX_SIZE_GB = None  ## 캐시된 결과 전체 용량 한도(GB)
+CACHE_MAX_AGE_DAYS = None  ## 마지막 사용 후 보관 기간(일)
+
+## 병렬 재투영/출력 형식 설정 (--workers, --threads 옵션으로 변경 가능)
+WORKERS = 1  ## 동시에 처리할 파일 수
+WARP_THREADS = 1  ## 파일당 GDAL 워프 스레드 수
+TILED_OUTPUT = False  ## True면 순차 모드에서도 타일/압축/오버뷰 GeoTIFF로 저장
+COG_OUTPUT = False  ## True면 Cloud-Optimized GeoTIFF로 저장 (--cog 옵션으로도 지정 가능)
+TILE_SIZE = 512  ## 내부 타일 크기(픽셀)
+COMPRESSION = 'DEFLATE'  ## 타일 압축 방식 ('ZSTD' 가능)
+OVERVIEW_FACTORS = [2, 4, 8, 16, 32]  ## 오버뷰 축소 배율
+PROFILE_LOG_FILE = None  ## 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
 
 
 # -------------------------
 
+def is_same_crs(source_crs, target_crs):
+    """원본 CRS가 목표 CRS와 같은지 확인하는 함수"""
+    if not source_crs:
+        return False
+    if source_crs == target_crs:
+        return True
+    # WKT 표현이 달라도 같은 EPSG 코드로 식별되면 같은 좌표계로 봅니다.
+    source_epsg = source_crs.to_epsg()
+    return source_epsg is not None and source_epsg == target_crs.to_epsg()
+
+
+def reproject_raster(src, output_path, target_crs, num_threads=1, tiled=False, overviews=True):
+    """열린 원본 래스터를 목표 CRS로 재투영하여 저장하는 함수
+
+    num_threads > 1이면 GDAL 워프를 여러 스레드로 실행하고,
+    tiled=True면 내부 타일/압축 GeoTIFF로 저장한 뒤 오버뷰를 만듭니다 (overviews=False면 생략).
+    """
+    transform, width, height = calculate_default_transform(
+        src.crs, target_crs, src.width, src.height, *src.bounds, resolution=TARGET_RESOLUTION)
+
+    kwargs = src.meta.copy()
+    kwargs.update({
+        'crs': target_crs,
+        'transform': transform,
+        'width': width,
+        'height': height
+    })
+    if tiled:
+        kwargs.update(tiled_profile(src.dtypes[0], TILE_SIZE, COMPRESSION, num_threads))
+
+    # 밴드 전체를 메모리에 올리지 않도록 GDAL이 청크 단위로 재투영하게 합니다.
+    with rasterio.open(output_path, 'w', **kwargs) as dst:
+        for i in range(1, src.count + 1):
+            reproject(
+                source=rasterio.band(src, i),
+                destination=rasterio.band(dst, i),
+                src_transform=src.transform,
+                src_crs=src.crs,
+                dst_transform=transform,
+                dst_crs=target_crs,
+                resampling=Resampling[RESAMPLING],
+                num_threads=num_threads,
+                warp_mem_limit=MEMORY_BUDGET_MB)
+
+        if tiled and overviews:
+            build_overviews(dst, OVERVIEW_FACTORS)
+
+
+def reproject_file(raster_path, output_path, target_crs, num_threads=1, tiled=False, cog=False,
+                   stage_name='reproject'):
+    """파일 하나를 확인/재투영하고 (처리 결과, 소요 시간, 픽셀 수)를 반환하는 함수 (작업 스레드에서 실행)
+
+    처리 결과: 'reprojected'(재투영), 'cog'(좌표계는 같고 COG로만 변환), 'skipped'(건너뜀)
+    stage_name: 프로파일 이벤트에 남길 단계 이름 (비교용 측정은 따로 집계)
+    """
+    start_time = time.perf_counter()
+    with rasterio.open(raster_path) as src:
+        pixel_count = src.width * src.height * src.count
+        if is_same_crs(src.crs, target_crs):
+            if not cog:
+                return 'skipped', time.perf_counter() - start_time, 0
+            # 좌표계가 같아도 COG 모드에서는 출력 폴더에 COG 사본을 만들어 모든 결과를 같은 형식으로 맞춥니다.
+            # 원본이 이미 타일 + 오버뷰 구조면 다시 인코딩하지 않고 그대로 복사합니다.
+            if is_cog_layout(raster_path):
+                with stage('copy_cog', raster_path, pixels=pixel_count):
+                    shutil.copy2(raster_path, output_path)
+                return 'cog', time.perf_counter() - start_time, pixel_count
+            with stage('write_cog', raster_path, pixels=pixel_count):
+                write_cog(raster_path, output_path, COMPRESSION, TILE_SIZE, num_threads=num_threads)
+            return 'cog', time.perf_counter() - start_time, pixel_count
+
+        if cog:
+            # 타일 GeoTIFF로 먼저 재투영한 뒤, COG 드라이버로 오버뷰와 배치를 정리합니다.
+            tmp_path = output_path + '.warp.tmp.tif'
+            try:
+                with stage(stage_name, raster_path, pixels=pixel_count, threads=num_threads):
+                    reproject_raster(src, tmp_path, target_crs, num_threads, tiled=True, overviews=False)
+                with stage('write_cog', raster_path, pixels=pixel_count):
+                    write_cog(tmp_path, output_path, COMPRESSION, TILE_SIZE, num_threads=num_threads)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        else:
+            with stage(stage_name, raster_path, pixels=pixel_count, threads=num_threads):
+                reproject_raster(src, output_path, target_crs, num_threads, tiled)
+    return 'reprojected', time.perf_counter() - start_time, pixel_count
+
+
+def time_legacy_reprojection(raster_path, target_crs):
+    """비교용으로 기존 방식(단일 스레드, 밴드별, 비타일)의 소요 시간을 측정하는 함수"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = os.path.join(tmp_dir, os.path.basename(raster_path))
+        _, elapsed, _ = reproject_file(raster_path, tmp_path, target_crs, stage_name='legacy_reproject')
+    return elapsed
+
+
+def print_timing_report(timings, wall_time, legacy_wall_time=None):
+    """파일별 소요 시간 보고서를 출력하는 함수"""
+    print("\n   [보고] 파일별 재투영 소요 시간")
+    print("   -------------------------------------------------------------------------")
+    print("   | 파일명                         | 소요 시간(s) | 처리량(Mpx/s) | 기존 방식(s) | 속도 향상 |")
+    print("   -------------------------------------------------------------------------")
+    for filename, (elapsed, pixel_count, legacy_elapsed) in sorted(timings.items()):
+        throughput = pixel_count / elapsed / 1e6 if elapsed > 0 else 0.0
+        if legacy_elapsed is not None and elapsed > 0:
+            print(f"   | {filename:<30} | {elapsed:>12.2f} | {throughput:>13.2f} "
+                  f"| {legacy_elapsed:>12.2f} | {legacy_elapsed / elapsed:>8.2f}x |")
+        else:
+            print(f"   | {filename:<30} | {elapsed:>12.2f} | {throughput:>13.2f} |            - |         - |")
+    print("   -------------------------------------------------------------------------")
+    print(f"   전체 경과 시간: {wall_time:.2f}s")
+    if legacy_wall_time:
+        print(f"   기존 방식 전체 시간: {legacy_wall_time:.2f}s (속도 향상 {legacy_wall_time / wall_time:.2f}x)")
+
+
 def main():
     """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="래스터 좌표계 일괄 변환")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="동시에 처리할 파일 수 (기본값: %(default)s)")
+    parser.add_argument('--threads', type=int, default=WARP_THREADS,
+                        help="파일 하나를 재투영할 때 사용할 GDAL 워프 스레드 수 (기본값: %(default)s)")
+    parser.add_argument('--cog', action='store_true', default=COG_OUTPUT,
+                        help="결과를 Cloud-Optimized GeoTIFF(타일 + 압축 + 오버뷰)로 저장합니다.")
+    parser.add_argument('--compare', action='store_true',
+                        help="기존 방식(단일 스레드, 비타일)으로도 변환해 파일별 속도 향상을 보고합니다.")
+    args = parser.parse_args()
+
+    # 병렬 모드에서는 이후 단계의 윈도우 읽기가 싸지도록 타일/압축/오버뷰 GeoTIFF로 저장합니다.
+    parallel_mode = args.workers > 1 or args.threads > 1
+    tiled = TILED_OUTPUT or parallel_mode or args.cog
+
     print("래스터 좌표계 변환 스크립트 실행 시작...")
 
     if not os.path.exists(OUTPUT_RASTER_FOLDER):
@@ -30,59 +185,79 @@ def main():
         return
 
     print(f"\n총 {len(raster_files)}개의 파일을 확인합니다.")
+    if parallel_mode:
+        print(f"[병렬 모드] 파일 {args.workers}개 동시 처리, 파일당 워프 스레드 {args.threads}개")
 
-    # 목표 CRS의 코드(숫자) 부분만 문자열로 추출
-    target_epsg_code_str = TARGET_CRS_STRING.split(':')[-1]
+    target_crs_object = CRS.from_string(TARGET_CRS_STRING)
+    cache = ReprojectCache(OUTPUT_RASTER_FOLDER, max_size_gb=CACHE_MAX_SIZE_GB, max_age_days=CACHE_MAX_AGE_DAYS)
+    profile_key = {'tiled': tiled, 'cog': args.cog, 'tile_size': TILE_SIZE, 'compress': COMPRESSION} if tiled else None
 
+    # 캐시에 없는 파일만 작업 목록에 넣습니다.
+    pending = []
     for raster_path in raster_files:
         filename = os.path.basename(raster_path)
         output_path = os.path.join(OUTPUT_RASTER_FOLDER, filename)
 
-        with rasterio.open(raster_path) as src:
-            source_crs = src.crs
-            is_target_crs = False
-
-            # === ★★★ 최종 수정된 부분: 단순하고 강력한 문자열 검색 ★★★ ===
-            if source_crs:
-                source_wkt = source_crs.to_wkt()
-                # WKT 문자열 안에 'EPSG'와 목표 코드('5179')가 모두 있는지 확인
-                if 'EPSG' in source_wkt and target_epsg_code_str in source_wkt:
-                    is_target_crs = True
-
-            print(f"-> 확인 중: {filename} (목표 CRS와 동일한가? {is_target_crs})")
-
-            if not is_target_crs:
-                print(f"   [변환 필요] 좌표계를 {TARGET_CRS_STRING}로 재투영합니다...")
-
-                target_crs_object = CRS.from_string(TARGET_CRS_STRING)
-                transform, width, height = calculate_default_transform(
-                    source_crs, target_crs_object, src.width, src.height, *src.bounds)
-
-                kwargs = src.meta.copy()
-                kwargs.update({
-                    'crs': target_crs_object,
-                    'transform': transform,
-                    'width': width,
-                    'height': height
-                })
-
-                with rasterio.open(output_path, 'w', **kwargs) as dst:
-                    for i in range(1, src.count + 1):
-                        reproject(
-                            source=rasterio.band(src, i),
-                            destination=rasterio.band(dst, i),
-                            src_transform=src.transform,
-                            src_crs=src.crs,
-                            dst_transform=transform,
-                            dst_crs=target_crs_object,
-                            resampling=Resampling.nearest)
-                print(f"   [성공] 변환된 파일 저장 완료: {filename}")
+        # 원본 내용과 변환 조건이 같고 결과 파일이 그대로 있으면 다시 변환하지 않습니다.
+        with stage('cache_check', raster_path):
+            cache_key = cache.make_key(cache.source_hash(raster_path), TARGET_CRS_STRING, RESAMPLING,
+                                       TARGET_RESOLUTION, profile_key)
+        if cache.lookup(cache_key, output_path):
+            print(f"-> [캐시] 변경 사항이 없어 건너뜁니다: {filename}")
+            continue
+        pending.append((raster_path, output_path, cache_key))
+
+    legacy_times = {}
+    legacy_wall_time = None
+    if args.compare and pending:
+        print("\n[비교] 기존 방식으로 소요 시간을 측정합니다...")
+        legacy_start = time.perf_counter()
+        for raster_path, _, _ in pending:
+            legacy_times[os.path.basename(raster_path)] = time_legacy_reprojection(raster_path, target_crs_object)
+        legacy_wall_time = time.perf_counter() - legacy_start
+
+    timings = {}
+    wall_start = time.perf_counter()
+    # GDAL은 워프/압축 중 GIL을 놓으므로 스레드 풀로도 여러 파일을 동시에 처리할 수 있습니다.
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(reproject_file, raster_path, output_path, target_crs_object,
+                                   args.threads, tiled, args.cog): (raster_path, output_path, cache_key)
+                   for raster_path, output_path, cache_key in pending}
+
+        for future in as_completed(futures):
+            raster_path, output_path, cache_key = futures[future]
+            filename = os.path.basename(raster_path)
+            try:
+                status, elapsed, pixel_count = future.result()
+            except Exception as e:
+                print(f"-> [오류] '{filename}' 처리 중 문제 발생: {e}")
+                continue
+
+            print(f"-> 확인 완료: {filename} (목표 CRS와 동일한가? {status != 'reprojected'})")
+            if status != 'skipped':
+                cache.store(cache_key, raster_path, output_path,
+                            {'target_crs': TARGET_CRS_STRING, 'resampling': RESAMPLING,
+                             'resolution': TARGET_RESOLUTION, 'profile': profile_key})
+                timings[filename] = (elapsed, pixel_count, legacy_times.get(filename))
+                if status == 'cog':
+                    print(f"   [성공] COG 형식으로 저장 완료: {filename} ({elapsed:.2f}s)")
+                else:
+                    print(f"   [성공] 변환된 파일 저장 완료: {filename} ({elapsed:.2f}s)")
             else:
                 print("   [통과] 좌표계가 이미 올바릅니다. 파일을 건너뜁니다.")
                 # shutil.copy(raster_path, output_path)
+    wall_time = time.perf_counter() - wall_start
+
+    if timings:
+        print_timing_report(timings, wall_time, legacy_wall_time)
+
+    removed = cache.evict()
+    if removed:
+        print(f"\n[캐시] 용량/기간 한도를 넘은 {len(removed)}개의 결과 파일을 삭제했습니다.")
 
     print("\n--- 모든 래스터 파일 처리가 완료되었습니다. ---")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
@@ -2,92 +2,483 @@
 import os
 import sys
 import glob
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import geopandas as gpd
 import rasterio  # rasterio.Env를 사용하기 위해 import
-from rasterstats import zonal_stats
+
+from band_stack import ensure_band_stack
+from pipeline_profiler import script_name, stage, start_run
+from raster_footprint import RasterFootprintIndex, select_field_rasters
+from raster_inventory import RasterInventory, parse_raster_name
+from reproject_cache import file_content_hash
+from result_store import remove_orphan_partitions, write_field_partitions
+from virtual_warp import open_raster, shared_tile_cache
+from zonal_engine import ZoneSet, clear_zone_label_cache, zonal_statistics, zonal_statistics_bands
 
 # --- 1. 사용자 설정 부분 ---
 GEOJSON_FOLDER = 'geo_json_data'
 RASTER_FOLDER = 'drone_data'
 OUTPUT_FOLDER = 'result_geojson'
+MEMORY_BUDGET_MB = 64  # 블록 단위로 읽을 때 한 번에 메모리에 올릴 최대 크기(MB)
+WORKERS = 1  # 병렬 처리 프로세스 수 (1이면 순차 처리, --workers 옵션으로 변경 가능)
+RESULT_DATASET_FOLDER = 'result_parquet'  # field_code/session으로 나눈 GeoParquet 결과 폴더
+WRITE_PARQUET_DATASET = True  # True면 GeoJSON과 함께 GeoParquet 결과도 저장
+INCREMENTAL = False  # True면 새로 추가되거나 변경된 래스터만 계산 (--incremental 옵션으로도 지정 가능)
+FINGERPRINT_MODE = 'stat'  # 래스터 변경 판단 방식: 'stat'(크기+수정 시각) 또는 'hash'(내용 해시, 느리지만 확실)
+ZONAL_MANIFEST_FILE = os.path.join(OUTPUT_FOLDER, '.zonal_manifest.json')  # (필드, 래스터) 지문 기록 파일
+USE_BAND_STACK = False  # True면 같은 회차의 지수 래스터들을 다중 밴드 스택으로 묶어 한 번에 계산 (--stack)
+STACK_FOLDER = 'band_stack'  # (필드, 회차)별 다중 밴드 스택 저장 폴더
+VIRTUAL_WARP_CRS = None  # 예: 'EPSG:5179'면 재투영 사본(1_1 단계) 없이 원본을 읽으면서 필요한 윈도우만 즉석 재투영
+WARP_RESAMPLING = 'nearest'  # 즉석 재투영 리샘플링 방법 (1_1.reproject_rasters.py의 RESAMPLING과 같게)
+WARP_TILE_CACHE_FOLDER = None  # 예: '.warp_tile_cache'면 재투영한 윈도우를 디스크에 보관해 재실행 시 재사용
+WARP_TILE_CACHE_MB = 256  # 재투영 타일 캐시 전체 용량 한도(MB)
+RASTER_MATCH = 'name'  # 필드와 래스터 연결 방식: 'name'(파일 이름의 필드명) 또는 'footprint'(래스터 범위와 구역이 겹치는지, --match)
+PROFILE_LOG_FILE = None  # 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
 
 
 # -------------------------
 
-def main():
-    """메인 실행 함수"""
+# 작업 프로세스별로 읽어 둔 필드 구역(좌표계별 변환 결과 포함)을 재사용하기 위한 캐시
+_FIELD_CACHE = {}
+# 좌표계별 래스터 범위 R-tree 색인 (footprint 연결 방식에서 한 번만 만듦)
+_FOOTPRINT_INDEXES = {}
 
-    # === ★★★ 수정된 부분: 스크립트 실행 동안 GDAL 환경 설정 적용 ★★★ ===
-    # GTIFF_SRS_SOURCE='EPSG' 설정으로 불필요한 CRS 경고 메시지를 제거합니다.
-    with rasterio.Env(GTIFF_SRS_SOURCE='EPSG'):
-        print("일괄 처리 스크립트 실행 시작...")
 
-        if not os.path.exists(OUTPUT_FOLDER):
-            os.makedirs(OUTPUT_FOLDER)
-            print(f"출력 폴더 생성: {OUTPUT_FOLDER}")
+def parse_raster_filename(raster_filename):
+    """래스터 파일 이름(GJW1_02_250313_BNVI.tif)에서 결과 컬럼명(BNVI_2)을 만드는 함수"""
+    info = parse_raster_name(raster_filename)
+    if info is None:
+        raise ValueError(f"파일 이름 형식이 올바르지 않습니다: {raster_filename}")
+    return f"{info['index']}_{info['session']}"
 
-        geojson_files = glob.glob(os.path.join(GEOJSON_FOLDER, '*.geojson'))
 
-        if not geojson_files:
-            print(f"[오류] GeoJSON 입력 폴더에 파일이 없습니다: {GEOJSON_FOLDER}")
+def footprint_index(inventory, crs):
+    """구역 좌표계로 변환한 래스터 범위 R-tree 색인을 반환하는 함수 (좌표계별로 한 번만 만듦)"""
+    key = crs.to_string()
+    if key not in _FOOTPRINT_INDEXES:
+        _FOOTPRINT_INDEXES[key] = RasterFootprintIndex(inventory, crs)
+        print(f"   > 래스터 범위 색인 생성: {len(_FOOTPRINT_INDEXES[key])}개 래스터 ({key})")
+    return _FOOTPRINT_INDEXES[key]
+
+
+def find_field_rasters(geojson_path, inventory, match='name'):
+    """GeoJSON 파일 이름에서 필드명을 추출하고, 인벤토리에서 연관된 래스터 파일 목록을 정렬해 반환하는 함수
+
+    match='footprint'면 파일 이름 대신 래스터 범위가 구역과 겹치는지로 찾으므로,
+    여러 필드를 담은 모자이크도 자르거나 복사하지 않고 그대로 사용할 수 있습니다.
+    (구역 통계는 구역을 포함하는 윈도우만 읽으므로 큰 모자이크도 겹치는 부분만 읽습니다.)
+    """
+    base_name = os.path.splitext(os.path.basename(geojson_path))[0]
+    field_id = base_name.split('_')[-1].replace('-', '')
+    if match != 'footprint':
+        return field_id, inventory.find(field=field_id)
+
+    with stage('footprint_query', geojson_path):
+        gdf = gpd.read_file(geojson_path)
+        if gdf.crs is None:
+            print(f"   [경고] '{os.path.basename(geojson_path)}'에 좌표계가 없어 파일 이름으로 래스터를 찾습니다.")
+            return field_id, inventory.find(field=field_id)
+        overlapping = footprint_index(inventory, gdf.crs).query(gdf.geometry)
+    return field_id, select_field_rasters(overlapping, field_id)
+
+
+def open_zonal_raster(raster_path):
+    """구역 통계용으로 래스터를 여는 함수 (VIRTUAL_WARP_CRS가 있으면 읽는 윈도우만 즉석 재투영)"""
+    return open_raster(raster_path, VIRTUAL_WARP_CRS, WARP_RESAMPLING,
+                       shared_tile_cache(WARP_TILE_CACHE_FOLDER, WARP_TILE_CACHE_MB))
+
+
+def compute_zonal_column(zones, raster_path):
+    """래스터 하나에 대해 구역별 평균값 목록을 계산하는 함수
+
+    zones(ZoneSet)는 좌표계별로 한 번만 변환되므로, 같은 좌표계의 래스터들은 변환된 도형과
+    전체 범위를 재사용하고 래스터에서는 필드 범위를 덮는 픽셀 윈도우만 읽습니다.
+    """
+    with open_zonal_raster(raster_path) as src:
+        with stage('reproject_geometry', raster_path):
+            geometries = zones.in_crs(src.crs)
+
+        # 구역 라벨은 같은 격자의 래스터끼리 캐시를 공유하고, 구역을 포함하는 영역만 블록 단위로 읽습니다.
+        with stage('zonal', raster_path, zones=len(geometries)):
+            stats = zonal_statistics(geometries, src, memory_budget_mb=MEMORY_BUDGET_MB,
+                                     all_touched=True, stats=('mean',))
+
+    return [s['mean'] if s['mean'] is not None else 0.0 for s in stats]
+
+
+def prepare_band_stack(stack_sources):
+    """(필드, 회차) 지수 스택을 준비하고 (스택 경로, {지수 이름: 밴드 번호})를 반환하는 함수
+
+    스택이 없거나 원본과 다르면 stack_sources(같은 회차의 모든 지수 래스터)로 새로 만들고,
+    원본들의 격자가 달라 스택으로 묶을 수 없으면 None을 반환합니다.
+    """
+    first = parse_raster_name(stack_sources[0])
+    rasters_by_index = {parse_raster_name(p)['index']: p for p in stack_sources}
+    with stage('band_stack', stack_sources[0], bands=len(rasters_by_index)):
+        return ensure_band_stack(rasters_by_index, STACK_FOLDER, first['field'], first['session'],
+                                 first['date'], MEMORY_BUDGET_MB)
+
+
+def compute_stack_columns(zones, stack_path, band_indexes, raster_paths):
+    """지수 스택에서 raster_paths에 해당하는 밴드들의 구역별 평균값을 한 번의 순회로 계산하는 함수
+
+    band_indexes는 스택 파일에서 읽은 {지수 이름: 밴드 번호}입니다.
+    (즉석 재투영(WarpedVRT)에서는 밴드 설명이 전달되지 않으므로 스택 파일 기준으로 찾습니다.)
+    """
+    with open_zonal_raster(stack_path) as src:
+        bands = [band_indexes[parse_raster_name(p)['index']] for p in raster_paths]
+        with stage('reproject_geometry', stack_path):
+            geometries = zones.in_crs(src.crs)
+        with stage('zonal_stack', stack_path, zones=len(geometries), bands=len(bands)):
+            band_stats = zonal_statistics_bands(geometries, src, bands,
+                                                memory_budget_mb=MEMORY_BUDGET_MB, all_touched=True, stats=('mean',))
+
+    return {raster_path: [s['mean'] if s['mean'] is not None else 0.0 for s in stats]
+            for raster_path, stats in zip(raster_paths, band_stats)}
+
+
+def compute_zonal_columns(zones, raster_paths, stack_sources=None):
+    """작업 단위 하나의 구역별 평균값을 {래스터 경로: 평균값 목록}으로 계산하는 함수
+
+    zones: 필드의 구역 도형 (ZoneSet, 필드마다 하나를 만들어 모든 작업 단위에서 재사용)
+    stack_sources가 있고 모두 같은 격자이면 다중 밴드 스택에서 한 번에 계산하고,
+    아니면 래스터별로 따로 계산합니다. (스택이 최신이면 원본 래스터는 열지 않습니다.)
+    """
+    stack = prepare_band_stack(stack_sources) if stack_sources else None
+    if stack is not None:
+        stack_path, band_indexes = stack
+        return compute_stack_columns(zones, stack_path, band_indexes, raster_paths)
+    return {raster_path: compute_zonal_column(zones, raster_path) for raster_path in raster_paths}
+
+
+def plan_work_units(raster_files, todo, use_stack, field_id=None):
+    """계산할 래스터들을 [(래스터 목록, 스택 원본 목록 또는 None), ...] 작업 단위로 묶는 함수
+
+    스택 모드에서는 같은 (회차, 촬영일)의 래스터를 하나의 작업으로 묶고, 스택은 계산 대상이 아닌
+    같은 회차 래스터까지 포함해 만들어 증분 모드에서도 스택이 다시 만들어지지 않도록 합니다.
+    스택은 (필드, 회차)별로 만들므로 이름의 필드가 field_id인 래스터만 묶고, footprint 연결로 찾은
+    다른 필드의 래스터(공유 모자이크 등)는 모자이크 전체를 복사하지 않도록 따로 계산합니다.
+    """
+    if not use_stack:
+        return [([raster_path], None) for raster_path in todo]
+
+    sessions = {}
+    for raster_path in raster_files:
+        info = parse_raster_name(raster_path)
+        if info is not None and (field_id is None or info['field'] == field_id):
+            sessions.setdefault((info['session'], info['date']), []).append(raster_path)
+
+    units = []
+    grouped = {}
+    for raster_path in todo:
+        info = parse_raster_name(raster_path)
+        key = (info['session'], info['date']) if info and (field_id is None or info['field'] == field_id) else None
+        sources = sessions.get(key, [])
+        indices = {parse_raster_name(p)['index'] for p in sources}
+        if len(sources) < 2 or len(indices) != len(sources):
+            units.append(([raster_path], None))
+        else:
+            grouped.setdefault(key, ([], sources))[0].append(raster_path)
+    return units + list(grouped.values())
+
+
+def zonal_work_unit(geojson_path, raster_paths, stack_sources=None):
+    """(필드, 래스터 묶음) 작업 단위를 작업 프로세스에서 실행하는 함수
+
+    예외는 프로세스 밖으로 던지지 않고 ({래스터 경로: 평균값 목록}, 오류 메시지) 형태로 돌려줍니다.
+    """
+    try:
+        with rasterio.Env(GTIFF_SRS_SOURCE='EPSG', GDAL_CACHEMAX=MEMORY_BUDGET_MB):
+            zones = _FIELD_CACHE.get(geojson_path)
+            if zones is None:
+                # 작업은 필드 순서대로 제출되므로 새 필드가 오면 이전 필드의 도형과 구역 라벨을 내립니다.
+                _FIELD_CACHE.clear()
+                clear_zone_label_cache()
+                with stage('read_geojson', geojson_path):
+                    zones = ZoneSet(gpd.read_file(geojson_path).geometry)
+                _FIELD_CACHE[geojson_path] = zones
+            return compute_zonal_columns(zones, raster_paths, stack_sources), None
+    except Exception as e:
+        return None, str(e)
+
+
+def result_path_for(geojson_path):
+    """입력 GeoJSON에 대응하는 결과 GeoJSON 경로를 반환하는 함수"""
+    name_part, extension = os.path.splitext(os.path.basename(geojson_path))
+    return os.path.join(OUTPUT_FOLDER, f"{name_part}_zonal_stats{extension}")
+
+
+def save_field_result(gdf, geojson_path):
+    """구역 통계가 추가된 GeoDataFrame을 결과 폴더에 저장하는 함수"""
+    with stage('save', geojson_path):
+        output_path = result_path_for(geojson_path)
+        new_output_filename = os.path.basename(output_path)
+        name_part = os.path.splitext(os.path.basename(geojson_path))[0]
+
+        gdf.to_file(output_path, driver='GeoJSON', encoding='utf-8')
+        print(f"   [성공] 최종 결과 파일 저장 완료: {new_output_filename}")
+
+        if WRITE_PARQUET_DATASET:
+            # 분석 스크립트가 필요한 컬럼/회차만 읽을 수 있도록 field_code/session별 GeoParquet으로도 저장합니다.
+            if 'field_code' in gdf.columns and gdf['field_code'].nunique() == 1:
+                field_code = gdf['field_code'].iloc[0]
+            else:
+                field_code = name_part.split('_')[-1]
+            session_count = write_field_partitions(gdf, field_code, RESULT_DATASET_FOLDER, output_path)
+            print(f"   [성공] GeoParquet 저장 완료: {RESULT_DATASET_FOLDER}/field_code={field_code} ({session_count}개 회차)")
+
+
+def file_fingerprint(path):
+    """파일 변경 여부를 판단하기 위한 지문을 반환하는 함수 ('stat': 크기+수정 시각, 'hash': 내용 해시)"""
+    stat = os.stat(path)
+    if FINGERPRINT_MODE == 'hash':
+        return [stat.st_size, file_content_hash(path)]
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def raster_fingerprint(path):
+    """래스터 지문에 즉석 재투영 조건을 더한 값을 반환하는 함수 (조건이 바뀌면 다시 계산하도록)"""
+    return file_fingerprint(path) + [VIRTUAL_WARP_CRS, WARP_RESAMPLING if VIRTUAL_WARP_CRS else None]
+
+
+def load_manifest():
+    """이전 실행에서 계산한 (필드, 래스터) 지문 기록을 읽는 함수"""
+    if not os.path.exists(ZONAL_MANIFEST_FILE):
+        return {}
+    try:
+        with open(ZONAL_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    """(필드, 래스터) 지문 기록을 저장하는 함수"""
+    tmp_path = ZONAL_MANIFEST_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, ZONAL_MANIFEST_FILE)
+
+
+def update_manifest(manifest, geojson_path, state):
+    """필드의 지문 기록을 갱신해 저장하는 함수 (state가 None이면 기록을 지움)"""
+    if state is None:
+        if manifest.pop(os.path.basename(geojson_path), None) is None:
             return
+    else:
+        manifest[os.path.basename(geojson_path)] = state
+    save_manifest(manifest)
 
-        print(f"\n총 {len(geojson_files)}개의 GeoJSON 파일을 처리합니다.")
 
+def plan_field(geojson_path, raster_files, manifest, incremental):
+    """필드 하나에 대해 새로 계산할 래스터 목록을 정하는 함수
+
+    반환값: (기준 GeoDataFrame, 계산할 래스터 경로 목록, 갱신할 지문 기록, 삭제된 컬럼 목록)
+    incremental=True이고 GeoJSON이 바뀌지 않았다면 이전 결과 파일을 기준으로 삼아,
+    컬럼이 없거나 지문이 바뀐 래스터만 다시 계산하고 사라진 래스터의 컬럼은 지웁니다.
+    incremental=False면 지문을 계산하지 않으며('hash' 모드에서 모든 래스터를 읽지 않도록),
+    지문 기록은 None이 되어 이 필드의 이전 기록이 지워집니다 (다음 증분 실행은 전체 계산).
+    """
+    if not incremental:
+        return gpd.read_file(geojson_path), list(raster_files), None, []
+
+    raster_fingerprints = {os.path.basename(p): raster_fingerprint(p) for p in raster_files}
+    state = {'geojson': file_fingerprint(geojson_path), 'rasters': raster_fingerprints}
+
+    output_path = result_path_for(geojson_path)
+    previous = manifest.get(os.path.basename(geojson_path))
+    if not (previous and previous['geojson'] == state['geojson'] and os.path.exists(output_path)):
+        return gpd.read_file(geojson_path), list(raster_files), state, []
+
+    gdf = gpd.read_file(output_path)
+
+    dropped = []
+    for raster_filename in previous['rasters']:
+        if raster_filename in raster_fingerprints:
+            continue
+        try:
+            column_name = parse_raster_filename(raster_filename)
+        except (IndexError, ValueError):
+            continue
+        if column_name in gdf.columns:
+            gdf = gdf.drop(columns=[column_name])
+            dropped.append(column_name)
+
+    todo = []
+    for raster_path in raster_files:
+        raster_filename = os.path.basename(raster_path)
+        try:
+            column_name = parse_raster_filename(raster_filename)
+        except (IndexError, ValueError):
+            column_name = None
+        if (column_name not in gdf.columns
+                or previous['rasters'].get(raster_filename) != raster_fingerprints[raster_filename]):
+            todo.append(raster_path)
+    return gdf, todo, state, dropped
+
+
+def report_plan(raster_files, todo, dropped):
+    """필드별 계산 계획을 출력하고, 저장이 필요 없으면 False를 반환하는 함수"""
+    if dropped:
+        print(f"   > 원본 래스터가 사라진 컬럼 {len(dropped)}개를 삭제합니다: {', '.join(dropped)}")
+    if not todo and not dropped:
+        print("   [통과] 새로 추가되거나 변경된 래스터가 없어 이전 결과를 그대로 사용합니다.")
+        return False
+    if len(todo) < len(raster_files):
+        print(f"   > 총 {len(raster_files)}개 중 새로 추가되거나 변경된 {len(todo)}개의 래스터만 계산합니다.")
+    else:
+        print(f"   > 총 {len(raster_files)}개의 연관 래스터 파일을 찾았습니다. 구역 통계를 시작합니다.")
+    return True
+
+
+def apply_results(gdf, todo, state, results, errors):
+    """계산 결과를 정렬된 래스터 순서대로 컬럼에 추가하는 함수 (실패한 래스터는 다음 실행에서 다시 계산)"""
+    for raster_path in todo:
+        raster_filename = os.path.basename(raster_path)
+        try:
+            column_name = parse_raster_filename(raster_filename)
+            if raster_path in errors:
+                raise RuntimeError(errors[raster_path])
+            print(f"     - 계산 완료: {raster_filename} -> '{column_name}' 컬럼")
+            gdf[column_name] = results[raster_path]
+
+        except Exception as e:
+            print(f"     [오류] '{raster_filename}' 처리 중 문제 발생: {e}")
+            if state is not None:
+                state['rasters'].pop(raster_filename, None)
+
+
+def run_serial(geojson_files, inventory, manifest, incremental, use_stack=False, match='name'):
+    """GeoJSON과 래스터를 하나씩 순서대로 처리하는 함수"""
+    for geojson_path in geojson_files:
+        print(f"\n--- 처리 중인 파일: {os.path.basename(geojson_path)} ---")
+
+        field_id, raster_files = find_field_rasters(geojson_path, inventory, match)
+        print(f"필드명: {field_id}")
+
+        if not raster_files:
+            print(f"   [경고] '{field_id}'에 해당하는 래스터 파일을 찾을 수 없습니다. 건너<binary data, 2 bytes>니다.")
+            continue
+
+        with stage('plan_field', geojson_path):
+            gdf, todo, state, dropped = plan_field(geojson_path, raster_files, manifest, incremental)
+        if not report_plan(raster_files, todo, dropped):
+            continue
+
+        results, errors = {}, {}
+        zones = ZoneSet(gdf.geometry)  # 좌표계별 변환 도형을 이 필드의 모든 래스터에서 재사용
+        for raster_paths, stack_sources in plan_work_units(raster_files, todo, use_stack, field_id):
+            try:
+                for raster_path in raster_paths:
+                    print(f"     - 계산 중: {os.path.basename(raster_path)}")
+                results.update(compute_zonal_columns(zones, raster_paths, stack_sources))
+            except Exception as e:
+                errors.update({raster_path: str(e) for raster_path in raster_paths})
+        apply_results(gdf, todo, state, results, errors)
+
+        save_field_result(gdf, geojson_path)
+        update_manifest(manifest, geojson_path, state)
+        clear_zone_label_cache()  # 이 필드의 구역 라벨은 다른 필드에서 쓰이지 않음
+
+
+def run_parallel(geojson_files, inventory, workers, manifest, incremental, use_stack=False, match='name'):
+    """(필드, 래스터 묶음) 작업 단위를 프로세스 풀에 나누어 처리하는 함수
+
+    결과는 순차 처리와 같은 순서(정렬된 래스터 순)로 컬럼에 추가하므로
+    출력 GeoJSON이 순차 처리 결과와 동일합니다.
+    """
+    fields = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
         for geojson_path in geojson_files:
-            print(f"\n--- 처리 중인 파일: {os.path.basename(geojson_path)} ---")
-            gdf = gpd.read_file(geojson_path)
+            field_id, raster_files = find_field_rasters(geojson_path, inventory, match)
+            if raster_files:
+                with stage('plan_field', geojson_path):
+                    gdf, todo, state, dropped = plan_field(geojson_path, raster_files, manifest, incremental)
+            else:
+                gdf, todo, state, dropped = None, [], None, []
+            futures = [(raster_paths, executor.submit(zonal_work_unit, geojson_path, raster_paths, stack_sources))
+                       for raster_paths, stack_sources in plan_work_units(raster_files, todo, use_stack, field_id)]
+            fields.append((geojson_path, field_id, raster_files, gdf, todo, state, dropped, futures))
 
-            base_name = os.path.splitext(os.path.basename(geojson_path))[0]
-            field_id = base_name.split('_')[-1].replace('-', '')
-            print(f"필드명: {field_id}")
+        print(f"   > 총 {sum(len(f[7]) for f in fields)}개의 작업을 {workers}개 프로세스로 처리합니다.")
 
-            raster_search_path = os.path.join(RASTER_FOLDER, f'{field_id}*.tif')
-            raster_files = glob.glob(raster_search_path)
+        for geojson_path, field_id, raster_files, gdf, todo, state, dropped, futures in fields:
+            print(f"\n--- 처리 중인 파일: {os.path.basename(geojson_path)} ---")
+            print(f"필드명: {field_id}")
 
             if not raster_files:
                 print(f"   [경고] '{field_id}'에 해당하는 래스터 파일을 찾을 수 없습니다. 건너<binary data, 2 bytes>니다.")
                 continue
 
-            print(f"   > 총 {len(raster_files)}개의 연관 래스터 파일을 찾았습니다. 구역 통계를 시작합니다.")
-            original_crs = gdf.crs
+            if not report_plan(raster_files, todo, dropped):
+                continue
 
-            for raster_path in sorted(raster_files):
-                raster_filename = os.path.basename(raster_path)
-                try:
-                    parts = raster_filename.split('_')
-                    session = int(parts[1])
-                    index_name = parts[3].split('.')[0]
-                    column_name = f"{index_name}_{session}"
+            results, errors = {}, {}
+            for raster_paths, future in futures:
+                unit_results, error = future.result()
+                if error is not None:
+                    errors.update({raster_path: error for raster_path in raster_paths})
+                else:
+                    results.update(unit_results)
+            apply_results(gdf, todo, state, results, errors)
 
-                    print(f"     - 계산 중: {raster_filename} -> '{column_name}' 컬럼")
+            save_field_result(gdf, geojson_path)
+            update_manifest(manifest, geojson_path, state)
 
-                    with rasterio.open(raster_path) as src:
-                        raster_crs = src.crs
 
-                    if original_crs != raster_crs:
-                        gdf_reprojected = gdf.to_crs(raster_crs)
-                    else:
-                        gdf_reprojected = gdf.copy()
+def main():
+    """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="GeoJSON 구역별 래스터 통계 계산")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="병렬 처리에 사용할 프로세스 수 (기본값: %(default)s, 1이면 순차 처리)")
+    parser.add_argument('--incremental', action='store_true', default=INCREMENTAL,
+                        help="이전 결과에 없거나 변경된 래스터의 컬럼만 계산합니다.")
+    parser.add_argument('--stack', action='store_true', default=USE_BAND_STACK,
+                        help="같은 회차의 지수 래스터들을 다중 밴드 스택으로 묶어 블록마다 한 번에 읽습니다.")
+    parser.add_argument('--match', choices=['name', 'footprint'], default=RASTER_MATCH,
+                        help="필드와 래스터 연결 방식 (name: 파일 이름의 필드명, footprint: 래스터 범위와 구역의 겹침)")
+    args = parser.parse_args()
 
-                    stats = zonal_stats(gdf_reprojected, raster_path, stats="mean", all_touched=True)
+    # === ★★★ 수정된 부분: 스크립트 실행 동안 GDAL 환경 설정 적용 ★★★ ===
+    # GTIFF_SRS_SOURCE='EPSG' 설정으로 불필요한 CRS 경고 메시지를 제거합니다.
+    with rasterio.Env(GTIFF_SRS_SOURCE='EPSG', GDAL_CACHEMAX=MEMORY_BUDGET_MB):
+        print("일괄 처리 스크립트 실행 시작...")
+
+        if not os.path.exists(OUTPUT_FOLDER):
+            os.makedirs(OUTPUT_FOLDER)
+            print(f"출력 폴더 생성: {OUTPUT_FOLDER}")
+
+        geojson_files = glob.glob(os.path.join(GEOJSON_FOLDER, '*.geojson'))
+
+        if not geojson_files:
+            print(f"[오류] GeoJSON 입력 폴더에 파일이 없습니다: {GEOJSON_FOLDER}")
+            return
 
-                    mean_values = [s['mean'] if s['mean'] is not None else 0.0 for s in stats]
-                    gdf[column_name] = mean_values
+        print(f"\n총 {len(geojson_files)}개의 GeoJSON 파일을 처리합니다.")
 
-                except Exception as e:
-                    print(f"     [오류] '{raster_filename}' 처리 중 문제 발생: {e}")
+        # 래스터 폴더는 인벤토리로 한 번만 훑고, 필드별 래스터는 인벤토리에서 바로 찾습니다.
+        with stage('inventory'):
+            inventory = RasterInventory.open(RASTER_FOLDER)
+        manifest = load_manifest()
+        if args.incremental:
+            print("[증분 모드] 이전 결과와 비교해 새로 추가되거나 변경된 래스터만 계산합니다.")
 
-            base_name_with_ext = os.path.basename(geojson_path)
-            name_part, extension = os.path.splitext(base_name_with_ext)
-            new_output_filename = f"{name_part}_zonal_stats{extension}"
-            output_path = os.path.join(OUTPUT_FOLDER, new_output_filename)
+        if args.workers > 1:
+            run_parallel(geojson_files, inventory, args.workers, manifest, args.incremental, args.stack, args.match)
+        else:
+            run_serial(geojson_files, inventory, manifest, args.incremental, args.stack, args.match)
 
-            gdf.to_file(output_path, driver='GeoJSON', encoding='utf-8')
-            print(f"   [성공] 최종 결과 파일 저장 완료: {new_output_filename}")
+        if WRITE_PARQUET_DATASET and os.path.isdir(RESULT_DATASET_FOLDER):
+            # 결과 GeoJSON이 없어진 필드의 파티션은 분석 스크립트가 읽지 않도록 정리합니다.
+            removed = remove_orphan_partitions(OUTPUT_FOLDER, RESULT_DATASET_FOLDER)
+            if removed:
+                print(f"[정리] 결과 GeoJSON이 없는 GeoParquet 파티션 {len(removed)}개를 삭제했습니다: {', '.join(removed)}")
 
         print("\n--- 모든 작업이 완료되었습니다. ---")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
\ No newline at end of file
@@ -1,38 +1,101 @@
 # -*- coding: utf-8 -*-
 import os
-import glob
-import geopandas as gpd
+import argparse
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from correlation_engine import correlation_table
+from pipeline_profiler import script_name, stage, start_run
+from result_loader import load_zonal_results
+
 # --- 1. 사용자 설정 부분 ---
 GEOJSON_FOLDER = 'result_geojson'
+RESULT_DATASET_FOLDER = 'result_parquet'  # 결과 GeoJSON과 같은 내용으로 기록된 필드는 GeoParquet에서 읽음
 TARGET_VARIABLES = ['yield', 'protein']
+CORRELATION_METHODS = ['pearson', 'spearman', 'kendall']
+BOOTSTRAP_SAMPLES = 1000  # 부트스트랩 신뢰구간 표본 수 (0이면 신뢰구간 계산 생략)
+CORRELATION_TABLE = 'correlation_results.csv'  # 상관계수/p-값/신뢰구간 결과 표 (히트맵은 이 표를 읽어 그림)
+PROFILE_LOG_FILE = None  # 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
 
 
 # -------------------------
 
-def main():
-    """메인 실행 함수"""
-    print("상관관계 분석 스크립트 실행 시작...")
-
-    # 1. 모든 GeoJSON 파일 목록 가져와서 하나의 DataFrame으로 합치기
-    geojson_files = glob.glob(os.path.join(GEOJSON_FOLDER, '*_zonal_stats.geojson'))
-    if not geojson_files:
+def run_correlation_analysis():
+    """모든 {지수}_{회차}와 목표 변수 쌍의 상관관계 결과 표를 계산해 저장하는 함수 (결과가 없으면 None)"""
+    # 1. 모든 구역 통계 결과를 하나의 DataFrame으로 불러오기 (변경이 없으면 캐시에서 바로 읽음)
+    with stage('load'):
+        full_df = load_zonal_results(GEOJSON_FOLDER, RESULT_DATASET_FOLDER, attributes=TARGET_VARIABLES)
+    if full_df is None:
         print(f"[오류] GeoJSON 결과 폴더에 파일이 없습니다: {GEOJSON_FOLDER}")
-        return
-
-    gdf_list = [gpd.read_file(f) for f in geojson_files]
-    full_df = pd.concat(gdf_list, ignore_index=True)
-    print(f"총 {len(geojson_files)}개 파일, {len(full_df)}개 레코드(구역)를 성공적으로 불러왔습니다.")
+        return None
+    print(f"총 {len(full_df)}개 레코드(구역)를 성공적으로 불러왔습니다.")
 
     # 2. 분석에 사용할 컬럼만 선택하기
     index_names = ['BNVI', 'NDVI', 'GNDVI', 'LCI', 'MTCI', 'NDRE']
     predictor_variables = [col for col in full_df.columns if col.split('_')[0] in index_names]
-    analysis_columns = TARGET_VARIABLES + predictor_variables
-    analysis_df = full_df[analysis_columns].copy()
+
+    # 3. 순위는 한 번만 계산하고, 모든 방법/쌍의 상관계수와 p-값, 부트스트랩 신뢰구간을 행렬 연산으로 계산
+    print(f"상관관계 계산 중... (방법: {', '.join(CORRELATION_METHODS)}, 부트스트랩 {BOOTSTRAP_SAMPLES}회)")
+    with stage('correlation', zones=len(full_df), predictors=len(predictor_variables),
+               bootstrap=BOOTSTRAP_SAMPLES):
+        table = correlation_table(full_df, TARGET_VARIABLES, predictor_variables, CORRELATION_METHODS,
+                                  n_bootstrap=BOOTSTRAP_SAMPLES)
+    with stage('save'):
+        table.to_csv(CORRELATION_TABLE, index=False, encoding='utf-8-sig')
+    print(f"[성공] 상관관계 결과 표가 '{CORRELATION_TABLE}' 파일로 저장되었습니다.")
+    return table
+
+
+def print_top_correlations(table, method, top_n=10):
+    """결과 표에서 목표 변수별 상관계수 절대값 상위 항목을 출력하는 함수"""
+    method_table = table[table['method'] == method]
+    for target in TARGET_VARIABLES:
+        target_table = method_table[method_table['target'] == target]
+        top = target_table.reindex(target_table['r'].abs().sort_values(ascending=False).index).head(top_n)
+        print(f"\n--- '{target}'와(과)의 {method.capitalize()} 상관관계 상위 {top_n}개 ---")
+        print(top[['predictor', 'r', 'p_value', 'ci_low', 'ci_high', 'n']].to_string(index=False, float_format='%.4f'))
+
+
+def draw_heatmap(table, method):
+    """결과 표에서 한 방법의 (예측 변수 x 목표 변수) 상관계수 히트맵을 그려 저장하는 함수"""
+    print(f"\n--- {method.capitalize()} 상관관계 히트맵 생성 ---")
+    method_table = table[table['method'] == method]
+    # 표의 예측 변수 순서(결과 파일의 컬럼 순서)를 그대로 유지합니다.
+    predictor_order = list(dict.fromkeys(method_table['predictor']))
+    heatmap_data = method_table.pivot(index='predictor', columns='target', values='r')
+    heatmap_data = heatmap_data.loc[predictor_order, [t for t in TARGET_VARIABLES if t in heatmap_data.columns]]
+
+    plt.figure(figsize=(10, 14))
+    sns.heatmap(heatmap_data, annot=True, cmap='coolwarm', fmt='.2f', linewidths=.5)
+    plt.title(f'수확량/단백질과 식생 지수의 {method.capitalize()} 상관관계', fontsize=16)
+    plt.tight_layout()
+
+    output_image_path = f'correlation_heatmap_{method}.png'
+    plt.savefig(output_image_path, dpi=200)
+    plt.close()  # 메모리 해제를 위해 그래프 닫기
+    print(f"[성공] 히트맵이 '{output_image_path}' 파일로 저장되었습니다.")
+
+
+def main():
+    """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="수확량/단백질과 식생 지수의 상관관계 분석")
+    parser.add_argument('--plot-only', action='store_true',
+                        help=f"다시 계산하지 않고 저장된 결과 표({CORRELATION_TABLE})로 히트맵만 그립니다.")
+    args = parser.parse_args()
+
+    print("상관관계 분석 스크립트 실행 시작...")
+
+    if args.plot_only:
+        if not os.path.exists(CORRELATION_TABLE):
+            print(f"[오류] 상관관계 결과 표가 없습니다: {CORRELATION_TABLE}")
+            return
+        table = pd.read_csv(CORRELATION_TABLE)
+    else:
+        table = run_correlation_analysis()
+        if table is None:
+            return
 
     # 한글 폰트 설정
     try:
@@ -41,37 +104,16 @@ def main():
     except:
         print("[경고] 'Malgun Gothic' 폰트를 찾을 수 없습니다. 히트맵의 한글이 깨질 수 있습니다.")
 
-    # === ★★★ 변경된 부분: 피어슨과 스피어만 상관관계 및 히트맵 모두 생성 ★★★ ===
-    correlation_methods = ['pearson', 'spearman']
-
-    for method in correlation_methods:
+    # 4. 결과 표에서 방법별 상위 항목 출력과 히트맵 생성 (상관계수를 다시 계산하지 않음)
+    for method in dict.fromkeys(table['method']):
         print(f"\n\n{'=' * 20} {method.capitalize()} 상관관계 분석 {'=' * 20}")
-
-        # 3. 지정된 방법으로 상관관계 행렬 계산
-        corr_matrix = analysis_df.corr(method=method)
-
-        # 4. 텍스트 결과 출력
-        for target in TARGET_VARIABLES:
-            sorted_corr = corr_matrix[target].drop(TARGET_VARIABLES).abs().sort_values(ascending=False)
-            print(f"\n--- '{target}'와(과)의 {method.capitalize()} 상관관계 상위 10개 ---")
-            print(sorted_corr.head(10))
-
-        # 5. 히트맵 시각화 및 저장
-        print(f"\n--- {method.capitalize()} 상관관계 히트맵 생성 ---")
-        heatmap_data = corr_matrix.loc[predictor_variables, TARGET_VARIABLES]
-
-        plt.figure(figsize=(10, 14))
-        sns.heatmap(heatmap_data, annot=True, cmap='coolwarm', fmt='.2f', linewidths=.5)
-        plt.title(f'수확량/단백질과 식생 지수의 {method.capitalize()} 상관관계', fontsize=16)
-        plt.tight_layout()
-
-        output_image_path = f'correlation_heatmap_{method}.png'
-        plt.savefig(output_image_path, dpi=200)
-        plt.close()  # 메모리 해제를 위해 그래프 닫기
-        print(f"[성공] 히트맵이 '{output_image_path}' 파일로 저장되었습니다.")
+        print_top_correlations(table, method)
+        with stage('heatmap', method=method):
+            draw_heatmap(table, method)
 
     print("\n\n--- 모든 작업이 완료되었습니다. ---")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+from graph_figures import (INDEX_NAMES, SESSIONS, build_index_figure, build_session_figure,
+                           write_html_files, write_png_files)
+from pipeline_profiler import script_name, stage, start_run
+from result_loader import load_zonal_results
+
+# --- 1. 사용자 설정 부분 ---
+GEOJSON_FOLDER = 'result_geojson'
+RESULT_DATASET_FOLDER = 'result_parquet'  # 결과 GeoJSON과 같은 내용으로 기록된 필드는 GeoParquet에서 읽음
+INDEX_GRAPH_FOLDER = 'result_graph'  # 지수별 그래프 (4.create_graph.py와 같은 위치)
+SESSION_GRAPH_FOLDER = 'result_graph_by_session'  # 회차별 그래프 (5.create_session_graphs.py와 같은 위치)
+SAVE_PNG = True  # False면 HTML만 저장 (Kaleido 없이 실행 가능)
+PROFILE_LOG_FILE = None  # 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
+
+
+# -------------------------
+
+def main():
+    """4번/5번 그래프를 한 번의 데이터 로딩과 한 번의 이미지 저장으로 모두 만드는 메인 실행 함수"""
+    print("전체 그래프 생성 스크립트 실행 시작...")
+    start_time = time.perf_counter()
+
+    # 1. 모든 구역 통계 결과를 한 번만 불러오기
+    sort_column = 'code'
+    with stage('load'):
+        full_df = load_zonal_results(GEOJSON_FOLDER, RESULT_DATASET_FOLDER, attributes=['code', 'yield', 'protein'],
+                                     sessions=SESSIONS, sort_by=sort_column)
+    if full_df is None:
+        print(f"[오류] GeoJSON 결과 폴더에 파일이 없습니다: {GEOJSON_FOLDER}")
+        return
+    print(f"총 {len(full_df)}개 레코드(구역)를 성공적으로 불러왔습니다.")
+
+    # 2. 지수별 그래프와 회차별 그래프를 모두 만들기
+    figures = []
+    with stage('build_figures'):
+        for index_name in INDEX_NAMES:
+            fig = build_index_figure(full_df, index_name, sort_column)
+            figures.append((fig, os.path.join(INDEX_GRAPH_FOLDER, f"{index_name}_graph")))
+        for session_num in SESSIONS:
+            fig = build_session_figure(full_df, session_num, sort_column)
+            figures.append((fig, os.path.join(SESSION_GRAPH_FOLDER, f"session_{session_num}_graph")))
+    print(f"총 {len(figures)}개 그래프를 만들었습니다.")
+
+    # 3. HTML은 폴더별 plotly.js 하나를 공유하고, PNG는 한 번의 Kaleido 세션으로 저장
+    print("\n--- HTML 그래프 저장 중... ---")
+    with stage('write_html', figures=len(figures)):
+        write_html_files([(fig, base_path + '.html') for fig, base_path in figures])
+    if SAVE_PNG:
+        print("\n--- PNG 이미지 저장 중... ---")
+        with stage('write_png', figures=len(figures)):
+            write_png_files([(fig, base_path + '.png') for fig, base_path in figures])
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n--- 모든 그래프 생성이 완료되었습니다. (소요 시간: {elapsed:.1f}초) ---")
+
+
+if __name__ == '__main__':
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
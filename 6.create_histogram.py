@@ -1,70 +1,171 @@
 # -*- coding: utf-8 -*-
 import os
-import glob
+import io
+import csv
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 import rasterio
-import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 화면 없이 파일로만 저장하는 백엔드 (작업 프로세스에서도 안전)
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from band_stack import stack_band_indexes
+from histogram import HistogramAccumulator
+from pipeline_profiler import script_name, stage, start_run
+from raster_catalog import RasterStatsCatalog
+from raster_inventory import RasterInventory
+from raster_reader import iter_band_stack_blocks, iter_valid_values, valid_mask
+
 # --- 1. 사용자 설정 부분 ---
 INPUT_FOLDER = 'test'
 OUTPUT_FOLDER = 'test_histogram'
+MEMORY_BUDGET_MB = 64  # 블록 단위로 읽을 때 한 번에 메모리에 올릴 최대 크기(MB)
+HISTOGRAM_RANGE = (-2, 5)  # 히스토그램 값 범위 (범위 밖 값은 제외)
+HISTOGRAM_BINS = 256  # 히스토그램 구간 수
+USE_STATS_CATALOG = True  # True면 통계 카탈로그에 저장된 히스토그램을 재사용 (없으면 계산 후 저장)
+STATS_CATALOG_FILE = 'raster_stats.sqlite'  # 래스터 통계 카탈로그(SQLite) 파일
+WORKERS = 1  # 병렬 처리 프로세스 수 (1이면 순차 처리)
+SUMMARY_CSV = os.path.join(OUTPUT_FOLDER, 'histogram_summary.csv')  # 파일별 봉우리/픽셀 수/소요 시간 요약
+SUMMARY_COLUMNS = ['file', 'total_pixels', 'valid_pixels', 'mean', 'peak1_value', 'peak1_count',
+                   'peak2_value', 'peak2_count', 'read_seconds', 'plot_seconds', 'total_seconds', 'error']
+PROFILE_LOG_FILE = None  # 단계별 소요 시간/메모리 이벤트 로그 (None이면 --profile 또는 PIPELINE_PROFILE=1일 때만 기록)
 
 
 # -------------------------
 
-def create_raster_histogram(raster_path, output_path):
-    """단일 래스터 파일의 히스토그램을 생성하고 통계를 출력합니다."""
-    print(f"-> 처리 중: {os.path.basename(raster_path)}")
+def setup_korean_font():
+    """그래프 한글 표시를 위한 폰트 설정 함수"""
+    try:
+        plt.rcParams['font.family'] = 'Malgun Gothic'
+        plt.rcParams['axes.unicode_minus'] = False
+    except:
+        print("[경고] 'Malgun Gothic' 폰트를 찾을 수 없습니다. 그래프의 한글이 깨질 수 있습니다.")
+
+
+def load_histogram(raster_path, catalog=None):
+    """래스터의 고정 구간 히스토그램을 반환하는 함수
+
+    카탈로그의 히스토그램 구간이 설정과 같으면 카탈로그를 먼저 조회하고(없으면 한 번 계산해 저장),
+    아니면 밴드를 블록 단위로 한 번만 훑으며 히스토그램을 누적합니다.
+    """
+    if catalog is not None:
+        hist = catalog.statistics(raster_path)['histogram']
+        if hist.value_range == tuple(float(v) for v in HISTOGRAM_RANGE) and hist.bins == HISTOGRAM_BINS:
+            return hist
+
+    hist = HistogramAccumulator(HISTOGRAM_RANGE, HISTOGRAM_BINS)
+    with rasterio.open(raster_path) as src:
+        for values in iter_valid_values(src, 1, MEMORY_BUDGET_MB):
+            hist.update(values)
+    return hist
+
+
+def load_stack_histograms(raster_path):
+    """다중 밴드 지수 스택의 밴드별 히스토그램을 블록마다 한 번의 읽기로 함께 누적하는 함수
+
+    반환값: [(지수 이름, HistogramAccumulator), ...] (밴드 순서)
+    """
+    with rasterio.open(raster_path) as src:
+        band_indexes = stack_band_indexes(src)
+        names = list(band_indexes)
+        bands = [band_indexes[name] for name in names]
+        hists = [HistogramAccumulator(HISTOGRAM_RANGE, HISTOGRAM_BINS) for _ in bands]
+        for _, block in iter_band_stack_blocks(src, bands, MEMORY_BUDGET_MB):
+            for k, data in enumerate(block):
+                hists[k].update(data[valid_mask(data, src.nodatavals[bands[k] - 1])])
+    return list(zip(names, hists))
+
+
+def is_band_stack(raster_path):
+    """밴드 설명(지수 이름)이 붙은 다중 밴드 스택인지 확인하는 함수 (열 수 없으면 False, 오류는 이후 단계에서 출력)"""
     try:
         with rasterio.open(raster_path) as src:
-            image_data = src.read(1)
-            nodata_value = src.nodata
+            return src.count > 1 and bool(stack_band_indexes(src))
+    except Exception:
+        return False
 
-        if nodata_value is not None:
-            valid_data = image_data[image_data != nodata_value].flatten()
-        else:
-            valid_data = image_data.flatten()
 
-        print(len(valid_data))
+def histogram_output_path(raster_path, band_name=None):
+    """래스터(스택이면 밴드)별 히스토그램 PNG 경로를 만드는 함수"""
+    base_name = os.path.splitext(os.path.basename(raster_path))[0]
+    if band_name:
+        base_name = f"{base_name}_{band_name}"
+    return os.path.join(OUTPUT_FOLDER, f"{base_name}_histogram.png")
+
+
+def create_histograms(raster_path, catalog=None):
+    """래스터 하나(스택이면 밴드마다)의 히스토그램을 만들고 요약 목록을 반환하는 함수"""
+    with stage('histogram', raster_path):
+        if not is_band_stack(raster_path):
+            return [create_raster_histogram(raster_path, histogram_output_path(raster_path), catalog)]
+
+        print(f"-> 지수 스택 읽는 중: {os.path.basename(raster_path)}")
+        start_time = time.perf_counter()
+        with stage('read', raster_path):
+            band_hists = load_stack_histograms(raster_path)
+        read_seconds = round(time.perf_counter() - start_time, 3)
+        return [create_raster_histogram(raster_path, histogram_output_path(raster_path, name),
+                                        hist=hist, label=f"{os.path.basename(raster_path)}:{name}",
+                                        read_seconds=read_seconds)
+                for name, hist in band_hists]
+
 
-        valid_data = valid_data[(valid_data > -2) & (valid_data < 5)]
+def create_raster_histogram(raster_path, output_path, catalog=None, hist=None, label=None, read_seconds=None):
+    """단일 래스터 파일의 히스토그램을 생성하고 통계를 출력합니다.
+
+    CSV 요약용으로 파일별 픽셀 수, 봉우리, 단계별 소요 시간을 딕셔너리로 반환합니다.
+    hist를 넘기면(스택에서 미리 누적한 경우) 래스터를 다시 읽지 않고 그래프만 그립니다.
+    """
+    label = label or os.path.basename(raster_path)
+    print(f"-> 처리 중: {label}")
+    summary = {'file': label}
+    start_time = time.perf_counter()
+    try:
+        # 밴드 전체를 읽지 않고 고정 구간(-2~5, 256개) 히스토그램만 사용합니다. (카탈로그에 있으면 스캔 생략)
+        if hist is None:
+            with stage('read', raster_path):
+                hist = load_histogram(raster_path, catalog)
+            read_seconds = round(time.perf_counter() - start_time, 3)
+        read_end = time.perf_counter()
+        summary.update(total_pixels=hist.total_count, valid_pixels=hist.count, mean=hist.mean,
+                       read_seconds=read_seconds)
+
+        print(hist.total_count)
 
         # === ★★★ 추가된 부분: 유효한 총 픽셀 수 출력 ★★★ ===
-        print(f"   [정보] 분석할 총 픽셀 수: {valid_data.size}")
+        valid_count = hist.count
+        print(f"   [정보] 분석할 총 픽셀 수: {valid_count}")
 
-        if valid_data.size < 2:
+        if valid_count < 2:
             print("   [경고] 분석할 유효한 데이터가 부족합니다. 건너<binary data, 2 bytes><binary data, 2 bytes><binary data, 2 bytes>니다.")
-            return
+            summary['total_seconds'] = round(time.perf_counter() - start_time, 3)
+            return summary
 
-        # (이하 히스토그램 계산 및 저장 로직은 이전과 동일)
-        counts, bin_edges = np.histogram(valid_data, bins=256)
+        counts = hist.counts
+        bin_edges = hist.bin_edges
 
         print("   [분석] 픽셀 수가 가장 많은 상위 5개 구간(Bin):")
-        sorted_indices = np.argsort(counts)[::-1]
-
         print("   -----------------------------------------")
         print("   | 순위 |      구간 (Value)     | 픽셀 수 |")
         print("   -----------------------------------------")
-        for i in range(5):
-            if i < len(sorted_indices):
-                index = sorted_indices[i]
-                bin_start = bin_edges[index]
-                bin_end = bin_edges[index + 1]
-                count = counts[index]
-                print(f"   |  {i + 1}   | {bin_start:.4f} - {bin_end:.4f} | {count:>7} |")
+        for i, index in enumerate(hist.top_bins(5)):
+            bin_start = bin_edges[index]
+            bin_end = bin_edges[index + 1]
+            count = counts[index]
+            print(f"   |  {i + 1}   | {bin_start:.4f} - {bin_end:.4f} | {count:>7} |")
         print("   -----------------------------------------")
 
-        peak1_index = sorted_indices[0]
-        peak1_value = (bin_edges[peak1_index] + bin_edges[peak1_index + 1]) / 2
-        peak1_count = counts[peak1_index]
-
-        peak2_index = sorted_indices[1]
-        peak2_value = (bin_edges[peak2_index] + bin_edges[peak2_index + 1]) / 2
-        peak2_count = counts[peak2_index]
+        # 픽셀 데이터가 아닌 누적된 구간별 픽셀 수에서 봉우리를 찾습니다.
+        (peak1_value, peak1_count), (peak2_value, peak2_count) = hist.peaks(2)
+        summary.update(peak1_value=peak1_value, peak1_count=peak1_count,
+                       peak2_value=peak2_value, peak2_count=peak2_count)
 
         fig, ax = plt.subplots(figsize=(12, 7))
-        ax.hist(valid_data, bins=256, color='skyblue', edgecolor='black')
+        # 이미 계산한 구간별 픽셀 수로 그리므로 픽셀 데이터를 다시 구간화하지 않습니다.
+        ax.hist(bin_edges[:-1], bins=bin_edges, weights=counts, color='skyblue', edgecolor='black')
         ax.axvline(peak1_value, color='red', linestyle='--', linewidth=2, label=f'1st Peak: {peak1_value:.4f}')
         ax.text(peak1_value, peak1_count, f' 1st Peak\n {peak1_value:.4f}', color='red', ha='left', va='bottom',
                 fontsize=12, weight='bold')
@@ -72,35 +173,72 @@ def create_raster_histogram(raster_path, output_path):
         ax.text(peak2_value, peak2_count, f' 2nd Peak\n {peak2_value:.4f}', color='purple', ha='right', va='bottom',
                 fontsize=12, weight='bold')
 
-        ax.set_title(f'{os.path.basename(raster_path)} - Pixel Value Distribution', fontsize=16)
+        ax.set_title(f'{label} - Pixel Value Distribution', fontsize=16)
         ax.set_xlabel('Vegetation Index Value', fontsize=12)
         ax.set_ylabel('Pixel Count (Frequency)', fontsize=12)
         ax.grid(True, linestyle='--', alpha=0.6)
         ax.legend()
 
-        plt.savefig(output_path, dpi=150)
+        with stage('save', output_path):
+            plt.savefig(output_path, dpi=150)
         plt.close(fig)
+        summary['plot_seconds'] = round(time.perf_counter() - read_end, 3)
 
     except Exception as e:
         print(f"   [오류] 처리 중 문제가 발생했습니다: {e}")
+        summary['error'] = str(e)
+
+    summary['total_seconds'] = round(time.perf_counter() - start_time, 3)
+    return summary
+
+
+def histogram_work_unit(raster_path):
+    """작업 프로세스에서 래스터 하나의 히스토그램을 만드는 함수
+
+    여러 프로세스의 출력이 섞이지 않도록 출력 내용을 모아 (요약 목록, 출력 문자열)로 돌려줍니다.
+    """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        with rasterio.Env(GTIFF_SRS_SOURCE='EPSG', GDAL_CACHEMAX=MEMORY_BUDGET_MB):
+            setup_korean_font()
+            if USE_STATS_CATALOG:
+                # SQLite 연결은 프로세스 사이에 넘길 수 없으므로 작업마다 새로 엽니다.
+                with RasterStatsCatalog(STATS_CATALOG_FILE, MEMORY_BUDGET_MB) as catalog:
+                    summaries = create_histograms(raster_path, catalog)
+            else:
+                summaries = create_histograms(raster_path)
+    return summaries, log.getvalue()
+
+
+def write_summary_csv(summaries, csv_path=SUMMARY_CSV):
+    """파일별 히스토그램 요약을 CSV로 저장하는 함수"""
+    with open(csv_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow({column: summary.get(column) for column in SUMMARY_COLUMNS})
+    print(f"요약 CSV 저장 완료: {csv_path}")
+
 
 def main():
     """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="래스터 히스토그램 일괄 생성")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="병렬 처리에 사용할 프로세스 수 (기본값: %(default)s, 1이면 순차 처리)")
+    args = parser.parse_args()
+
     # === ★★★ 추가된 부분 2: GDAL 환경 설정으로 CRS 경고 메시지 제거 ★★★ ===
-    with rasterio.Env(GTIFF_SRS_SOURCE='EPSG'):
+    with rasterio.Env(GTIFF_SRS_SOURCE='EPSG', GDAL_CACHEMAX=MEMORY_BUDGET_MB):
         print("히스토그램 일괄 생성 스크립트 실행 시작...")
 
-        try:
-            plt.rcParams['font.family'] = 'Malgun Gothic'
-            plt.rcParams['axes.unicode_minus'] = False
-        except:
-            print("[경고] 'Malgun Gothic' 폰트를 찾을 수 없습니다. 그래프의 한글이 깨질 수 있습니다.")
+        setup_korean_font()
 
         if not os.path.exists(OUTPUT_FOLDER):
             os.makedirs(OUTPUT_FOLDER)
             print(f"출력 폴더 생성: {OUTPUT_FOLDER}")
 
-        raster_files = glob.glob(os.path.join(INPUT_FOLDER, '*.tif'))
+        with stage('inventory'):
+            raster_files = RasterInventory.open(INPUT_FOLDER).all_paths()
         if not raster_files:
             print(f"[오류] 입력 폴더에 TIF 파일이 없습니다: {INPUT_FOLDER}")
             return
@@ -108,16 +246,34 @@ def main():
         # 총 파일 개수 출력
         print(f"\n총 {len(raster_files)}개의 파일에 대한 히스토그램을 생성합니다.")
 
-        for raster_path in raster_files:
-            base_name = os.path.splitext(os.path.basename(raster_path))[0]
-            output_filename = f"{base_name}_histogram.png"
-            output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+        start_time = time.perf_counter()
+        if args.workers > 1:
+            print(f"   > {args.workers}개 프로세스로 병렬 처리합니다.")
+            summaries = []
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                futures = [executor.submit(histogram_work_unit, raster_path) for raster_path in raster_files]
+                # 입력 파일 순서대로 출력과 요약을 모읍니다.
+                for future in futures:
+                    file_summaries, log = future.result()
+                    print(log, end='')
+                    summaries.extend(file_summaries)
+        else:
+            catalog = RasterStatsCatalog(STATS_CATALOG_FILE, MEMORY_BUDGET_MB) if USE_STATS_CATALOG else None
+            summaries = []
+            for raster_path in raster_files:
+                summaries.extend(create_histograms(raster_path, catalog))
+            if catalog is not None:
+                catalog.close()
 
-            create_raster_histogram(raster_path, output_path)
+        with stage('summary_csv'):
+            write_summary_csv(summaries)
+        failed = sum(1 for summary in summaries if summary.get('error'))
+        print(f"총 소요 시간: {time.perf_counter() - start_time:.1f}초 (실패 {failed}개)")
 
         print("\n--- 모든 작업이 완료되었습니다. ---")
         print(f"결과물은 '{OUTPUT_FOLDER}' 폴더에 저장되었습니다.")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with start_run(script_name(__file__), PROFILE_LOG_FILE):
+        main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import numpy as np
+import rasterio
+
+from raster_reader import DEFAULT_MEMORY_BUDGET_MB, iter_windows, valid_mask
+from raster_writer import DEFAULT_BLOCK_SIZE, DEFAULT_COMPRESSION, tiled_profile
+
+# 한 (필드, 회차)의 지수들을 묶어 저장할 때의 밴드 순서
+STACK_INDEX_NAMES = ['BNVI', 'GNDVI', 'NDVI', 'LCI', 'MTCI', 'NDRE']
+# 스택 파일 이름의 지수 자리에 들어가는 이름 (GJW1_02_250313_STACK.tif, 인벤토리로도 파싱 가능)
+STACK_NAME = 'STACK'
+# 스택을 만든 원본 지문/격자를 기록하는 태그 이름공간 (원본을 다시 열지 않고 최신 여부를 확인)
+STACK_TAG_NAMESPACE = 'band_stack'
+STACK_VERSION = 2
+
+
+def stack_filename(field, session, date):
+    """(필드, 회차, 촬영일)에 대한 스택 파일 이름을 만드는 함수 (date: 'YYYY-MM-DD')"""
+    return f"{field}_{int(session):02d}_{date.replace('-', '')[2:]}_{STACK_NAME}.tif"
+
+
+def dataset_grid(src):
+    """열린 래스터의 격자(CRS, 변환, 크기)를 비교/기록용 목록으로 반환하는 함수"""
+    return [src.crs.to_wkt() if src.crs else None, list(tuple(src.transform)[:6]), src.width, src.height]
+
+
+def source_fingerprints(rasters_by_index):
+    """{지수 이름: [원본 절대 경로, 크기, 수정 시각]} 지문을 만드는 함수 (파일은 열지 않음)"""
+    fingerprints = {}
+    for index_name, raster_path in rasters_by_index.items():
+        stat = os.stat(raster_path)
+        fingerprints[index_name] = [os.path.abspath(raster_path), stat.st_size, stat.st_mtime_ns]
+    return fingerprints
+
+
+def is_stack_current(src, rasters_by_index):
+    """열린 스택의 태그에 기록된 원본 지문이 현재 원본들과 같은지 확인하는 함수
+
+    수정 시각의 선후가 아니라 지문이 같은지를 보므로, 원본이 더 오래된 파일로 바뀐 경우나
+    지수 구성이 바뀐(원본 추가/삭제) 경우에도 다시 만들어집니다.
+    """
+    tags = src.tags(ns=STACK_TAG_NAMESPACE)
+    if tags.get('version') != str(STACK_VERSION):
+        return False
+    try:
+        return json.loads(tags['sources']) == source_fingerprints(rasters_by_index)
+    except (KeyError, ValueError):
+        return False
+
+
+def build_band_stack(rasters_by_index, stack_path, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                     block_size=DEFAULT_BLOCK_SIZE, compress=DEFAULT_COMPRESSION):
+    """지수별 단일 밴드 래스터들을 밴드 설명(지수 이름)이 붙은 하나의 타일 다중 밴드 래스터로 저장하는 함수
+
+    rasters_by_index: {지수 이름: 래스터 경로} (STACK_INDEX_NAMES 순서로 배치, 그 외 이름은 뒤에 추가)
+    원본마다 nodata 값이 다를 수 있으므로 float32로 저장하고 무효 픽셀은 NaN으로 통일합니다.
+    원본들의 격자가 서로 다르면 스택을 만들지 않고 None을 반환합니다.
+    원본 지문과 격자는 스택의 태그에 기록해 두어, 다음 실행에서는 원본을 열지 않고 최신 여부를 확인합니다.
+    """
+    index_names = [name for name in STACK_INDEX_NAMES if name in rasters_by_index]
+    index_names += sorted(name for name in rasters_by_index if name not in STACK_INDEX_NAMES)
+    fingerprints = source_fingerprints(rasters_by_index)
+
+    sources = [rasterio.open(rasters_by_index[name]) for name in index_names]
+    try:
+        first = sources[0]
+        grid = dataset_grid(first)
+        if any(dataset_grid(src) != grid for src in sources[1:]):
+            # 격자(CRS/해상도/크기)가 다른 래스터는 하나의 스택으로 묶을 수 없습니다.
+            return None
+        profile = {
+            'count': len(sources),
+            'dtype': 'float32',
+            'nodata': np.nan,
+            'width': first.width,
+            'height': first.height,
+            'crs': first.crs,
+            'transform': first.transform,
+        }
+        profile.update(tiled_profile('float32', block_size, compress))
+
+        # 여러 작업 프로세스가 같은 스택을 만들더라도 서로의 임시 파일을 덮어쓰지 않도록 프로세스별 이름을 씁니다.
+        tmp_path = stack_path + f".{os.getpid()}.tmp"
+        with rasterio.open(tmp_path, 'w', **profile) as dst:
+            for band, index_name in enumerate(index_names, start=1):
+                dst.set_band_description(band, index_name)
+            dst.update_tags(ns=STACK_TAG_NAMESPACE, version=str(STACK_VERSION),
+                            sources=json.dumps(fingerprints, ensure_ascii=False), grid=json.dumps(grid))
+            # 출력 타일 경계에 맞춰 윈도우를 나누고, 윈도우마다 모든 원본을 읽어 한 번에 씁니다.
+            for window in iter_windows(dst, 1, memory_budget_mb / len(sources)):
+                block = np.empty((len(sources), window.height, window.width), dtype='float32')
+                for k, src in enumerate(sources):
+                    data = src.read(1, window=window)
+                    block[k] = np.where(valid_mask(data, src.nodata), data, np.nan)
+                dst.write(block, window=window)
+        os.replace(tmp_path, stack_path)
+    finally:
+        for src in sources:
+            src.close()
+    return index_names
+
+
+def stack_band_indexes(src):
+    """스택 래스터의 {지수 이름: 밴드 번호} 딕셔너리를 반환하는 함수 (밴드 설명 기준)"""
+    return {description: band for band, description in enumerate(src.descriptions, start=1) if description}
+
+
+def ensure_band_stack(rasters_by_index, stack_folder, field, session, date,
+                      memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """(필드, 회차) 스택이 없거나 원본과 다르면 새로 만들고 (스택 경로, {지수 이름: 밴드 번호})를 반환하는 함수
+
+    스택이 최신이면 스택 파일 하나만 열고 원본은 열지 않습니다.
+    원본들의 격자가 서로 달라 스택을 만들 수 없으면 None을 반환합니다.
+    """
+    os.makedirs(stack_folder, exist_ok=True)
+    stack_path = os.path.join(stack_folder, stack_filename(field, session, date))
+    if os.path.exists(stack_path):
+        with rasterio.open(stack_path) as src:
+            if is_stack_current(src, rasters_by_index):
+                return stack_path, stack_band_indexes(src)
+    index_names = build_band_stack(rasters_by_index, stack_path, memory_budget_mb)
+    if index_names is None:
+        return None
+    return stack_path, {index_name: band for band, index_name in enumerate(index_names, start=1)}
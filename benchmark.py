@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import shutil
+import platform
+import argparse
+import subprocess
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import rasterio
+from rasterio.crs import CRS
+from rasterio.transform import from_bounds
+from rasterio.warp import transform_bounds
+from shapely.geometry import box
+
+import result_loader
+import zonal_engine
+from histogram import HistogramAccumulator
+from numpy_renderer import render_raster_png
+from pipeline_profiler import measure
+from raster_reader import iter_valid_values, iter_windows
+from raster_writer import tiled_profile
+from result_store import INDEX_NAMES
+from virtual_warp import open_raster
+from zonal_engine import ZoneSet, zonal_statistics
+
+# --- 1. 사용자 설정 부분 ---
+BENCH_FOLDER = 'benchmark_data'  # 합성 래스터/격자를 만들어 두는 폴더 (다음 실행에서 재사용)
+RESULTS_FILE = 'benchmark_results.jsonl'  # 벤치마크 결과 (한 줄에 한 측정, 커밋별로 누적)
+RASTER_SIZES = [1024, 4096]  # 합성 래스터 한 변의 픽셀 수 (--sizes 1024 4096 10000 40000 등으로 변경 가능)
+RASTER_CRSS = ['EPSG:5179', 'EPSG:32652', 'EPSG:4326']  # 합성 래스터 좌표계 (5179 외에는 재투영 단계도 측정)
+TARGET_CRS = 'EPSG:5179'  # 분석 좌표계 (격자 GeoJSON과 재투영 목표)
+PIXEL_SIZE_M = 0.05  # 드론 영상 해상도(m)
+ORIGIN_5179 = (942000.0, 1750000.0)  # 김제 시험 필드 부근 좌상단 좌표 (EPSG:5179)
+ZONE_SIZE_M = 1.0  # 조사 구역(격자 셀) 한 변 길이(m), geo_json_data와 같은 1m²
+ZONE_SPACING_M = 10.0  # 조사 구역 간격(m)
+NODATA = -10000.0
+REPORT_FIELDS = 50  # 결과 불러오기 측정에 쓸 합성 필드 결과 파일 수
+REPORT_SESSIONS = 6
+STAGES = ['reproject', 'virtual_warp', 'zonal', 'histogram', 'class_statistics', 'render', 'report_load']
+MEMORY_BUDGET_MB = 64
+REPEAT = 3  # 단계별 반복 횟수 (가장 빠른 값을 기록)
+SEED = 0
+# -------------------------
+
+GENERATOR_VERSION = 1
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename):
+    """숫자로 시작해 import할 수 없는 파이프라인 스크립트를 모듈로 불러오는 함수 (main은 실행하지 않음)"""
+    name = os.path.splitext(filename)[0].replace('.', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def git_revision():
+    """현재 커밋 해시와 작업 트리 변경 여부를 반환하는 함수 (git이 없으면 (None, None))"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_SCRIPT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=_SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        return commit, bool(status)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+# ------------------------- 합성 데이터 -------------------------
+
+def field_bounds_5179(size):
+    """한 변 size 픽셀 래스터가 덮는 EPSG:5179 범위 (minx, miny, maxx, maxy)를 반환하는 함수"""
+    extent = size * PIXEL_SIZE_M
+    minx, maxy = ORIGIN_5179
+    return minx, maxy - extent, minx + extent, maxy
+
+
+def synthetic_raster_path(size, crs):
+    return os.path.join(BENCH_FOLDER, f"bench_v{GENERATOR_VERSION}_{size}_{crs.replace(':', '')}_{SEED}.tif")
+
+
+def synthetic_values(rows, cols, size, rng):
+    """식생 지수처럼 보이는 값(완만한 공간 변화 + 잡음, 가장자리 nodata)을 만드는 함수"""
+    y = rows[:, None] / size
+    x = cols[None, :] / size
+    values = 0.55 + 0.2 * np.sin(x * 9.0) * np.cos(y * 7.0) + 0.1 * np.sin((x + y) * 31.0)
+    values = values + rng.normal(0.0, 0.05, size=values.shape)
+    # 드론 정사영상처럼 비스듬한 촬영 범위 밖은 nodata로 둡니다.
+    outside = (x + y < 0.08) | (x + y > 1.92)
+    return np.where(outside, NODATA, values).astype('float32')
+
+
+def make_synthetic_raster(size, crs):
+    """한 변 size 픽셀의 합성 지수 래스터를 crs 좌표계로 만드는 함수 (이미 있으면 재사용)
+
+    범위는 같은 땅(EPSG:5179 기준)을 덮도록 좌표계마다 변환하며, 블록 단위로 써서 40k² 크기도
+    메모리 한도 안에서 만듭니다.
+    """
+    path = synthetic_raster_path(size, crs)
+    if os.path.exists(path):
+        return path
+    os.makedirs(BENCH_FOLDER, exist_ok=True)
+
+    bounds = transform_bounds(CRS.from_user_input(TARGET_CRS), CRS.from_user_input(crs), *field_bounds_5179(size))
+    profile = {'count': 1, 'dtype': 'float32', 'nodata': NODATA, 'width': size, 'height': size,
+               'crs': CRS.from_user_input(crs), 'transform': from_bounds(*bounds, size, size)}
+    profile.update(tiled_profile('float32'))
+
+    tmp_path = path + '.tmp'
+    with rasterio.open(tmp_path, 'w', **profile) as dst:
+        for window in iter_windows(dst, 1, MEMORY_BUDGET_MB):
+            rng = np.random.default_rng((SEED, window.row_off, window.col_off))
+            rows = np.arange(window.row_off, window.row_off + window.height)
+            cols = np.arange(window.col_off, window.col_off + window.width)
+            dst.write(synthetic_values(rows, cols, size, rng), 1, window=window)
+    os.replace(tmp_path, path)
+    return path
+
+
+def make_synthetic_grid(size, field_code='BENCH-F1'):
+    """geo_json_data와 같은 형식(1m² 조사 구역, code/field_code/yield/protein)의 격자를 만드는 함수"""
+    minx, miny, maxx, maxy = field_bounds_5179(size)
+    xs = np.arange(minx + ZONE_SPACING_M / 2, maxx - ZONE_SIZE_M, ZONE_SPACING_M)
+    ys = np.arange(maxy - ZONE_SPACING_M / 2, miny + ZONE_SIZE_M, -ZONE_SPACING_M)
+    if len(xs) == 0 or len(ys) == 0:
+        xs, ys = np.array([minx + (maxx - minx) / 2]), np.array([miny + (maxy - miny) / 2])
+    rng = np.random.default_rng(SEED)
+    geometries = [box(x, y - ZONE_SIZE_M, x + ZONE_SIZE_M, y) for y in ys for x in xs]
+    codes = [f"{field_code}-{i + 1:02d}" for i in range(len(geometries))]
+    return gpd.GeoDataFrame({
+        'no': np.arange(1, len(geometries) + 1),
+        'code': codes,
+        'soil_code': codes,
+        'field_code': field_code,
+        'yield': rng.normal(500, 60, len(geometries)).round(),
+        'protein': rng.normal(12.0, 0.8, len(geometries)).round(2),
+    }, geometry=geometries, crs=TARGET_CRS)
+
+
+def make_synthetic_reports(zones_per_field):
+    """결과 불러오기 측정용 *_zonal_stats.geojson 파일들을 만드는 함수 (폴더 경로 반환)"""
+    folder = os.path.join(BENCH_FOLDER, f"reports_v{GENERATOR_VERSION}_{REPORT_FIELDS}_{zones_per_field}")
+    if os.path.isdir(folder):
+        return folder
+    tmp_folder = folder + '.tmp'
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    os.makedirs(tmp_folder)
+    rng = np.random.default_rng(SEED)
+    side = max(1, int(np.ceil(np.sqrt(zones_per_field))))
+    for k in range(REPORT_FIELDS):
+        grid = make_synthetic_grid(max(1, int(side * ZONE_SPACING_M / PIXEL_SIZE_M)), f"BENCH-F{k + 1}")
+        grid = grid.iloc[:zones_per_field].copy()
+        for index_name in INDEX_NAMES:
+            for session in range(1, REPORT_SESSIONS + 1):
+                grid[f"{index_name}_{session}"] = rng.normal(0.55, 0.1, len(grid))
+        grid.to_file(os.path.join(tmp_folder, f"wheat_yield_BENCH-F{k + 1}_zonal_stats.geojson"), driver='GeoJSON')
+    os.replace(tmp_folder, folder)
+    return folder
+
+
+# ------------------------- 단계별 측정 -------------------------
+
+def run_repeated(function, repeat):
+    """function을 repeat번 실행해 가장 빠른 실행의 측정값과 전체 시간 목록을 반환하는 함수"""
+    best, all_seconds, value = None, [], None
+    for _ in range(repeat):
+        with measure() as result:
+            value = function()
+        all_seconds.append(round(result['seconds'], 4))
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    best['seconds_all'] = all_seconds
+    return best, value
+
+
+def raster_stages(raster_path, grid, stages, repeat, scripts):
+    """래스터 하나에 대해 선택한 단계들을 측정하고 (단계 이름, 측정값, 처리량) 목록을 반환하는 함수"""
+    with rasterio.open(raster_path) as src:
+        pixels = src.width * src.height
+        source_crs = src.crs
+    work_folder = os.path.join(BENCH_FOLDER, 'work')
+    os.makedirs(work_folder, exist_ok=True)
+    warped = source_crs != CRS.from_user_input(TARGET_CRS)
+    rules = scripts['batch'].CLASSIFICATION_MAP['NDVI']
+    records = []
+
+    if 'reproject' in stages and warped:
+        output_path = os.path.join(work_folder, 'reprojected.tif')
+
+        def reproject():
+            scripts['reproject'].reproject_file(raster_path, output_path, CRS.from_user_input(TARGET_CRS),
+                                                num_threads=1, tiled=True)
+        result, _ = run_repeated(reproject, repeat)
+        records.append(('reproject', result, {'mpx_per_s': pixels / 1e6 / result['seconds']}))
+        os.remove(output_path)
+
+    if 'virtual_warp' in stages and warped:
+        def virtual_warp():
+            count = 0
+            with open_raster(raster_path, TARGET_CRS) as src:
+                for window in iter_windows(src, 1, MEMORY_BUDGET_MB):
+                    count += src.read(1, window=window).size
+            return count
+        result, warped_pixels = run_repeated(virtual_warp, repeat)
+        records.append(('virtual_warp', result, {'mpx_per_s': warped_pixels / 1e6 / result['seconds']}))
+
+    if 'zonal' in stages:
+        def zonal():
+            # 구역 라벨 캐시를 비워 래스터화 비용까지 매번 측정합니다.
+            zonal_engine.clear_zone_label_cache()
+            with rasterio.open(raster_path) as src:
+                geometries = ZoneSet(grid.geometry).in_crs(src.crs)
+                window = zonal_engine.zones_window(geometries, src)
+                zonal_statistics(geometries, src, memory_budget_mb=MEMORY_BUDGET_MB)
+            return window.width * window.height if window is not None else 0
+        result, window_pixels = run_repeated(zonal, repeat)
+        records.append(('zonal', result, {'zones': len(grid), 'zones_per_s': len(grid) / result['seconds'],
+                                          'mpx_per_s': window_pixels / 1e6 / result['seconds']}))
+
+    if 'histogram' in stages:
+        def histogram():
+            hist = HistogramAccumulator()
+            with rasterio.open(raster_path) as src:
+                for values in iter_valid_values(src, 1, MEMORY_BUDGET_MB):
+                    hist.update(values)
+            return hist
+        result, _ = run_repeated(histogram, repeat)
+        records.append(('histogram', result, {'mpx_per_s': pixels / 1e6 / result['seconds']}))
+
+    if 'class_statistics' in stages:
+        def class_statistics():
+            return scripts['batch'].compute_class_statistics(raster_path, rules, quick_look=False)
+        result, _ = run_repeated(class_statistics, repeat)
+        records.append(('class_statistics', result, {'mpx_per_s': pixels / 1e6 / result['seconds']}))
+
+    if 'render' in stages:
+        output_path = os.path.join(work_folder, 'render.png')
+
+        def render():
+            return render_raster_png(raster_path, output_path, rules, scripts['batch'].OUTPUT_WIDTH_PX)
+        result, _ = run_repeated(render, repeat)
+        records.append(('render', result, {'mpx_per_s': pixels / 1e6 / result['seconds']}))
+        os.remove(output_path)
+
+    return records
+
+
+def report_stages(zones_per_field, repeat):
+    """결과 불러오기(처음 읽기/디스크 캐시 읽기)를 측정하는 함수"""
+    folder = make_synthetic_reports(zones_per_field)
+    rows = REPORT_FIELDS * zones_per_field
+    cache_path = os.path.join(folder, result_loader.CACHE_FILENAME)
+
+    def cold_load():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        result_loader._MEMORY_CACHE.clear()
+        return result_loader.load_zonal_results(folder, None, attributes=['code', 'yield', 'protein'])
+
+    def cached_load():
+        result_loader._MEMORY_CACHE.clear()
+        return result_loader.load_zonal_results(folder, None, attributes=['code', 'yield', 'protein'])
+
+    records = []
+    for name, function in (('report_load', cold_load), ('report_load_cached', cached_load)):
+        result, _ = run_repeated(function, repeat)
+        records.append((name, result, {'rows': rows, 'rows_per_s': rows / result['seconds']}))
+    return records
+
+
+# ------------------------- 결과 기록/비교 -------------------------
+
+def append_results(records, metadata, results_file=RESULTS_FILE):
+    """측정 결과를 실행 정보와 함께 결과 파일에 한 줄씩 추가하는 함수"""
+    with open(results_file, 'a', encoding='utf-8') as f:
+        for stage_name, result, throughput, case in records:
+            record = dict(metadata)
+            record.update(case)
+            record['stage'] = stage_name
+            record.update({key: round(value, 4) if isinstance(value, float) else value
+                           for key, value in result.items()})
+            record.update({key: round(value, 3) if isinstance(value, float) else value
+                           for key, value in throughput.items()})
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def print_records(records):
+    print(f"\n{'단계':<20} {'크기':>7} {'좌표계':<11} {'시간(초)':>9} {'Mpx/s':>9} {'구역/s':>10} {'최대 RSS(MB)':>12} {'증가(MB)':>9}")
+    for stage_name, result, throughput, case in records:
+        mpx = throughput.get('mpx_per_s')
+        zones = throughput.get('zones_per_s', throughput.get('rows_per_s'))
+        peak, delta = result['peak_rss_mb'], result['rss_delta_mb']
+        print(f"{stage_name:<20} {case.get('size') or '-':>7} {case.get('crs') or '-':<11} {result['seconds']:>9.3f} "
+              f"{'-' if mpx is None else f'{mpx:.1f}':>9} {'-' if zones is None else f'{zones:.0f}':>10} "
+              f"{'-' if peak is None else peak:>12} {'-' if delta is None else delta:>9}")
+
+
+def compare_commits(results_file=RESULTS_FILE, base=None, head=None):
+    """결과 파일에서 두 커밋(기본: 마지막 두 커밋)의 같은 (단계, 크기, 좌표계) 측정을 비교해 출력하는 함수"""
+    if not os.path.exists(results_file):
+        print(f"[오류] 벤치마크 결과 파일이 없습니다: {results_file}")
+        return
+    results = pd.read_json(results_file, lines=True)
+    results['commit'] = results['commit'].fillna('unknown')
+    results['size'] = results['size'].fillna(0).astype(int)
+    results['crs'] = results['crs'].fillna('-')
+    commits = list(dict.fromkeys(results['commit']))
+    if head is None:
+        head = commits[-1]
+    if base is None:
+        earlier = [c for c in commits if c != head]
+        if not earlier:
+            print("[정보] 비교할 이전 커밋의 결과가 없습니다.")
+            return
+        base = earlier[-1]
+
+    # 같은 커밋에서 여러 번 측정했으면 가장 빠른 값을 사용합니다.
+    best = results.groupby(['stage', 'size', 'crs', 'commit'])['seconds'].min().unstack('commit')
+    if base not in best.columns or head not in best.columns:
+        print(f"[오류] 결과 파일에 없는 커밋입니다: {base if base not in best.columns else head}")
+        return
+    best = best[[base, head]].dropna()
+    print(f"--- 벤치마크 비교: {base} -> {head} (시간 비율 < 1이면 빨라짐) ---")
+    print(f"{'단계':<20} {'크기':>7} {'좌표계':<11} {base:>10} {head:>10} {'비율':>7}")
+    for (stage_name, size, crs), row in best.iterrows():
+        before, after = row[base], row[head]
+        print(f"{stage_name:<20} {size or '-':>7} {crs:<11} {before:>10.3f} {after:>10.3f} {after / before:>7.2f}")
+
+
+def main():
+    """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="합성 드론 래스터/격자로 파이프라인 단계별 처리량과 메모리 측정")
+    parser.add_argument('--sizes', type=int, nargs='+', default=RASTER_SIZES,
+                        help="합성 래스터 한 변의 픽셀 수 목록 (기본값: %(default)s, 최대 40000 정도)")
+    parser.add_argument('--crs', nargs='+', default=RASTER_CRSS, help="합성 래스터 좌표계 목록 (기본값: %(default)s)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help="측정할 단계")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="단계별 반복 횟수 (기본값: %(default)s)")
+    parser.add_argument('--results', default=RESULTS_FILE, help="결과 파일 (기본값: %(default)s)")
+    parser.add_argument('--compare', nargs='*', metavar='COMMIT',
+                        help="측정하지 않고 결과 파일의 두 커밋을 비교합니다. (커밋 생략 시 마지막 두 커밋)")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare_commits(args.results, *args.compare[:2])
+        return
+
+    commit, dirty = git_revision()
+    metadata = {
+        'run': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'rasterio': rasterio.__version__,
+        'gdal': rasterio.__gdal_version__,
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'memory_budget_mb': MEMORY_BUDGET_MB,
+    }
+    print(f"벤치마크 실행 시작... (커밋 {commit}{' + 수정 중' if dirty else ''}, 반복 {args.repeat}회)")
+
+    scripts = {'batch': load_script('1.process_batch_tif.py'), 'reproject': load_script('1_1.reproject_rasters.py')}
+    records = []
+    with rasterio.Env(GDAL_CACHEMAX=MEMORY_BUDGET_MB):
+        for size in args.sizes:
+            grid = make_synthetic_grid(size)
+            for crs in args.crs:
+                print(f"\n-> 합성 래스터 준비 중: {size}x{size} ({crs})")
+                raster_path = make_synthetic_raster(size, crs)
+                case = {'size': size, 'crs': crs}
+                for stage_name, result, throughput in raster_stages(raster_path, grid, args.stages, args.repeat,
+                                                                     scripts):
+                    records.append((stage_name, result, throughput, case))
+                    print(f"   {stage_name:<18} {result['seconds']:.3f}초")
+
+        if 'report_load' in args.stages:
+            print("\n-> 결과 불러오기 측정 중...")
+            zones_per_field = len(make_synthetic_grid(min(args.sizes)))
+            for stage_name, result, throughput in report_stages(zones_per_field, args.repeat):
+                records.append((stage_name, result, throughput, {'size': None, 'crs': None}))
+
+    append_results(records, metadata, args.results)
+    print_records(records)
+    print(f"\n[성공] 측정 결과 {len(records)}개를 '{args.results}'에 추가했습니다.")
+    print("   커밋 간 비교: python benchmark.py --compare [이전 커밋] [비교 커밋]")
+
+
+if __name__ == '__main__':
+    main()
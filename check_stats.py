@@ -1,24 +1,25 @@
 # check_stats.py
-import os, sys, glob
+import os, glob
 
-QGIS_INSTALL_PATH = 'C:/Program Files/QGIS 3.40.10' # 사용자의 QGIS 경로
-INPUT_FOLDER = 'data'
+from raster_catalog import RasterStatsCatalog
 
-# --- QGIS 환경 설정 ---
-py_path = os.path.join(QGIS_INSTALL_PATH, 'apps/qgis-ltr/python')
-if not os.path.isdir(py_path): py_path = os.path.join(QGIS_INSTALL_PATH, 'apps/qgis/python')
-sys.path.append(py_path)
-from qgis.core import QgsApplication, QgsRasterLayer
-qgs = QgsApplication([], False)
-qgs.initQgis()
+INPUT_FOLDER = 'data'
+STATS_CATALOG_FILE = 'raster_stats.sqlite'  # 래스터 통계 카탈로그 (한 번 계산한 파일은 다시 스캔하지 않음)
 
+# QGIS의 bandStatistics 대신 통계 카탈로그를 조회하므로 QGIS 환경 설정이 필요 없습니다.
 print("--- 각 GeoTIFF 파일의 통계 정보 ---")
 search_path = os.path.join(INPUT_FOLDER, '*.tif')
-for file_path in glob.glob(search_path):
-    layer = QgsRasterLayer(file_path, os.path.basename(file_path))
-    if layer.isValid():
-        stats = layer.dataProvider().bandStatistics(1)
-        print(f"{os.path.basename(file_path):<25} -> Min: {stats.minimumValue:.4f}, Max: {stats.maximumValue:.4f}")
+with RasterStatsCatalog(STATS_CATALOG_FILE) as catalog:
+    for file_path in sorted(glob.glob(search_path)):
+        try:
+            stats = catalog.statistics(file_path)
+        except Exception as e:
+            print(f"{os.path.basename(file_path):<25} -> [오류] {e}")
+            continue
+        if stats['valid_count'] == 0:
+            print(f"{os.path.basename(file_path):<25} -> 유효한 픽셀이 없습니다.")
+            continue
+        print(f"{os.path.basename(file_path):<25} -> Min: {stats['min']:.4f}, Max: {stats['max']:.4f}, "
+              f"Mean: {stats['mean']:.4f}, Std: {stats['std']:.4f}, NoData: {stats['nodata_count']}")
 
-qgs.exitQgis()
-print("---------------------------------")
\ No newline at end of file
+print("---------------------------------")
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+def get_class_breaks(rules):
+    """규칙집에서 숫자로 된 등급 경계값만 뽑아 배열로 반환하는 함수"""
+    return np.array([r[0] for r in rules if isinstance(r[0], (int, float))], dtype='float64')
+
+
+def classify_values(values, breaks):
+    """각 값이 속하는 등급 번호(0부터 시작)를 반환하는 함수
+
+    기존 if/elif 로직과 동일하게 '값 <= 경계값'이면 해당 등급에 속하고,
+    마지막 경계값보다 큰 값은 마지막 등급(len(breaks))이 됩니다.
+    """
+    return np.digitize(values, breaks, right=True)
+
+
+class ClassStatistics:
+    """등급별 픽셀 수/합계/최소/최대를 누적하는 클래스
+
+    값 목록을 만들지 않고 NumPy 축약 연산으로만 누적하므로,
+    블록 단위로 update()를 여러 번 호출하거나 merge()로 합칠 수 있습니다.
+    """
+
+    def __init__(self, rules):
+        self.labels = [r[2] for r in rules]
+        self.breaks = get_class_breaks(rules)
+        n_classes = len(self.labels)
+        self.count = np.zeros(n_classes, dtype='int64')
+        self.sum = np.zeros(n_classes, dtype='float64')
+        self.min = np.full(n_classes, np.inf)
+        self.max = np.full(n_classes, -np.inf)
+
+    def update(self, values, nodata=None):
+        """배열(또는 블록) 하나를 등급별 통계에 누적하는 함수"""
+        values = np.asarray(values).ravel()
+        if np.issubdtype(values.dtype, np.floating):
+            valid = np.isfinite(values)
+        else:
+            valid = np.ones(values.shape, dtype=bool)
+        if nodata is not None:
+            valid &= values != nodata
+        values = values[valid].astype('float64', copy=False)
+        if values.size == 0:
+            return self
+
+        n_classes = len(self.labels)
+        class_index = classify_values(values, self.breaks)
+        self.count += np.bincount(class_index, minlength=n_classes)
+        self.sum += np.bincount(class_index, weights=values, minlength=n_classes)
+
+        # 등급 수(5개)만큼만 반복하며, where 옵션으로 복사 없이 최소/최대를 구합니다.
+        for k in range(n_classes):
+            in_class = class_index == k
+            self.min[k] = min(self.min[k], np.min(values, where=in_class, initial=np.inf))
+            self.max[k] = max(self.max[k], np.max(values, where=in_class, initial=-np.inf))
+        return self
+
+    def merge(self, other):
+        """다른 ClassStatistics 결과를 합치는 함수 (블록/작업자별 부분 결과 병합용)"""
+        self.count += other.count
+        self.sum += other.sum
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self
+
+    def results(self):
+        """등급 라벨별 count/min/max/mean 딕셔너리를 반환하는 함수 (값이 없으면 None)"""
+        results = {}
+        for k, label in enumerate(self.labels):
+            count = int(self.count[k])
+            if count > 0:
+                results[label] = {
+                    'count': count,
+                    'min': float(self.min[k]),
+                    'max': float(self.max[k]),
+                    'mean': float(self.sum[k] / count),
+                }
+            else:
+                results[label] = {'count': 0, 'min': None, 'max': None, 'mean': None}
+        return results
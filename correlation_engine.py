@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.special import betainc
+except ImportError:  # SciPy가 없으면 정규 근사로 p-값을 계산
+    betainc = None
+
+from result_store import split_index_column
+
+CORRELATION_METHODS = ('pearson', 'spearman', 'kendall')
+DEFAULT_BOOTSTRAP = 1000
+BOOTSTRAP_BATCH = 200  # 부트스트랩 가중치 행렬을 한 번에 만드는 개수 (메모리 사용량 조절)
+KENDALL_BOOTSTRAP_MAX_N = 500  # 켄달 부트스트랩은 표본마다 n^2 연산이므로 이보다 많은 구역이면 신뢰구간 생략
+KENDALL_CHUNK_ROWS = 512  # 켄달 계산 시 한 번에 만드는 (행 묶음 x n) 부호 행렬의 행 수
+RESULT_COLUMNS = ['method', 'target', 'predictor', 'index', 'session', 'n', 'r', 'p_value', 'ci_low', 'ci_high']
+
+
+def _t_test_p_value(r, n):
+    """상관계수 r의 양측 p-값 (t 분포, 자유도 n - 2)"""
+    r = np.asarray(r, dtype='float64')
+    df = np.asarray(n, dtype='float64') - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_sq = r * r * df / np.clip(1 - r * r, 1e-300, None)
+        if betainc is not None:
+            p = betainc(df / 2, 0.5, df / (df + t_sq))
+        else:
+            p = np.array([math.erfc(math.sqrt(v / 2)) for v in np.ravel(t_sq)]).reshape(np.shape(t_sq))
+    return np.where(df > 0, p, np.nan)
+
+
+def _weighted_pearson(W, X, y):
+    """가중치(부트스트랩 표본 횟수) 행렬 W(B x n)로 모든 열의 피어슨 상관계수(B x p)를 행렬곱으로 구하는 함수"""
+    total = W.sum(axis=1, keepdims=True)
+    mean_x = (W @ X) / total
+    mean_y = (W @ y)[:, None] / total
+    cov = (W @ (X * y[:, None])) / total - mean_x * mean_y
+    var_x = (W @ (X * X)) / total - mean_x * mean_x
+    var_y = (W @ (y * y))[:, None] / total - mean_y * mean_y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt(var_x * var_y)
+
+
+def _weighted_pearson_rows(W, a, b):
+    """표본마다 다른 값(B x n)을 가진 두 변수의 가중 피어슨 상관계수(B)를 구하는 함수"""
+    total = W.sum(axis=1)
+    mean_a = (W * a).sum(axis=1) / total
+    mean_b = (W * b).sum(axis=1) / total
+    cov = (W * a * b).sum(axis=1) / total - mean_a * mean_b
+    var_a = (W * a * a).sum(axis=1) / total - mean_a * mean_a
+    var_b = (W * b * b).sum(axis=1) / total - mean_b * mean_b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt(var_a * var_b)
+
+
+def _pearson(X, y):
+    """모든 예측 변수 열과 목표 변수의 피어슨 상관계수를 한 번의 행렬 연산으로 구하는 함수"""
+    Xc = X - X.mean(axis=0)
+    yc = y - y.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (Xc.T @ yc) / np.sqrt((Xc * Xc).sum(axis=0) * (yc @ yc))
+
+
+def _tie_groups(column):
+    """정렬 순서와 동점 묶음 시작 위치, 각 행의 묶음 번호를 반환하는 함수"""
+    order = np.argsort(column, kind='mergesort')
+    sorted_values = column[order]
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    group_of_sorted = np.cumsum(np.r_[True, sorted_values[1:] != sorted_values[:-1]]) - 1
+    group_of_row = np.empty_like(group_of_sorted)
+    group_of_row[order] = group_of_sorted
+    return order, starts, group_of_row
+
+
+def _weighted_ranks(W, tie_groups):
+    """부트스트랩 표본(가중치)별 평균 순위(B x n)를 다시 정렬하지 않고 누적합으로 구하는 함수"""
+    order, starts, group_of_row = tie_groups
+    group_weight = np.add.reduceat(W[:, order], starts, axis=1)
+    group_rank = np.cumsum(group_weight, axis=1) - group_weight + (group_weight + 1) / 2
+    return group_rank[:, group_of_row]
+
+
+def _kendall_sums(column, y_sign_rows, rows, W=None):
+    """켄달 tau-b의 (일치-불일치 합, x 비동점 쌍 수)를 행 묶음 단위로 누적하는 함수
+
+    W가 있으면 부트스트랩 표본별로 w^T M w 형태의 이차형식을 계산합니다.
+    """
+    start, stop = rows
+    x_sign = np.sign(column[start:stop, None] - column[None, :])
+    concordance = x_sign * y_sign_rows
+    if W is None:
+        return concordance.sum(), np.abs(x_sign).sum()
+    W_rows = W[:, start:stop]
+    return ((W_rows @ concordance) * W).sum(axis=1), ((W_rows @ np.abs(x_sign)) * W).sum(axis=1)
+
+
+def _kendall(X, y, W=None):
+    """모든 예측 변수 열과 목표 변수의 켄달 tau-b (W가 있으면 부트스트랩 표본별 tau-b, B x p)"""
+    n, p = X.shape
+    shape = (p,) if W is None else (W.shape[0], p)
+    numerator = np.zeros(shape)
+    x_pairs = np.zeros(shape)
+    y_pairs = np.zeros(shape[:-1] + (1,)) if W is not None else 0.0
+    for start in range(0, n, KENDALL_CHUNK_ROWS):
+        stop = min(n, start + KENDALL_CHUNK_ROWS)
+        y_sign_rows = np.sign(y[start:stop, None] - y[None, :])
+        if W is None:
+            y_pairs += np.abs(y_sign_rows).sum()
+        else:
+            y_pairs[:, 0] += ((W[:, start:stop] @ np.abs(y_sign_rows)) * W).sum(axis=1)
+        for j in range(p):
+            concordance, x_count = _kendall_sums(X[:, j], y_sign_rows, (start, stop), W)
+            numerator[..., j] += concordance
+            x_pairs[..., j] += x_count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return numerator / np.sqrt(x_pairs * y_pairs)
+
+
+def _kendall_p_value(tau, X, y):
+    """켄달 tau-b의 양측 p-값 (동점 보정 분산을 쓰는 정규 근사, SciPy의 asymptotic 방식과 동일)"""
+    n = len(y)
+
+    def tie_terms(values):
+        _, counts = np.unique(values, return_counts=True)
+        counts = counts.astype('float64')
+        return ((counts * (counts - 1) * (2 * counts + 5)).sum(), (counts * (counts - 1)).sum(),
+                (counts * (counts - 1) * (counts - 2)).sum())
+
+    vu, u1, u2 = tie_terms(y)
+    p_values = np.full(len(tau), np.nan)
+    if n < 3:
+        return p_values
+    v0 = n * (n - 1) * (2 * n + 5)
+    total_pairs = n * (n - 1) / 2
+    for j in range(X.shape[1]):
+        vt, t1, t2 = tie_terms(X[:, j])
+        variance = ((v0 - vt - vu) / 18 + t1 * u1 / (2 * n * (n - 1))
+                    + t2 * u2 / (9 * n * (n - 1) * (n - 2)))
+        if variance <= 0 or not np.isfinite(tau[j]):
+            continue
+        # tau-b를 일치-불일치 차이(S)로 되돌려 검정 통계량을 만듭니다.
+        s = tau[j] * math.sqrt((total_pairs - t1 / 2) * (total_pairs - u1 / 2))
+        p_values[j] = math.erfc(abs(s) / math.sqrt(2 * variance))
+    return p_values
+
+
+def correlate(X, y, methods=CORRELATION_METHODS, n_bootstrap=DEFAULT_BOOTSTRAP, confidence=0.95, seed=0):
+    """예측 변수 행렬 X(n x p)와 목표 변수 y(n)의 상관계수/p-값/부트스트랩 신뢰구간을 구하는 함수
+
+    순위는 한 번만 계산해 스피어만에 재사용하고, 부트스트랩은 표본 추출 대신 다항분포 가중치 행렬로
+    모든 열과 표본을 행렬곱으로 동시에 계산합니다 (스피어만은 가중 누적합으로 재순위).
+    반환값: {방법: {'r': (p,), 'p_value': (p,), 'ci_low': (p,), 'ci_high': (p,)}}
+    """
+    X = np.asarray(X, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    need_ranks = 'spearman' in methods
+    rank_X = pd.DataFrame(X).rank(method='average').to_numpy() if need_ranks else None
+    rank_y = pd.Series(y).rank(method='average').to_numpy() if need_ranks else None
+
+    results = {}
+    for method in methods:
+        if method == 'pearson':
+            r = _pearson(X, y)
+            p_value = _t_test_p_value(r, n)
+        elif method == 'spearman':
+            r = _pearson(rank_X, rank_y)
+            p_value = _t_test_p_value(r, n)
+        elif method == 'kendall':
+            r = _kendall(X, y)
+            p_value = _kendall_p_value(r, X, y)
+        else:
+            raise ValueError(f"지원하지 않는 상관관계 방법입니다: {method}")
+        results[method] = {'r': r, 'p_value': p_value,
+                           'ci_low': np.full(len(r), np.nan), 'ci_high': np.full(len(r), np.nan)}
+
+    if n_bootstrap and n > 2:
+        rng = np.random.default_rng(seed)
+        samples = {method: [] for method in methods}
+        tie_groups_X = [_tie_groups(X[:, j]) for j in range(X.shape[1])] if need_ranks else None
+        tie_groups_y = _tie_groups(y) if need_ranks else None
+        for batch_start in range(0, n_bootstrap, BOOTSTRAP_BATCH):
+            batch = min(BOOTSTRAP_BATCH, n_bootstrap - batch_start)
+            # 각 행은 하나의 부트스트랩 표본에서 원래 행이 뽑힌 횟수입니다.
+            W = rng.multinomial(n, np.full(n, 1.0 / n), size=batch).astype('float64')
+            for method in methods:
+                if method == 'pearson':
+                    samples[method].append(_weighted_pearson(W, X, y))
+                elif method == 'spearman':
+                    ranks_y = _weighted_ranks(W, tie_groups_y)
+                    r_batch = np.empty((batch, X.shape[1]))
+                    for j, groups in enumerate(tie_groups_X):
+                        ranks_x = _weighted_ranks(W, groups)
+                        r_batch[:, j] = _weighted_pearson_rows(W, ranks_x, ranks_y)
+                    samples[method].append(r_batch)
+                elif method == 'kendall' and n <= KENDALL_BOOTSTRAP_MAX_N:
+                    samples[method].append(_kendall(X, y, W))
+
+        alpha = (1 - confidence) / 2 * 100
+        for method in methods:
+            if samples[method]:
+                stacked = np.vstack(samples[method])
+                with np.errstate(invalid='ignore'):
+                    results[method]['ci_low'] = np.nanpercentile(stacked, alpha, axis=0)
+                    results[method]['ci_high'] = np.nanpercentile(stacked, 100 - alpha, axis=0)
+    return results
+
+
+def correlation_table(df, targets, predictors=None, methods=CORRELATION_METHODS, n_bootstrap=DEFAULT_BOOTSTRAP,
+                      confidence=0.95, seed=0):
+    """{지수}_{회차} 예측 변수와 목표 변수들의 모든 쌍에 대한 상관관계 결과 표(긴 형식)를 만드는 함수
+
+    기존 DataFrame.corr와 같이 (목표, 예측 변수) 쌍마다 두 값이 모두 있는 구역(pairwise complete)을 사용하며,
+    결측 위치가 같은 예측 변수들을 묶어 묶음마다 한 번의 행렬 연산으로 계산합니다.
+    (회차가 없는 필드나 계산에 실패한 래스터가 있어도 다른 쌍의 구역은 줄어들지 않습니다.)
+    """
+    if predictors is None:
+        predictors = [column for column in df.columns if split_index_column(column)]
+
+    numeric = df[list(targets) + predictors].apply(pd.to_numeric, errors='coerce')
+    X_all = numeric[predictors].to_numpy(dtype='float64')
+    predictor_valid = ~np.isnan(X_all)
+
+    rows = []
+    for target in targets:
+        y_all = numeric[target].to_numpy(dtype='float64')
+        valid = predictor_valid & ~np.isnan(y_all)[:, None]
+
+        # 사용할 구역(행)이 같은 예측 변수끼리 묶습니다.
+        groups = {}
+        for j in range(len(predictors)):
+            groups.setdefault(np.packbits(valid[:, j]).tobytes(), []).append(j)
+
+        pair_results = {method: {} for method in methods}
+        pair_n = {}
+        for columns in groups.values():
+            mask = valid[:, columns[0]]
+            if mask.sum() < 2:
+                # 두 값이 모두 있는 구역이 2개 미만이면 상관계수를 정의할 수 없습니다.
+                empty = {key: np.full(len(columns), np.nan) for key in ('r', 'p_value', 'ci_low', 'ci_high')}
+                results = {method: empty for method in methods}
+            else:
+                results = correlate(X_all[np.ix_(mask, columns)], y_all[mask], methods, n_bootstrap, confidence,
+                                    seed)
+            for method, result in results.items():
+                for k, j in enumerate(columns):
+                    pair_results[method][j] = {key: values[k] for key, values in result.items()}
+            for j in columns:
+                pair_n[j] = int(mask.sum())
+
+        for method in methods:
+            for j, predictor in enumerate(predictors):
+                index_name, session = split_index_column(predictor) or (predictor, None)
+                result = pair_results[method][j]
+                rows.append({
+                    'method': method, 'target': target, 'predictor': predictor,
+                    'index': index_name, 'session': session, 'n': pair_n[j],
+                    'r': result['r'], 'p_value': result['p_value'],
+                    'ci_low': result['ci_low'], 'ci_high': result['ci_high'],
+                })
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
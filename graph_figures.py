@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import os
+
+import plotly.io as pio
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+INDEX_NAMES = ['BNVI', 'NDVI', 'GNDVI', 'LCI', 'MTCI', 'NDRE']
+SESSIONS = range(1, 7)
+
+# PNG 저장 크기 (기존 스크립트와 동일)
+IMAGE_WIDTH = 1200
+IMAGE_HEIGHT = 700
+IMAGE_SCALE = 2
+
+# HTML 파일들이 같은 폴더의 plotly.min.js 하나를 함께 참조하도록 저장 (파일마다 3MB 이상 내장하지 않음)
+HTML_PLOTLYJS = 'directory'
+
+
+def _add_yield_protein_traces(fig, df, x_axis_data):
+    """오른쪽 Y축에 수확량/단백질 막대그래프를 추가하는 함수"""
+    # B. 오른쪽 Y축 1: 수확량(yield) 막대그래프 추가
+    fig.add_trace(
+        go.Bar(x=x_axis_data, y=df['yield'], name='수확량',
+               marker_color='rgba(150, 150, 150, 0.6)'),
+        secondary_y=True
+    )
+
+    # C. 오른쪽 Y축 2: 단백질(protein) 막대그래프 추가
+    fig.add_trace(
+        go.Bar(x=x_axis_data, y=df['protein'], name='단백질', yaxis='y3',
+               marker_color='rgba(150, 150, 150, 0.6)')
+    )
+
+
+def _apply_layout(fig, title_text, sort_column, yaxis_title):
+    """그래프 레이아웃 및 축 설정을 적용하는 함수"""
+    fig.update_layout(
+        title_text=title_text,
+        xaxis_title=f"구역 ID ({sort_column})",
+        legend_title="데이터",
+        barmode='overlay',
+        yaxis=dict(
+            title=yaxis_title
+        ),
+        yaxis2=dict(
+            title="<b>수확량</b>",
+            side='right'
+        ),
+        yaxis3=dict(
+            title="<b>단백질</b>",
+            side='right',
+            anchor="free",
+            overlaying="y",
+            position=1.0
+        )
+    )
+    fig.update_traces(opacity=0.7, selector=dict(type="bar"))
+
+
+def build_index_figure(df, index_name, sort_column='code', sessions=SESSIONS):
+    """식생 지수 하나의 회차별 변화와 수확량/단백질을 함께 그린 그래프를 만드는 함수"""
+    x_axis_data = df[sort_column]
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # A. 왼쪽 Y축: 식생 지수 1~6회차 라인 추가
+    for i in sessions:
+        column_name = f"{index_name}_{i}"
+        fig.add_trace(
+            go.Scatter(x=x_axis_data, y=df[column_name], name=column_name),
+            secondary_y=False
+        )
+
+    _add_yield_protein_traces(fig, df, x_axis_data)
+    _apply_layout(fig, f"<b>{index_name} 시계열 변화와 수확량/단백질 관계</b>", sort_column, f"{index_name} 값")
+    return fig
+
+
+def build_session_figure(df, session_num, sort_column='code', index_names=INDEX_NAMES):
+    """한 회차의 모든 식생 지수와 수확량/단백질을 함께 그린 그래프를 만드는 함수"""
+    x_axis_data = df[sort_column]
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # A. 왼쪽 Y축: 해당 회차의 모든 식생 지수 라인 추가
+    for index_name in index_names:
+        column_name = f"{index_name}_{session_num}"
+        fig.add_trace(
+            go.Scatter(x=x_axis_data, y=df[column_name], name=column_name),
+            secondary_y=False
+        )
+
+    _add_yield_protein_traces(fig, df, x_axis_data)
+    _apply_layout(fig, f"<b>{session_num}회차 식생 지수와 수확량/단백질 관계</b>", sort_column, "식생 지수 값")
+    return fig
+
+
+def write_html_files(figures):
+    """(그래프, HTML 경로) 목록을 저장하는 함수 (plotly.js는 폴더마다 한 번만 저장)"""
+    for fig, output_html in figures:
+        os.makedirs(os.path.dirname(output_html) or '.', exist_ok=True)
+        fig.write_html(output_html, include_plotlyjs=HTML_PLOTLYJS)
+        print(f"   [성공] HTML 그래프가 '{output_html}' 파일로 저장되었습니다.")
+
+
+def write_png_files(figures):
+    """(그래프, PNG 경로) 목록을 한 번의 Kaleido 세션으로 저장하는 함수
+
+    plotly.io.write_images가 있는 버전(plotly 6.1 이상 + Kaleido 1.x)은 모든 그래프를 한 번에 넘기고,
+    이전 버전은 한 번 띄운 Kaleido 프로세스를 재사용하는 write_image를 차례로 호출합니다.
+    """
+    if not figures:
+        return
+    for _, output_png in figures:
+        os.makedirs(os.path.dirname(output_png) or '.', exist_ok=True)
+
+    write_images = getattr(pio, 'write_images', None)
+    if write_images is not None:
+        write_images([fig for fig, _ in figures], [path for _, path in figures],
+                     width=IMAGE_WIDTH, height=IMAGE_HEIGHT, scale=IMAGE_SCALE)
+    else:
+        for fig, output_png in figures:
+            fig.write_image(output_png, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, scale=IMAGE_SCALE)
+
+    for _, output_png in figures:
+        print(f"   [성공] 이미지 파일이 '{output_png}' 파일로 저장되었습니다.")
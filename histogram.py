@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# 식생 지수 히스토그램 기본 구간 (모든 파일/작업자가 같은 경계를 써야 결과를 합칠 수 있음)
+DEFAULT_VALUE_RANGE = (-2.0, 5.0)
+DEFAULT_BINS = 256
+
+
+class HistogramAccumulator:
+    """고정 구간 히스토그램을 블록 단위로 누적하는 클래스
+
+    구간 경계가 값 범위와 구간 수로만 정해지므로, 블록/파일/작업자별 부분 결과를
+    merge()로 그대로 더할 수 있습니다. 범위 밖의 값(경계값 포함)은 기존 필터와 같이 제외합니다.
+    """
+
+    def __init__(self, value_range=DEFAULT_VALUE_RANGE, bins=DEFAULT_BINS):
+        self.value_range = (float(value_range[0]), float(value_range[1]))
+        self.bins = int(bins)
+        self.counts = np.zeros(self.bins, dtype='int64')
+        self.total_count = 0  # 범위와 관계없는 전체 유효 픽셀 수
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def from_counts(cls, counts, value_range=DEFAULT_VALUE_RANGE, total_count=None, value_sum=0.0,
+                    value_min=np.inf, value_max=-np.inf):
+        """저장된 구간별 픽셀 수로 누적기를 다시 만드는 함수 (통계 카탈로그 조회용)"""
+        hist = cls(value_range, len(counts))
+        hist.counts = np.asarray(counts, dtype='int64').copy()
+        hist.total_count = int(hist.counts.sum() if total_count is None else total_count)
+        hist.sum = float(value_sum)
+        hist.min = float(value_min)
+        hist.max = float(value_max)
+        return hist
+
+    @property
+    def count(self):
+        """범위 안에 들어온 픽셀 수"""
+        return int(self.counts.sum())
+
+    @property
+    def bin_edges(self):
+        return np.linspace(self.value_range[0], self.value_range[1], self.bins + 1)
+
+    @property
+    def bin_centers(self):
+        edges = self.bin_edges
+        return (edges[:-1] + edges[1:]) / 2
+
+    def update(self, values):
+        """유효 픽셀 값 배열(블록) 하나를 누적하는 함수"""
+        values = np.asarray(values).ravel()
+        self.total_count += values.size
+        low, high = self.value_range
+        values = values[(values > low) & (values < high)]
+        if values.size == 0:
+            return self
+
+        # np.histogram과 같은 등간격 구간 번호를 직접 계산해 bincount로 셉니다. (정렬/탐색 없음)
+        scale = self.bins / (high - low)
+        bin_index = ((values.astype('float64', copy=False) - low) * scale).astype('int64')
+        np.clip(bin_index, 0, self.bins - 1, out=bin_index)
+        self.counts += np.bincount(bin_index, minlength=self.bins)
+
+        self.sum += float(values.sum(dtype='float64'))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        """다른 HistogramAccumulator 결과를 합치는 함수 (같은 구간 설정이어야 함)"""
+        if other.value_range != self.value_range or other.bins != self.bins:
+            raise ValueError("구간 설정이 다른 히스토그램은 합칠 수 없습니다.")
+        self.counts += other.counts
+        self.total_count += other.total_count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.sum / count if count else None
+
+    def top_bins(self, n=5):
+        """픽셀 수가 많은 순서대로 상위 n개 구간 번호를 반환하는 함수 (같으면 낮은 구간 우선)"""
+        return np.argsort(-self.counts, kind='stable')[:n]
+
+    def peaks(self, n=2):
+        """상위 n개 구간의 (중앙값, 픽셀 수) 목록을 반환하는 함수"""
+        centers = self.bin_centers
+        return [(float(centers[k]), int(self.counts[k])) for k in self.top_bins(n)]
+
+    def rebin(self, factor):
+        """인접한 factor개 구간을 합쳐 더 거친 히스토그램을 반환하는 함수 (경계가 그대로 맞아떨어짐)"""
+        if self.bins % factor:
+            raise ValueError(f"구간 수 {self.bins}는 {factor}로 나누어떨어져야 합니다.")
+        coarse = HistogramAccumulator(self.value_range, self.bins // factor)
+        coarse.counts = self.counts.reshape(-1, factor).sum(axis=1)
+        coarse.total_count = self.total_count
+        coarse.sum, coarse.min, coarse.max = self.sum, self.min, self.max
+        return coarse
+
+    def percentiles(self, qs):
+        """범위 안 값들의 백분위수를 구간 안 선형 보간으로 근사하는 함수 (오차는 구간 폭 이하)"""
+        count = self.count
+        if count == 0:
+            return [None for _ in qs]
+        edges = self.bin_edges
+        cumulative = np.cumsum(self.counts)
+        results = []
+        for q in qs:
+            target = count * q / 100.0
+            k = min(int(np.searchsorted(cumulative, target, side='left')), self.bins - 1)
+            before = cumulative[k - 1] if k > 0 else 0
+            fraction = (target - before) / self.counts[k] if self.counts[k] else 0.0
+            value = edges[k] + fraction * (edges[k + 1] - edges[k])
+            # 실제 최소/최대값을 벗어나지 않도록 자릅니다.
+            results.append(float(min(max(value, self.min), self.max)))
+        return results
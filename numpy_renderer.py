@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from rasterio.enums import Resampling
+from PIL import Image
+
+from class_statistics import classify_values, get_class_breaks
+from raster_reader import valid_mask
+from virtual_warp import open_raster
+
+
+def hex_to_rgba(hex_color, alpha=255):
+    """'#c51f1e' 형식의 색상 코드를 (R, G, B, A) 튜플로 변환하는 함수"""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4)) + (alpha,)
+
+
+def build_color_table(rules):
+    """등급 번호 -> RGBA 색상 조회 테이블을 만드는 함수 (마지막 행은 nodata용 투명색)"""
+    table = np.zeros((len(rules) + 1, 4), dtype='uint8')
+    for k, (_, color, _) in enumerate(rules):
+        table[k] = hex_to_rgba(color)
+    return table
+
+
+def render_classified_rgba(data, rules, nodata=None):
+    """단일 밴드 배열을 규칙집의 이산(Discrete) 색상으로 칠한 RGBA 배열을 반환하는 함수
+
+    QGIS Discrete 컬러 램프와 같이 '값 <= 경계값'인 첫 등급의 색을 사용하고,
+    마지막 경계값보다 큰 값은 마지막 등급 색, nodata는 투명으로 처리합니다.
+    """
+    table = build_color_table(rules)
+    class_index = classify_values(data, get_class_breaks(rules))
+    class_index[~valid_mask(data, nodata)] = len(rules)
+    return table[class_index]
+
+
+def render_raster_png(input_path, output_path, rules, output_width_px, target_crs=None):
+    """래스터를 output_width_px 폭으로 축소해 읽고 색상표를 적용하여 PNG로 저장하는 함수
+
+    QGIS 렌더링과 같은 출력 크기(폭 고정, 높이는 범위 비율)로 만들며,
+    오버뷰가 있는 파일은 GDAL이 해당 해상도의 오버뷰만 읽습니다.
+    target_crs를 지정하면 재투영 사본 없이 출력 해상도로 읽으면서 즉석에서 재투영합니다.
+    """
+    with open_raster(input_path, target_crs) as src:
+        bounds = src.bounds
+        output_height = int(output_width_px * (bounds.top - bounds.bottom) / (bounds.right - bounds.left))
+        data = src.read(1, out_shape=(max(1, output_height), output_width_px), resampling=Resampling.nearest)
+        nodata = src.nodata
+
+    rgba = render_classified_rgba(data, rules, nodata)
+    Image.fromarray(rgba, mode='RGBA').save(output_path, 'PNG')
+    return rgba.shape[1], rgba.shape[0]
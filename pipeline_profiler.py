@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+# 파이프라인 단계별 소요 시간/메모리 기록
+# 스크립트는 start_run()으로 실행을 감싸고 단계/파일별 작업을 stage()로 감쌉니다.
+# 기록은 기본으로 꺼져 있고, 스크립트에 --profile[=로그 파일]을 붙이거나 PIPELINE_PROFILE=1(또는 로그 파일)로 켭니다.
+# 단계가 끝날 때마다 소요 시간과 단계 동안의 최대 RSS가 JSON Lines 이벤트로 로그 파일에 추가됩니다.
+# 요약: python pipeline_profiler.py [--log pipeline_events.jsonl] [--script 2.zonal_statistics] [--runs 5]
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import contextlib
+
+# 기본 이벤트 로그 파일 (한 줄에 하나의 JSON 이벤트)
+DEFAULT_EVENT_LOG = 'pipeline_events.jsonl'
+# 단계 진행 중 RSS를 측정하는 간격(초)
+RSS_SAMPLE_INTERVAL = 0.05
+# 기록을 켜는 명령행 인자와 환경 변수
+PROFILE_FLAG = '--profile'
+PROFILE_ENV = 'PIPELINE_PROFILE'
+# 작업 프로세스에 실행 정보를 넘겨주는 환경 변수
+_ENV_LOG = 'PIPELINE_PROFILE_LOG'
+_ENV_RUN = 'PIPELINE_PROFILE_RUN'
+_ENV_SCRIPT = 'PIPELINE_PROFILE_SCRIPT'
+
+_MB = 1024 * 1024
+
+
+def current_rss_mb():
+    """현재 프로세스의 RSS(MB)를 반환하는 함수 (측정할 수 없으면 None)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / _MB
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / _MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_peak_rss_mb():
+    """프로세스 시작 이후 최대 RSS(MB)를 반환하는 함수 (운영체제가 제공하지 않으면 None)"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, 'peak_wset', info.rss) / _MB
+        except ImportError:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위로 반환합니다.
+    return peak / _MB if sys.platform == 'darwin' else peak / 1024
+
+
+def _round(value, digits=1):
+    return None if value is None else round(value, digits)
+
+
+class PipelineProfiler:
+    """한 번의 스크립트 실행에서 단계별 이벤트를 기록하는 클래스
+
+    log_path가 None이면 아무것도 기록하지 않으므로 스크립트 코드는 항상 stage()를 호출해도 됩니다.
+    """
+
+    def __init__(self, script, log_path=DEFAULT_EVENT_LOG, run_id=None, sample_interval=RSS_SAMPLE_INTERVAL):
+        self.script = script
+        self.log_path = log_path
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.sample_interval = sample_interval
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open = {}
+        self._stop = threading.Event()
+        self._sampler = None
+
+    @property
+    def enabled(self):
+        return self.log_path is not None
+
+    def emit(self, event, **fields):
+        """이벤트 한 줄을 로그 파일에 추가하는 함수 (여러 프로세스가 같은 파일에 추가해도 줄 단위로 기록)"""
+        if not self.enabled:
+            return
+        record = {'event': event, 'run': self.run_id, 'script': self.script, 'pid': os.getpid(),
+                  'time': round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"   [경고] 프로파일 이벤트를 기록할 수 없습니다: {e}")
+                self.log_path = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is None:
+            return
+        with self._lock:
+            for record in self._open.values():
+                if record['peak'] is None or rss > record['peak']:
+                    record['peak'] = rss
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            self._sample()
+
+    def _ensure_sampler(self):
+        if self._sampler is None and self.enabled:
+            self._sampler = threading.Thread(target=self._sample_loop, name='rss-sampler', daemon=True)
+            self._sampler.start()
+
+    @contextlib.contextmanager
+    def stage(self, name, file=None, **fields):
+        """블록 실행 시간과 그동안의 최대 RSS를 'stage' 이벤트로 기록하는 컨텍스트 관리자
+
+        file: 파일별 작업이면 대상 파일 경로 (요약에서 파일별 병목으로 집계)
+        fields: 이벤트에 함께 남길 값 (예: 픽셀 수, 작업 수)
+        """
+        if not self.enabled:
+            yield
+            return
+        self._ensure_sampler()
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        stack.append(name)
+
+        key = object()
+        rss_start = current_rss_mb()
+        with self._lock:
+            self._open[key] = {'peak': rss_start}
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self._sample()
+            with self._lock:
+                peak = self._open.pop(key)['peak']
+            stack.pop()
+            self.emit('stage', stage=name, parent=parent,
+                      file=os.path.basename(file) if file else None,
+                      seconds=round(seconds, 4), ok=ok,
+                      rss_start_mb=_round(rss_start), peak_rss_mb=_round(peak), **fields)
+
+    def __enter__(self):
+        """실행 시작 이벤트를 기록하고 작업 프로세스가 이어받을 환경 변수를 설정하는 함수"""
+        self._start = time.perf_counter()
+        if self.enabled:
+            os.environ[_ENV_LOG] = os.path.abspath(self.log_path)
+            os.environ[_ENV_RUN] = self.run_id
+            os.environ[_ENV_SCRIPT] = self.script
+            self.emit('run_start', argv=sys.argv[1:])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.emit('run_end', seconds=round(time.perf_counter() - self._start, 4), ok=exc_type is None,
+                  peak_rss_mb=_round(process_peak_rss_mb()))
+        self._stop.set()
+        for name in (_ENV_LOG, _ENV_RUN, _ENV_SCRIPT):
+            os.environ.pop(name, None)
+        global _ACTIVE
+        if _ACTIVE is self:
+            _ACTIVE = None
+        return False
+
+
+_ACTIVE = None
+
+
+def resolve_log_path(log_path):
+    """사용자 설정의 로그 파일과 --profile 인자/PIPELINE_PROFILE 환경 변수로 실제 이벤트 로그 파일을 정하는 함수
+
+    --profile 인자는 sys.argv에서 빼므로 스크립트의 argparse 인자와 충돌하지 않습니다.
+    켜졌는데 사용자 설정이 None이면 기본 로그 파일(DEFAULT_EVENT_LOG)에 기록합니다.
+    """
+    requested = None
+    argv = []
+    for arg in sys.argv[1:]:
+        if arg == PROFILE_FLAG:
+            requested = log_path or DEFAULT_EVENT_LOG
+        elif arg.startswith(PROFILE_FLAG + '='):
+            requested = arg.split('=', 1)[1] or log_path or DEFAULT_EVENT_LOG
+        else:
+            argv.append(arg)
+    sys.argv[1:] = argv
+    if requested is not None:
+        return requested
+
+    env_value = os.environ.get(PROFILE_ENV, '').strip()
+    if env_value.lower() in ('', '0', 'false', 'no'):
+        return log_path
+    if env_value.lower() in ('1', 'true', 'yes'):
+        return log_path or DEFAULT_EVENT_LOG
+    return env_value
+
+
+def start_run(script, log_path=None):
+    """스크립트 실행 전체를 감싸는 프로파일러를 만들어 활성화하는 함수 (with 문으로 사용)
+
+    script: 스크립트 이름 (보통 파일 이름에서 확장자를 뺀 값)
+    log_path: 사용자 설정의 이벤트 로그 파일 (None이면 --profile/PIPELINE_PROFILE을 줄 때만 기록)
+    """
+    global _ACTIVE
+    _ACTIVE = PipelineProfiler(script, resolve_log_path(log_path))
+    return _ACTIVE
+
+
+def get_profiler():
+    """현재 활성 프로파일러를 반환하는 함수
+
+    작업 프로세스에서는 부모 프로세스가 넘겨준 환경 변수로 같은 실행의 프로파일러를 만들고,
+    실행 중이 아니면 아무것도 기록하지 않는 프로파일러를 반환합니다.
+    """
+    global _ACTIVE
+    # fork로 만들어진 작업 프로세스는 부모의 프로파일러(잠금/측정 스레드)를 그대로 쓰지 않고 새로 만듭니다.
+    if _ACTIVE is None or _ACTIVE._pid != os.getpid():
+        log_path = os.environ.get(_ENV_LOG)
+        _ACTIVE = PipelineProfiler(os.environ.get(_ENV_SCRIPT, os.path.splitext(os.path.basename(sys.argv[0]))[0]),
+                                   log_path, os.environ.get(_ENV_RUN))
+    return _ACTIVE
+
+
+def stage(name, file=None, **fields):
+    """활성 프로파일러의 stage()를 호출하는 함수 (프로파일러가 없으면 기록하지 않음)"""
+    return get_profiler().stage(name, file, **fields)
+
+
+@contextlib.contextmanager
+def measure():
+    """블록의 소요 시간과 그동안의 최대 RSS를 측정하는 컨텍스트 관리자 (로그에는 기록하지 않음)
+
+    with measure() as result: 로 사용하며, 블록이 끝나면 result에
+    seconds, rss_start_mb, peak_rss_mb, rss_delta_mb(시작 대비 최대 증가량)가 채워집니다.
+    """
+    result = {}
+    rss_start = current_rss_mb()
+    peak = [rss_start]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss_mb()
+            if rss is not None and (peak[0] is None or rss > peak[0]):
+                peak[0] = rss
+
+    sampler = threading.Thread(target=sample, name='rss-measure', daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        seconds = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+        rss_end = current_rss_mb()
+        if rss_end is not None and (peak[0] is None or rss_end > peak[0]):
+            peak[0] = rss_end
+        result.update(seconds=seconds, rss_start_mb=_round(rss_start), peak_rss_mb=_round(peak[0]),
+                      rss_delta_mb=_round(peak[0] - rss_start if rss_start is not None else None))
+
+
+def script_name(path):
+    """스크립트 파일 경로에서 이벤트에 남길 스크립트 이름을 만드는 함수"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# ------------------------- 요약 명령 -------------------------
+
+def read_events(log_path=DEFAULT_EVENT_LOG, script=None, runs=None):
+    """이벤트 로그를 읽어 (실행 목록, 단계 이벤트 목록)을 반환하는 함수
+
+    script: 특정 스크립트의 이벤트만 사용
+    runs: 최근 N개 실행의 이벤트만 사용 (None이면 전체)
+    """
+    run_order = []
+    run_info = {}
+    stages = []
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # 기록 도중 중단된 줄은 건너뜀
+            if script is not None and event.get('script') != script:
+                continue
+            run_id = event.get('run')
+            if run_id not in run_info:
+                run_order.append(run_id)
+                run_info[run_id] = {'run': run_id, 'script': event.get('script'), 'seconds': None,
+                                    'peak_rss_mb': None, 'ok': None}
+            if event.get('event') == 'run_end':
+                run_info[run_id].update(seconds=event.get('seconds'), peak_rss_mb=event.get('peak_rss_mb'),
+                                        ok=event.get('ok'))
+            elif event.get('event') == 'stage':
+                stages.append(event)
+
+    if runs is not None:
+        run_order = run_order[-runs:]
+    selected = set(run_order)
+    return [run_info[r] for r in run_order], [e for e in stages if e.get('run') in selected]
+
+
+def summarize_stages(stages):
+    """(스크립트, 단계)별 횟수/합계/평균/최대 시간과 최대 RSS를 합계 시간 순으로 반환하는 함수"""
+    groups = {}
+    for event in stages:
+        key = (event.get('script'), event.get('stage'))
+        group = groups.setdefault(key, {'script': key[0], 'stage': key[1], 'count': 0, 'failed': 0,
+                                        'total_seconds': 0.0, 'max_seconds': 0.0, 'peak_rss_mb': None})
+        seconds = event.get('seconds') or 0.0
+        group['count'] += 1
+        group['failed'] += 0 if event.get('ok', True) else 1
+        group['total_seconds'] += seconds
+        group['max_seconds'] = max(group['max_seconds'], seconds)
+        peak = event.get('peak_rss_mb')
+        if peak is not None and (group['peak_rss_mb'] is None or peak > group['peak_rss_mb']):
+            group['peak_rss_mb'] = peak
+    for group in groups.values():
+        group['mean_seconds'] = group['total_seconds'] / group['count']
+    return sorted(groups.values(), key=lambda g: g['total_seconds'], reverse=True)
+
+
+def summarize_files(stages):
+    """(스크립트, 단계, 파일)별 합계/최대 시간과 최대 RSS를 합계 시간 순으로 반환하는 함수"""
+    groups = {}
+    for event in stages:
+        if not event.get('file'):
+            continue
+        key = (event.get('script'), event.get('stage'), event['file'])
+        group = groups.setdefault(key, {'script': key[0], 'stage': key[1], 'file': key[2], 'count': 0,
+                                        'total_seconds': 0.0, 'max_seconds': 0.0, 'peak_rss_mb': None})
+        seconds = event.get('seconds') or 0.0
+        group['count'] += 1
+        group['total_seconds'] += seconds
+        group['max_seconds'] = max(group['max_seconds'], seconds)
+        peak = event.get('peak_rss_mb')
+        if peak is not None and (group['peak_rss_mb'] is None or peak > group['peak_rss_mb']):
+            group['peak_rss_mb'] = peak
+    return sorted(groups.values(), key=lambda g: g['total_seconds'], reverse=True)
+
+
+def _format_mb(value):
+    return '-' if value is None else f"{value:.0f}"
+
+
+def print_summary(log_path=DEFAULT_EVENT_LOG, script=None, runs=None, top=10):
+    """이벤트 로그의 실행/단계별/파일별 병목 요약을 출력하는 함수"""
+    run_list, stages = read_events(log_path, script, runs)
+    if not run_list:
+        print("[정보] 요약할 실행 기록이 없습니다.")
+        return
+
+    print(f"--- 실행 {len(run_list)}개 ({log_path}) ---")
+    print(f"{'실행 ID':<24} {'스크립트':<28} {'시간(초)':>9} {'최대 RSS(MB)':>12}")
+    for run in run_list:
+        seconds = '-' if run['seconds'] is None else f"{run['seconds']:.1f}"
+        status = '' if run['ok'] is not False else ' (실패)'
+        print(f"{run['run']:<24} {run['script'] or '-':<28} {seconds:>9} {_format_mb(run['peak_rss_mb']):>12}{status}")
+
+    print("\n--- 단계별 소요 시간 (합계 순) ---")
+    print(f"{'스크립트':<28} {'단계':<20} {'횟수':>6} {'합계(초)':>9} {'평균(초)':>9} {'최대(초)':>9} {'최대 RSS(MB)':>12}")
+    for group in summarize_stages(stages):
+        failed = f" (실패 {group['failed']})" if group['failed'] else ''
+        print(f"{group['script']:<28} {group['stage']:<20} {group['count']:>6} {group['total_seconds']:>9.2f} "
+              f"{group['mean_seconds']:>9.3f} {group['max_seconds']:>9.3f} {_format_mb(group['peak_rss_mb']):>12}{failed}")
+
+    files = summarize_files(stages)[:top]
+    if files:
+        print(f"\n--- 파일별 병목 상위 {len(files)}개 ---")
+        print(f"{'파일':<36} {'단계':<20} {'횟수':>6} {'합계(초)':>9} {'최대(초)':>9} {'최대 RSS(MB)':>12}")
+        for group in files:
+            print(f"{group['file']:<36} {group['stage']:<20} {group['count']:>6} {group['total_seconds']:>9.2f} "
+                  f"{group['max_seconds']:>9.3f} {_format_mb(group['peak_rss_mb']):>12}")
+
+
+def main():
+    """요약 명령 실행 함수"""
+    parser = argparse.ArgumentParser(description="파이프라인 단계별/파일별 소요 시간과 메모리 요약")
+    parser.add_argument('--log', default=DEFAULT_EVENT_LOG, help="이벤트 로그 파일 (기본값: %(default)s)")
+    parser.add_argument('--script', help="특정 스크립트의 기록만 요약 (예: 2.zonal_statistics)")
+    parser.add_argument('--runs', type=int, help="최근 N개 실행만 요약 (기본값: 전체)")
+    parser.add_argument('--top', type=int, default=10, help="파일별 병목 출력 개수 (기본값: %(default)s)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"[오류] 이벤트 로그 파일이 없습니다: {args.log}")
+        return
+    print_summary(args.log, args.script, args.runs, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import sqlite3
+
+import numpy as np
+import rasterio
+
+from histogram import DEFAULT_BINS, DEFAULT_VALUE_RANGE, HistogramAccumulator
+from raster_reader import DEFAULT_MEMORY_BUDGET_MB, iter_blocks, valid_mask
+
+# 통계 카탈로그 기본 파일 (데이터 폴더와 같은 위치, 즉 스크립트 실행 폴더에 생성)
+DEFAULT_CATALOG_FILE = 'raster_stats.sqlite'
+CATALOG_VERSION = 1
+PERCENTILES = (2, 5, 25, 50, 75, 95, 98)
+# 백분위수 계산용 세밀한 구간 수 (DEFAULT_BINS로 나누어떨어져야 256 구간 히스토그램을 정확히 만들 수 있음)
+FINE_BINS_FACTOR = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raster_stats (
+    path TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    width INTEGER, height INTEGER, dtype TEXT, nodata REAL,
+    pixel_count INTEGER, valid_count INTEGER, nodata_count INTEGER,
+    min REAL, max REAL, mean REAL, std REAL,
+    percentiles TEXT,
+    hist_min REAL, hist_max REAL, hist_bins INTEGER, hist_sum REAL, hist_value_min REAL, hist_value_max REAL,
+    histogram BLOB,
+    computed_at REAL, elapsed REAL,
+    PRIMARY KEY (path, band)
+);
+CREATE TABLE IF NOT EXISTS raster_extra (
+    path TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (path, band, name)
+);
+"""
+
+
+def file_fingerprint(path):
+    """파일 크기와 수정 시각으로 만든 지문 문자열을 반환하는 함수"""
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def compute_raster_statistics(raster_path, band=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                              value_range=DEFAULT_VALUE_RANGE, bins=DEFAULT_BINS):
+    """래스터 밴드를 블록 단위로 한 번만 훑어 요약 통계와 히스토그램을 구하는 함수
+
+    평균/표준편차는 블록별 (개수, 평균, 편차제곱합)을 합치는 방식으로 계산해 큰 래스터에서도 안정적이며,
+    백분위수는 bins * FINE_BINS_FACTOR개의 세밀한 구간에서 근사합니다. (범위 안의 값 기준)
+    """
+    start_time = time.perf_counter()
+    fine = HistogramAccumulator(value_range, bins * FINE_BINS_FACTOR)
+    count, mean, m2 = 0, 0.0, 0.0
+    value_min, value_max = np.inf, -np.inf
+    pixel_count = 0
+
+    with rasterio.open(raster_path) as src:
+        nodata = src.nodatavals[band - 1]
+        for _, data in iter_blocks(src, band, memory_budget_mb):
+            pixel_count += data.size
+            values = data[valid_mask(data, nodata)]
+            if values.size == 0:
+                continue
+            fine.update(values)
+
+            values = values.astype('float64', copy=False)
+            block_count = values.size
+            block_mean = float(values.mean())
+            block_m2 = float(np.square(values - block_mean).sum())
+            delta = block_mean - mean
+            total = count + block_count
+            mean += delta * block_count / total
+            m2 += block_m2 + delta * delta * count * block_count / total
+            count = total
+            value_min = min(value_min, float(values.min()))
+            value_max = max(value_max, float(values.max()))
+        width, height, dtype = src.width, src.height, src.dtypes[band - 1]
+
+    histogram = fine.rebin(FINE_BINS_FACTOR)
+    return {
+        'width': width,
+        'height': height,
+        'dtype': dtype,
+        'nodata': nodata,
+        'pixel_count': pixel_count,
+        'valid_count': count,
+        'nodata_count': pixel_count - count,
+        'min': value_min if count else None,
+        'max': value_max if count else None,
+        'mean': mean if count else None,
+        'std': float(np.sqrt(m2 / count)) if count else None,
+        'percentiles': dict(zip(PERCENTILES, fine.percentiles(PERCENTILES))),
+        'histogram': histogram,
+        'elapsed': time.perf_counter() - start_time,
+    }
+
+
+class RasterStatsCatalog:
+    """래스터별 통계를 (경로 + 파일 지문) 기준으로 SQLite에 저장/조회하는 카탈로그
+
+    파일이 바뀌지 않았으면 저장된 통계를 바로 돌려주므로, 같은 래스터를 여러 스크립트에서
+    다시 전체 스캔하지 않습니다. 여러 프로세스가 같은 파일을 열어도 되도록 WAL 모드를 사용합니다.
+    """
+
+    def __init__(self, db_path=DEFAULT_CATALOG_FILE, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.db_path = db_path
+        self.memory_budget_mb = memory_budget_mb
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, raster_path, band=1):
+        """저장된 통계가 있고 파일이 바뀌지 않았으면 통계 딕셔너리를, 아니면 None을 반환하는 함수"""
+        row = self.conn.execute('SELECT * FROM raster_stats WHERE path = ? AND band = ?',
+                                (os.path.abspath(raster_path), band)).fetchone()
+        if row is None or row['version'] != CATALOG_VERSION or row['fingerprint'] != file_fingerprint(raster_path):
+            return None
+
+        stats = {key: row[key] for key in ('width', 'height', 'dtype', 'nodata', 'pixel_count', 'valid_count',
+                                           'nodata_count', 'min', 'max', 'mean', 'std', 'elapsed')}
+        stats['percentiles'] = {int(q): value for q, value in json.loads(row['percentiles']).items()}
+        stats['histogram'] = HistogramAccumulator.from_counts(
+            np.frombuffer(row['histogram'], dtype='int64'), (row['hist_min'], row['hist_max']),
+            total_count=row['valid_count'], value_sum=row['hist_sum'],
+            value_min=row['hist_value_min'], value_max=row['hist_value_max'])
+        return stats
+
+    def store(self, raster_path, stats, band=1, fingerprint=None):
+        """통계 딕셔너리를 카탈로그에 저장하는 함수"""
+        histogram = stats['histogram']
+        self.conn.execute(
+            'INSERT OR REPLACE INTO raster_stats VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (os.path.abspath(raster_path), band, fingerprint or file_fingerprint(raster_path), CATALOG_VERSION,
+             stats['width'], stats['height'], stats['dtype'], stats['nodata'],
+             stats['pixel_count'], stats['valid_count'], stats['nodata_count'],
+             stats['min'], stats['max'], stats['mean'], stats['std'],
+             json.dumps(stats['percentiles']),
+             histogram.value_range[0], histogram.value_range[1], histogram.bins, histogram.sum,
+             histogram.min, histogram.max, histogram.counts.astype('int64').tobytes(),
+             time.time(), stats['elapsed']))
+        self.conn.commit()
+
+    def statistics(self, raster_path, band=1):
+        """카탈로그를 먼저 조회하고, 없거나 파일이 바뀌었으면 한 번 계산해 저장한 뒤 반환하는 함수"""
+        stats = self.lookup(raster_path, band)
+        if stats is not None:
+            return stats
+        # 계산 도중 파일이 바뀌는 경우를 대비해 계산 전 지문으로 저장합니다.
+        fingerprint = file_fingerprint(raster_path)
+        stats = compute_raster_statistics(raster_path, band, self.memory_budget_mb)
+        self.store(raster_path, stats, band, fingerprint)
+        return stats
+
+    def lookup_extra(self, raster_path, name, band=1):
+        """래스터에 딸린 부가 결과(JSON)를 조회하는 함수 (예: 규칙집별 등급 통계)"""
+        row = self.conn.execute('SELECT fingerprint, value FROM raster_extra WHERE path = ? AND band = ? AND name = ?',
+                                (os.path.abspath(raster_path), band, name)).fetchone()
+        if row is None or row['fingerprint'] != file_fingerprint(raster_path):
+            return None
+        return json.loads(row['value'])
+
+    def store_extra(self, raster_path, name, value, band=1):
+        """래스터에 딸린 부가 결과(JSON으로 저장 가능한 값)를 저장하는 함수"""
+        self.conn.execute('INSERT OR REPLACE INTO raster_extra VALUES (?, ?, ?, ?, ?)',
+                          (os.path.abspath(raster_path), band, name, file_fingerprint(raster_path),
+                           json.dumps(value, ensure_ascii=False)))
+        self.conn.commit()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from rasterio.crs import CRS
+from rasterio.warp import transform_bounds
+from shapely.geometry import box
+from shapely.strtree import STRtree
+
+from raster_inventory import parse_raster_name
+
+
+def raster_footprint(entry, target_crs):
+    """인벤토리 항목의 래스터 범위를 target_crs 좌표계의 (minx, miny, maxx, maxy)로 반환하는 함수
+
+    좌표계나 범위 정보가 없는 래스터(헤더를 읽지 못한 파일 등)는 None을 반환합니다.
+    """
+    bounds = entry.get('bounds')
+    if not bounds or not entry.get('crs'):
+        return None
+    source_crs = CRS.from_user_input(entry['crs'])
+    if source_crs == target_crs:
+        return tuple(bounds)
+    # 모서리만 변환하면 휘어진 경계가 잘릴 수 있으므로 경계선을 촘촘히 나누어 변환합니다.
+    return transform_bounds(source_crs, target_crs, *bounds, densify_pts=21)
+
+
+class RasterFootprintIndex:
+    """인벤토리의 래스터 범위를 한 좌표계로 변환해 R-tree(STRtree)로 색인하는 클래스
+
+    구역 집합과 겹치는 래스터를 모든 래스터와 비교하지 않고 트리 조회로 찾으므로,
+    여러 필드를 담은 모자이크나 파일 이름 규칙과 다른 래스터도 실제 범위로 연결할 수 있습니다.
+    """
+
+    def __init__(self, inventory, target_crs):
+        self.target_crs = CRS.from_user_input(target_crs)
+        self.paths = []
+        self.footprints = []
+        for rel_path in sorted(inventory.entries):
+            try:
+                footprint = raster_footprint(inventory.entries[rel_path], self.target_crs)
+            except Exception as e:
+                print(f"   [경고] '{rel_path}' 범위를 변환할 수 없어 색인에서 제외합니다: {e}")
+                continue
+            if footprint is not None:
+                self.paths.append(inventory.path(rel_path))
+                self.footprints.append(box(*footprint))
+        self.tree = STRtree(self.footprints) if self.footprints else None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def query(self, geometries):
+        """구역 도형들 중 하나라도 겹치는 래스터 경로 목록을 이름순으로 반환하는 함수"""
+        if self.tree is None:
+            return []
+        geometries = [g for g in geometries if g is not None and not g.is_empty]
+        if not geometries:
+            return []
+        _, tree_indexes = self.tree.query(geometries, predicate='intersects')
+        return [self.paths[i] for i in np.unique(tree_indexes)]
+
+
+def select_field_rasters(raster_paths, field_id):
+    """겹치는 래스터 중 (회차, 지수)마다 하나만 고르는 함수 (같은 컬럼을 두 래스터가 덮어쓰지 않도록)
+
+    필드 이름이 일치하는 래스터(필드 전용 촬영본)를 모자이크보다 우선하고,
+    그 외에는 이름순으로 첫 번째 래스터를 사용합니다. 이름에서 회차/지수를 알 수 없는 래스터는 제외합니다.
+    """
+    selected = {}
+    for raster_path in sorted(raster_paths):
+        info = parse_raster_name(raster_path)
+        if info is None:
+            continue
+        key = (info['session'], info['index'])
+        current = selected.get(key)
+        if current is None or (info['field'] == field_id and parse_raster_name(current)['field'] != field_id):
+            selected[key] = raster_path
+    return sorted(selected.values())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+
+# 인벤토리 파일 이름 (래스터 폴더 안에 저장)
+INVENTORY_FILENAME = '.raster_inventory.json'
+INVENTORY_VERSION = 2  # 2: 래스터 범위(bounds) 추가
+RASTER_EXTENSIONS = ('.tif',)  # 기본 검색 확장자 (2/6 단계의 기존 '*.tif' 검색과 동일, 다르면 extensions로 지정)
+
+# GJW1_02_250313_BNVI.tif -> 필드 GJW1, 회차 2, 촬영일 2025-03-13, 지수 BNVI
+_RASTER_NAME_PATTERN = re.compile(r'^(?P<field>[^_]+)_(?P<session>\d+)_(?P<date>\d{6})_(?P<index>[^_.]+)',
+                                  re.IGNORECASE)
+
+
+def parse_raster_name(raster_filename):
+    """래스터 파일 이름에서 필드/회차/촬영일/지수 이름을 추출하는 함수 (형식이 다르면 None)"""
+    match = _RASTER_NAME_PATTERN.match(os.path.basename(raster_filename))
+    if match is None:
+        return None
+    date = match.group('date')
+    return {
+        'field': match.group('field'),
+        'session': int(match.group('session')),
+        'date': f"20{date[:2]}-{date[2:4]}-{date[4:]}",
+        'index': match.group('index'),
+    }
+
+
+def _read_raster_info(path):
+    """래스터 헤더만 읽어 CRS/크기/자료형/범위를 반환하는 함수 (픽셀은 읽지 않음)"""
+    import rasterio
+
+    try:
+        with rasterio.open(path) as src:
+            return {
+                'crs': src.crs.to_string() if src.crs else None,
+                'width': src.width,
+                'height': src.height,
+                'count': src.count,
+                'dtype': src.dtypes[0],
+                'bounds': list(src.bounds),
+            }
+    except Exception as e:
+        return {'error': str(e)}
+
+
+class RasterInventory:
+    """래스터 폴더를 한 번 훑어 파일 이름 정보와 헤더 정보를 인덱스로 관리하는 클래스
+
+    다음 실행에서는 크기/수정 시각이 같은 파일의 정보를 그대로 재사용하고,
+    새로 생기거나 바뀐 파일만 헤더를 다시 읽습니다. 조회는 (필드, 회차, 지수) 딕셔너리로 바로 찾습니다.
+    """
+
+    def __init__(self, root, recursive=False, index_path=None, extensions=RASTER_EXTENSIONS):
+        self.root = root
+        self.recursive = recursive
+        self.extensions = tuple(extensions)
+        self.index_path = index_path or os.path.join(root, INVENTORY_FILENAME)
+        self.entries = {}
+        self._by_key = {}
+        self._by_field = {}
+
+    @classmethod
+    def open(cls, root, recursive=False, index_path=None, verbose=True, extensions=RASTER_EXTENSIONS):
+        """인벤토리를 읽고 폴더 변경 사항을 반영해 반환하는 함수
+
+        extensions: 인벤토리에 넣을 파일 확장자 (예: ('.tif', '.tiff'), 대소문자 구분)
+        """
+        inventory = cls(root, recursive, index_path, extensions)
+        inventory.load()
+        changes = inventory.refresh()
+        if verbose and any(changes.values()):
+            print(f"[인벤토리] 추가 {changes['added']}개, 변경 {changes['updated']}개, "
+                  f"삭제 {changes['removed']}개 (총 {len(inventory.entries)}개 래스터)")
+        if any(changes.values()):
+            inventory.save()
+        return inventory
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"   [경고] 래스터 인벤토리를 읽을 수 없어 새로 만듭니다: {e}")
+            return
+        if data.get('version') == INVENTORY_VERSION and data.get('recursive') == self.recursive:
+            self.entries = data.get('entries', {})
+            self._build_lookup()
+
+    def save(self):
+        """인벤토리를 임시 파일에 쓴 뒤 교체하여 저장하는 함수 (쓰기 권한이 없으면 경고만 출력)"""
+        data = {'version': INVENTORY_VERSION, 'recursive': self.recursive, 'entries': self.entries}
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"   [경고] 래스터 인벤토리를 저장할 수 없습니다: {e}")
+
+    def _scan(self, folder):
+        """os.scandir로 폴더를 한 번 훑어 (상대 경로, stat) 목록을 만드는 함수"""
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if self.recursive:
+                    yield from self._scan(entry.path)
+            elif entry.name.endswith(self.extensions):
+                yield os.path.relpath(entry.path, self.root).replace(os.sep, '/'), entry.stat()
+
+    def refresh(self):
+        """폴더를 다시 훑어 새 파일/바뀐 파일만 갱신하고 변경 개수를 반환하는 함수"""
+        changes = {'added': 0, 'updated': 0, 'removed': 0}
+        seen = set()
+        for rel_path, stat in self._scan(self.root):
+            seen.add(rel_path)
+            fingerprint = f"{stat.st_size}-{stat.st_mtime_ns}"
+            known = self.entries.get(rel_path)
+            if known is not None and known['fingerprint'] == fingerprint:
+                continue
+
+            entry = {'name': os.path.basename(rel_path), 'size': stat.st_size, 'fingerprint': fingerprint}
+            entry.update(parse_raster_name(rel_path) or {'field': None, 'session': None, 'date': None, 'index': None})
+            entry.update(_read_raster_info(os.path.join(self.root, rel_path)))
+            self.entries[rel_path] = entry
+            changes['updated' if known is not None else 'added'] += 1
+
+        for rel_path in [p for p in self.entries if p not in seen]:
+            del self.entries[rel_path]
+            changes['removed'] += 1
+
+        self._build_lookup()
+        return changes
+
+    def _build_lookup(self):
+        self._by_key = {}
+        self._by_field = {}
+        for rel_path in sorted(self.entries):
+            entry = self.entries[rel_path]
+            if entry.get('field') is None:
+                continue
+            self._by_key[(entry['field'], entry['session'], entry['index'])] = rel_path
+            self._by_field.setdefault(entry['field'], []).append(rel_path)
+
+    def path(self, rel_path):
+        """인벤토리 상대 경로를 실제 파일 경로로 바꾸는 함수"""
+        return os.path.join(self.root, *rel_path.split('/'))
+
+    def get(self, field, session, index_name):
+        """(필드, 회차, 지수)에 해당하는 래스터 경로를 반환하는 함수 (없으면 None)"""
+        rel_path = self._by_key.get((field, int(session), index_name))
+        return self.path(rel_path) if rel_path else None
+
+    def find(self, field=None, session=None, index_name=None):
+        """조건에 맞는 래스터 경로 목록을 이름순으로 반환하는 함수"""
+        candidates = self._by_field.get(field, []) if field is not None else sorted(self.entries)
+        results = []
+        for rel_path in candidates:
+            entry = self.entries[rel_path]
+            if session is not None and entry['session'] != int(session):
+                continue
+            if index_name is not None and entry['index'] != index_name:
+                continue
+            results.append(self.path(rel_path))
+        return results
+
+    def info(self, raster_path):
+        """래스터 경로의 인벤토리 항목(필드/회차/촬영일/지수/CRS/크기 등)을 반환하는 함수"""
+        rel_path = os.path.relpath(raster_path, self.root).replace(os.sep, '/')
+        return self.entries.get(rel_path)
+
+    def all_paths(self):
+        """인벤토리에 있는 모든 래스터 경로를 이름순으로 반환하는 함수"""
+        return [self.path(rel_path) for rel_path in sorted(self.entries)]
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+# 한 번에 메모리에 올릴 블록 묶음의 기본 최대 크기(MB)
+DEFAULT_MEMORY_BUDGET_MB = 64
+
+
+def clip_window(src, window):
+    """윈도우를 정수 픽셀 경계로 넓히고 래스터 범위 안으로 자르는 함수"""
+    if window is None:
+        return 0, 0, src.width, src.height
+
+    col_start = max(0, int(math.floor(window.col_off)))
+    row_start = max(0, int(math.floor(window.row_off)))
+    col_end = min(src.width, int(math.ceil(window.col_off + window.width)))
+    row_end = min(src.height, int(math.ceil(window.row_off + window.height)))
+    return col_start, row_start, max(0, col_end - col_start), max(0, row_end - row_start)
+
+
+def _split_axis(start, length, block, chunk):
+    """start부터 length만큼의 구간을 내부 블록 경계에 맞춰 chunk 크기로 나누는 함수"""
+    end = start + length
+    position = start
+    while position < end:
+        # 첫 구간 이후에는 항상 블록 경계에서 시작하도록 맞춥니다.
+        next_position = min(end, (position // block) * block + chunk)
+        yield position, next_position - position
+        position = next_position
+
+
+def iter_windows(src, band=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, window=None):
+    """래스터를 내부 GeoTIFF 블록(타일/스트립) 경계에 맞춘 윈도우 단위로 나누어 반환하는 함수
+
+    여러 내부 블록을 memory_budget_mb를 넘지 않는 범위에서 묶어 하나의 윈도우로 만듭니다.
+    window를 지정하면 해당 영역만 순회합니다.
+    """
+    block_height, block_width = src.block_shapes[band - 1]
+    itemsize = np.dtype(src.dtypes[band - 1]).itemsize
+    budget_px = max(1, int(memory_budget_mb * 1024 * 1024) // itemsize)
+
+    col_start, row_start, width, height = clip_window(src, window)
+    if width == 0 or height == 0:
+        return
+
+    # 스트립 구조(블록 폭 = 래스터 폭)라면 열 방향은 픽셀 단위로 자유롭게 나눌 수 있습니다.
+    col_unit = block_width if block_width < src.width else 1
+
+    if width * block_height <= budget_px:
+        chunk_width = width
+    else:
+        chunk_width = max(col_unit, (budget_px // block_height) // col_unit * col_unit)
+    chunk_height = max(block_height, (budget_px // chunk_width) // block_height * block_height)
+
+    for row_off, win_height in _split_axis(row_start, height, block_height, chunk_height):
+        for col_off, win_width in _split_axis(col_start, width, col_unit, chunk_width):
+            yield Window(col_off, row_off, win_width, win_height)
+
+
+def iter_blocks(src, band=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, window=None):
+    """(윈도우, 배열) 쌍을 블록 단위로 읽어 반환하는 함수"""
+    for block_window in iter_windows(src, band, memory_budget_mb, window):
+        yield block_window, src.read(band, window=block_window)
+
+
+def iter_band_stack_blocks(src, bands, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, window=None):
+    """여러 밴드를 같은 윈도우로 한 번에 읽어 (윈도우, (밴드 수, 행, 열) 배열) 쌍으로 반환하는 함수
+
+    다중 밴드 스택에서 밴드마다 따로 읽지 않도록 하며, 메모리 한도는 밴드 수로 나누어 적용합니다.
+    """
+    bands = list(bands)
+    per_band_budget = memory_budget_mb / max(1, len(bands))
+    for block_window in iter_windows(src, bands[0], per_band_budget, window):
+        yield block_window, src.read(bands, window=block_window)
+
+
+def valid_mask(data, nodata=None):
+    """nodata와 NaN/inf를 제외한 유효 픽셀 마스크를 반환하는 함수"""
+    if np.issubdtype(data.dtype, np.floating):
+        mask = np.isfinite(data)
+    else:
+        mask = np.ones(data.shape, dtype=bool)
+    if nodata is not None and not (isinstance(nodata, float) and math.isnan(nodata)):
+        mask &= data != nodata
+    return mask
+
+
+def iter_valid_values(src, band=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, window=None):
+    """블록마다 nodata를 제외한 유효 픽셀 값만 1차원 배열로 반환하는 함수"""
+    nodata = src.nodatavals[band - 1]
+    for _, data in iter_blocks(src, band, memory_budget_mb, window):
+        yield data[valid_mask(data, nodata)]
+
+
+def read_decimated(src, band=1, max_width=1200, resampling=Resampling.nearest):
+    """래스터를 최대 max_width 폭으로 축소해 읽는 함수
+
+    오버뷰가 있는 파일(COG 등)은 GDAL이 목표 해상도에 맞는 오버뷰 수준을 골라 읽으므로
+    전체 해상도 픽셀을 건드리지 않습니다.
+    """
+    if src.width <= max_width:
+        return src.read(band)
+    out_height = max(1, int(round(src.height * max_width / src.width)))
+    return src.read(band, out_shape=(out_height, max_width), resampling=resampling)
+
+
+def read_decimated_values(src, band=1, max_width=1200):
+    """축소해 읽은 배열에서 nodata를 제외한 유효 값만 1차원 배열로 반환하는 함수"""
+    data = read_decimated(src, band, max_width)
+    return data[valid_mask(data, src.nodatavals[band - 1])]
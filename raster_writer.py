@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.shutil import copy as raster_copy
+
+# 타일 GeoTIFF / COG 기본 설정
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_COMPRESSION = 'DEFLATE'  # 'ZSTD'는 GDAL이 ZSTD를 지원하도록 빌드된 경우에만 사용 가능
+DEFAULT_OVERVIEW_FACTORS = [2, 4, 8, 16, 32]
+
+
+def predictor_for(dtype):
+    """자료형에 맞는 GeoTIFF 예측기 번호를 반환하는 함수 (실수형 3, 정수형 2)"""
+    return 3 if str(dtype).startswith('float') else 2
+
+
+def tiled_profile(dtype, block_size=DEFAULT_BLOCK_SIZE, compress=DEFAULT_COMPRESSION, num_threads=1):
+    """내부 타일 + 예측기 압축 GeoTIFF 생성 옵션을 만드는 함수"""
+    return {
+        'driver': 'GTiff',
+        'tiled': True,
+        'blockxsize': block_size,
+        'blockysize': block_size,
+        'compress': compress,
+        'predictor': predictor_for(dtype),
+        'num_threads': num_threads,
+        'BIGTIFF': 'IF_SAFER',
+    }
+
+
+def build_overviews(dst, factors=DEFAULT_OVERVIEW_FACTORS, resampling=Resampling.average):
+    """열린 데이터셋에 오버뷰 피라미드를 추가하는 함수 (래스터보다 작은 배율만 사용)"""
+    factors = [f for f in factors if min(dst.width, dst.height) // f >= 1]
+    if factors:
+        dst.build_overviews(factors, resampling)
+        dst.update_tags(ns='rio_overview', resampling=resampling.name)
+
+
+def write_cog(src_path, dst_path, compress=DEFAULT_COMPRESSION, block_size=DEFAULT_BLOCK_SIZE,
+              overview_resampling='AVERAGE', num_threads=1):
+    """래스터를 Cloud-Optimized GeoTIFF(타일 + 압축 + 오버뷰)로 저장하는 함수
+
+    GDAL COG 드라이버(GDAL 3.1 이상)가 오버뷰 피라미드를 만들고,
+    헤더/오버뷰/타일을 읽기 좋은 순서로 배치합니다.
+    """
+    tmp_path = dst_path + '.cog.tmp'
+    raster_copy(src_path, tmp_path, driver='COG',
+                COMPRESS=compress, PREDICTOR='YES', BLOCKSIZE=block_size,
+                OVERVIEWS='IGNORE_EXISTING', OVERVIEW_RESAMPLING=overview_resampling,
+                NUM_THREADS=num_threads, BIGTIFF='IF_SAFER')
+    os.replace(tmp_path, dst_path)
+
+
+def is_cog_layout(path):
+    """파일이 타일 구조이고 오버뷰를 가진 GeoTIFF인지 확인하는 함수"""
+    with rasterio.open(path) as src:
+        block_height, block_width = src.block_shapes[0]
+        is_tiled = block_width < src.width and block_height > 1
+        return is_tiled and bool(src.overviews(1))
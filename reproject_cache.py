@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import hashlib
+
+# 매니페스트 파일 이름 (출력 폴더 안에 저장)
+MANIFEST_FILENAME = '.reproject_cache.json'
+MANIFEST_VERSION = 1
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def file_content_hash(path):
+    """파일 내용 전체의 SHA-256 해시를 계산하는 함수 (청크 단위로 읽음)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReprojectCache:
+    """재투영 결과를 (원본 내용 해시 + 목표 CRS + 리샘플링 + 해상도) 키로 관리하는 캐시
+
+    매니페스트에는 원본 파일의 크기/수정 시각과 해시를 함께 저장하므로,
+    바뀌지 않은 원본은 다시 해시하지 않고 밀리초 단위로 건너뛸 수 있습니다.
+    출력 파일의 크기/수정 시각도 기록해 두어 삭제되거나 덮어써진 결과를 감지합니다.
+    """
+
+    def __init__(self, cache_dir, max_size_gb=None, max_age_days=None):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+        self.max_size_bytes = None if max_size_gb is None else int(max_size_gb * 1024 ** 3)
+        self.max_age_seconds = None if max_age_days is None else max_age_days * 24 * 3600
+        self.sources = {}
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"   [경고] 캐시 매니페스트를 읽을 수 없어 새로 만듭니다: {e}")
+            return
+        if manifest.get('version') != MANIFEST_VERSION:
+            return
+        self.sources = manifest.get('sources', {})
+        self.entries = manifest.get('entries', {})
+
+    def save(self):
+        """매니페스트를 임시 파일에 쓴 뒤 교체하여 저장하는 함수"""
+        manifest = {'version': MANIFEST_VERSION, 'sources': self.sources, 'entries': self.entries}
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def source_hash(self, source_path):
+        """원본 파일의 내용 해시를 반환하는 함수 (크기/수정 시각이 같으면 저장된 해시 재사용)"""
+        abs_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+        known = self.sources.get(abs_path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['hash']
+
+        content_hash = file_content_hash(source_path)
+        self.sources[abs_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': content_hash}
+        return content_hash
+
+    @staticmethod
+    def make_key(source_hash, target_crs, resampling, resolution, output_profile=None):
+        """캐시 키를 만드는 함수 (output_profile: 타일/압축 등 출력 형식 옵션)"""
+        params = json.dumps([source_hash, str(target_crs), str(resampling), resolution, output_profile],
+                            sort_keys=True)
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+    def lookup(self, key, output_path):
+        """키에 해당하는 결과가 output_path에 손상 없이 남아 있으면 True를 반환하는 함수"""
+        entry = self.entries.get(key)
+        if entry is None or entry['output'] != os.path.abspath(output_path):
+            return False
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return False
+        if stat.st_size != entry['output_size'] or stat.st_mtime_ns != entry['output_mtime_ns']:
+            return False
+        entry['last_used'] = time.time()
+        return True
+
+    def store(self, key, source_path, output_path, params=None):
+        """새로 만든 결과를 캐시에 등록하고 매니페스트를 저장하는 함수"""
+        abs_output = os.path.abspath(output_path)
+        # 같은 출력 경로를 가리키던 이전 항목은 더 이상 유효하지 않으므로 제거합니다.
+        for old_key in [k for k, e in self.entries.items() if e['output'] == abs_output]:
+            del self.entries[old_key]
+
+        stat = os.stat(output_path)
+        now = time.time()
+        self.entries[key] = {
+            'source': os.path.abspath(source_path),
+            'output': abs_output,
+            'output_size': stat.st_size,
+            'output_mtime_ns': stat.st_mtime_ns,
+            'params': params or {},
+            'created': now,
+            'last_used': now,
+        }
+        self.save()
+
+    def evict(self):
+        """오래되었거나 전체 용량을 넘는 캐시 결과를 오래 사용하지 않은 순서로 삭제하는 함수"""
+        now = time.time()
+        removed = []
+        by_last_used = sorted(self.entries.items(), key=lambda item: item[1]['last_used'])
+
+        total_size = sum(e['output_size'] for e in self.entries.values())
+        for key, entry in by_last_used:
+            too_old = self.max_age_seconds is not None and now - entry['last_used'] > self.max_age_seconds
+            too_big = self.max_size_bytes is not None and total_size > self.max_size_bytes
+            if not (too_old or too_big):
+                continue
+            if os.path.exists(entry['output']):
+                os.remove(entry['output'])
+            total_size -= entry['output_size']
+            removed.append(os.path.basename(entry['output']))
+            del self.entries[key]
+
+        # 원본 파일이 사라진 해시 기록도 함께 정리합니다.
+        for path in [p for p in self.sources if not os.path.exists(p)]:
+            del self.sources[path]
+
+        self.save()
+        return removed
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import os
+import glob
+import pickle
+
+import pandas as pd
+import geopandas as gpd
+
+from result_store import SOURCE_MARKER, INDEX_NAMES, fresh_partition_fields, read_zonal_dataset, split_index_column
+
+# 합쳐진 결과 프레임을 저장해 두는 캐시 파일 이름 (결과 GeoJSON 폴더 안에 저장)
+CACHE_FILENAME = '.zonal_results_cache.pkl'
+CACHE_VERSION = 2
+
+# 같은 프로세스 안에서 여러 번 불러올 때 재사용하는 메모리 캐시
+_MEMORY_CACHE = {}
+
+
+def _source_files(geojson_folder, dataset_folder):
+    """결과 프레임을 만드는 데 쓰이는 원본 파일 목록을 반환하는 함수"""
+    files = glob.glob(os.path.join(geojson_folder, '*_zonal_stats.geojson'))
+    if dataset_folder and os.path.isdir(dataset_folder):
+        files += glob.glob(os.path.join(dataset_folder, '**', '*.parquet'), recursive=True)
+        files += glob.glob(os.path.join(dataset_folder, '*', SOURCE_MARKER))
+    return sorted(files)
+
+
+def _fingerprints(files):
+    """원본 파일별 (크기, 수정 시각) 지문을 만드는 함수"""
+    fingerprints = {}
+    for path in files:
+        stat = os.stat(path)
+        fingerprints[os.path.abspath(path)] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprints
+
+
+def _selected_columns(columns, attributes=None, indices=None, sessions=None, exclude=()):
+    """조건에 맞는 속성/{지수}_{회차} 컬럼을 원래 순서대로 고르는 함수"""
+    selected = []
+    for column in columns:
+        if column in exclude:
+            continue
+        parsed = split_index_column(column)
+        if parsed is None:
+            if attributes is None or column in attributes:
+                selected.append(column)
+        elif (parsed[0] in (indices or INDEX_NAMES)) and (sessions is None or parsed[1] in sessions):
+            selected.append(column)
+    return selected
+
+
+def _read_geojson(path, selection):
+    """결과 GeoJSON 하나에서 선택한 컬럼만 남기는 함수 (geometry가 필요 없으면 도형을 해석하지 않음)"""
+    attributes, indices, sessions, geometry = selection
+    if not geometry:
+        df = gpd.read_file(path, ignore_geometry=True)
+        return df[_selected_columns(df.columns, attributes, indices, sessions)]
+    gdf = gpd.read_file(path)
+    geometry_column = gdf.geometry.name
+    return gdf[_selected_columns(gdf.columns, attributes, indices, sessions, (geometry_column,)) + [geometry_column]]
+
+
+def _build_frame(geojson_files, dataset_folder, selection):
+    """결과 GeoJSON 파일들에서 선택한 컬럼만 읽어 하나의 프레임으로 합치는 함수
+
+    GeoParquet 저장소에 GeoJSON과 같은 내용(같은 지문)으로 기록된 필드는 저장소에서 필요한 컬럼과
+    파티션만 읽고, 파티션이 없거나 GeoJSON보다 오래된 필드, 원본 GeoJSON이 없어진 파티션은 사용하지 않습니다.
+    """
+    attributes, indices, sessions, geometry = selection
+    fresh = {}
+    if dataset_folder and os.path.isdir(dataset_folder):
+        fresh = fresh_partition_fields(geojson_files, dataset_folder)
+
+    frames = []
+    if fresh:
+        filters = {'field_code': sorted(set(fresh.values()))}
+        if sessions is not None:
+            filters['session'] = list(sessions)
+        df = read_zonal_dataset(dataset_folder, indices=indices, attributes=attributes, filters=filters,
+                                geometry=geometry)
+        geometry_columns = [df.geometry.name] if geometry else []
+        frames.append(df[_selected_columns(df.columns, attributes, indices, sessions, geometry_columns)
+                         + geometry_columns])
+    frames += [_read_geojson(f, selection) for f in geojson_files if f not in fresh]
+
+    frame = pd.concat(frames, ignore_index=True)
+    if geometry:
+        frame = gpd.GeoDataFrame(frame, geometry=frames[0].geometry.name, crs=frames[0].crs)
+    return frame
+
+
+def _selection_key(attributes, indices, sessions, geometry):
+    """컬럼 선택 조건을 캐시 키로 쓸 수 있는 튜플로 만드는 함수"""
+    return (None if attributes is None else tuple(attributes),
+            None if indices is None else tuple(indices),
+            None if sessions is None else tuple(sessions),
+            bool(geometry))
+
+
+def _load_frame(geojson_folder, dataset_folder, selection):
+    """원본이 바뀌지 않았으면 메모리/디스크 캐시를, 바뀌었으면 새로 읽은 선택 컬럼 프레임을 반환하는 함수
+
+    캐시 파일에는 같은 원본 지문에 대해 선택 조건별 프레임을 함께 보관하고,
+    원본이 바뀌면 모든 선택 조건의 프레임을 버리고 다시 만듭니다.
+    """
+    geojson_files = glob.glob(os.path.join(geojson_folder, '*_zonal_stats.geojson'))
+    if not geojson_files:
+        return None
+
+    fingerprints = _fingerprints(_source_files(geojson_folder, dataset_folder))
+    memory_key = (os.path.abspath(geojson_folder), selection)
+
+    cached = _MEMORY_CACHE.get(memory_key)
+    if cached is not None and cached['fingerprints'] == fingerprints:
+        return cached['frame']
+
+    cache_path = os.path.join(geojson_folder, CACHE_FILENAME)
+    stored = {'version': CACHE_VERSION, 'fingerprints': fingerprints, 'frames': {}, 'schemas': {}}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                loaded = pickle.load(f)
+            if loaded.get('version') == CACHE_VERSION and loaded.get('fingerprints') == fingerprints:
+                stored = loaded
+        except Exception as e:
+            print(f"[경고] 결과 캐시를 읽을 수 없어 다시 만듭니다: {e}")
+
+    frame = stored['frames'].get(selection)
+    if frame is None:
+        frame = _build_frame(geojson_files, dataset_folder, selection)
+        stored['frames'][selection] = frame
+        stored['schemas'][selection] = {column: str(dtype) for column, dtype in frame.dtypes.items()}
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(stored, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    _MEMORY_CACHE[memory_key] = {'fingerprints': fingerprints, 'frame': frame}
+    return frame
+
+
+def load_zonal_results(geojson_folder='result_geojson', dataset_folder=None, attributes=None, indices=None,
+                       sessions=None, geometry=False, sort_by='code'):
+    """모든 구역 통계 결과를 합친 프레임을 반환하는 함수 (결과 파일이 없으면 None)
+
+    합친 결과는 원본 파일 지문과 함께 캐시 파일에 저장되므로, 원본 *_zonal_stats.geojson
+    (또는 GeoParquet 파일)이 바뀌지 않는 한 다음 실행에서는 다시 파싱하지 않습니다.
+    attributes/indices/sessions로 고른 컬럼과 회차만 읽으며(GeoParquet은 해당 컬럼/파티션만 읽음),
+    geometry=False면 도형을 해석하지 않고 geometry 컬럼을 뺀 일반 DataFrame을 반환합니다.
+    """
+    frame = _load_frame(geojson_folder, dataset_folder, _selection_key(attributes, indices, sessions, geometry))
+    if frame is None:
+        return None
+
+    result = frame.copy()
+    if sort_by and sort_by in result.columns:
+        result = result.sort_values(by=sort_by)
+    return result.reset_index(drop=True)
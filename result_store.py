@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import glob
+import json
+import shutil
+
+import pandas as pd
+import geopandas as gpd
+import pyarrow.dataset as ds
+
+# 구역 통계 결과의 열(列) 저장소 기본 폴더 (field_code=.../session=.../part-0.parquet 구조)
+DEFAULT_DATASET_FOLDER = 'result_parquet'
+INDEX_NAMES = ['BNVI', 'NDVI', 'GNDVI', 'LCI', 'MTCI', 'NDRE']
+PARTITION_COLUMNS = ['field_code', 'session']
+ZONE_ID_COLUMN = 'zone_id'
+# 필드 파티션을 만든 결과 GeoJSON의 지문 기록 ('_'로 시작하므로 pyarrow가 데이터 파일로 읽지 않음)
+SOURCE_MARKER = '_source.json'
+
+_INDEX_COLUMN_PATTERN = re.compile(r'^(%s)_(\d+)$' % '|'.join(INDEX_NAMES))
+
+
+def split_index_column(column):
+    """'BNVI_3' 형식의 컬럼명을 ('BNVI', 3)으로 나누는 함수 (지수 컬럼이 아니면 None)"""
+    match = _INDEX_COLUMN_PATTERN.match(column)
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+def to_long_format(gdf):
+    """{지수}_{회차} 형식의 넓은 표를 (구역, 회차)당 한 행인 긴 표로 바꾸는 함수"""
+    index_columns = [c for c in gdf.columns if split_index_column(c)]
+    base_columns = [c for c in gdf.columns if c not in index_columns]
+    base = gdf[base_columns].copy()
+    base[ZONE_ID_COLUMN] = range(len(base))
+
+    sessions = sorted({split_index_column(c)[1] for c in index_columns})
+    frames = []
+    for session in sessions:
+        frame = base.copy()
+        for column in index_columns:
+            index_name, column_session = split_index_column(column)
+            if column_session == session:
+                frame[index_name] = gdf[column].values
+        frame['session'] = session
+        frames.append(frame)
+    if not frames:
+        return None
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry=gdf.geometry.name, crs=gdf.crs)
+
+
+def source_fingerprint(path):
+    """결과 GeoJSON의 (크기, 수정 시각) 지문을 반환하는 함수"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_field_partitions(gdf, field_code, dataset_folder=DEFAULT_DATASET_FOLDER, source_path=None):
+    """필드 하나의 구역 통계를 field_code/session으로 나눈 GeoParquet 파일들로 저장하는 함수
+
+    같은 필드의 이전 파티션은 지우고 다시 쓰므로, 재실행해도 결과가 중복되지 않습니다.
+    source_path(같은 내용의 결과 GeoJSON)를 넘기면 그 지문을 필드 폴더에 기록해,
+    GeoJSON이 나중에 다시 만들어지거나 수정되었는지 불러올 때 확인할 수 있게 합니다.
+    """
+    field_folder = os.path.join(dataset_folder, f"field_code={field_code}")
+    if os.path.exists(field_folder):
+        shutil.rmtree(field_folder)
+
+    long_gdf = to_long_format(gdf)
+    if long_gdf is None:
+        return 0
+
+    # 파티션 값은 폴더 이름으로 저장되므로 파일 안의 컬럼에서는 제외합니다.
+    long_gdf = long_gdf.drop(columns=[c for c in PARTITION_COLUMNS if c != 'session' and c in long_gdf.columns])
+    for session, part in long_gdf.groupby('session', sort=True):
+        session_folder = os.path.join(field_folder, f"session={session}")
+        os.makedirs(session_folder, exist_ok=True)
+        part.drop(columns=['session']).to_parquet(os.path.join(session_folder, 'part-0.parquet'), index=False)
+
+    if source_path is not None:
+        marker = {'field_code': str(field_code), 'geojson': os.path.basename(source_path),
+                  'fingerprint': source_fingerprint(source_path)}
+        with open(os.path.join(field_folder, SOURCE_MARKER), 'w', encoding='utf-8') as f:
+            json.dump(marker, f, ensure_ascii=False)
+    return long_gdf['session'].nunique()
+
+
+def read_partition_sources(dataset_folder=DEFAULT_DATASET_FOLDER):
+    """필드 파티션별 원본 기록을 {필드 폴더 경로: 기록 딕셔너리 또는 None(기록 없음)}으로 읽는 함수"""
+    sources = {}
+    for field_folder in glob.glob(os.path.join(dataset_folder, 'field_code=*')):
+        try:
+            with open(os.path.join(field_folder, SOURCE_MARKER), 'r', encoding='utf-8') as f:
+                sources[field_folder] = json.load(f)
+        except (OSError, ValueError):
+            sources[field_folder] = None
+    return sources
+
+
+def fresh_partition_fields(geojson_files, dataset_folder=DEFAULT_DATASET_FOLDER):
+    """GeoParquet 파티션이 현재 결과 GeoJSON과 같은 내용인 필드만 {GeoJSON 경로: field_code}로 반환하는 함수
+
+    파티션을 쓴 뒤 GeoJSON이 다시 만들어지거나 수정되었으면(지문이 다르면) 그 필드는 제외되므로,
+    불러오는 쪽에서는 제외된 필드만 GeoJSON에서 읽으면 됩니다.
+    """
+    by_name = {}
+    for source in read_partition_sources(dataset_folder).values():
+        if source is not None:
+            by_name[source['geojson']] = source
+    fresh = {}
+    for path in geojson_files:
+        source = by_name.get(os.path.basename(path))
+        if source is not None and source['fingerprint'] == source_fingerprint(path):
+            fresh[path] = source['field_code']
+    return fresh
+
+
+def remove_orphan_partitions(result_folder, dataset_folder=DEFAULT_DATASET_FOLDER):
+    """원본 결과 GeoJSON이 없어졌거나 원본 기록이 없는 필드 파티션을 지우는 함수 (지운 폴더 이름 목록 반환)"""
+    removed = []
+    for field_folder, source in read_partition_sources(dataset_folder).items():
+        if source is not None and os.path.exists(os.path.join(result_folder, source['geojson'])):
+            continue
+        shutil.rmtree(field_folder, ignore_errors=True)
+        removed.append(os.path.basename(field_folder))
+    return sorted(removed)
+
+
+def _dataset_crs(dataset):
+    """GeoParquet 메타데이터에서 geometry 컬럼의 CRS를 읽는 함수"""
+    metadata = dataset.schema.metadata or {}
+    geo = metadata.get(b'geo')
+    if not geo:
+        return None
+    geo = json.loads(geo)
+    crs = geo['columns'][geo.get('primary_column', 'geometry')].get('crs')
+    # PROJJSON 딕셔너리는 문자열로 넘겨야 pyproj가 PROJJSON으로 해석합니다.
+    return json.dumps(crs) if isinstance(crs, dict) else crs
+
+
+def _build_filter(filters):
+    """{'session': [1, 2], 'field_code': ['GJ-W1']} 형식의 조건을 pyarrow 필터 식으로 바꾸는 함수"""
+    expression = None
+    for column, values in (filters or {}).items():
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        condition = ds.field(column).isin(list(values))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_zonal_dataset(dataset_folder=DEFAULT_DATASET_FOLDER, indices=None, attributes=None,
+                       filters=None, geometry=False, wide=True):
+    """구역 통계 저장소에서 필요한 컬럼과 파티션만 읽는 함수
+
+    indices: 읽을 지수 이름 목록 (None이면 전체)
+    attributes: 함께 읽을 속성 컬럼 목록 (예: ['code', 'yield', 'protein'], None이면 전체)
+    filters: 파티션/컬럼 조건 (예: {'session': [1]}), 조건에 맞지 않는 파일은 읽지 않습니다.
+    wide=True면 기존 GeoJSON과 같은 {지수}_{회차} 형식으로 되돌려 반환합니다.
+    """
+    dataset = ds.dataset(dataset_folder, format='parquet', partitioning='hive')
+    available = dataset.schema.names
+    geometry_column = 'geometry'
+
+    index_columns = [c for c in (indices or INDEX_NAMES) if c in available]
+    if attributes is None:
+        attribute_columns = [c for c in available
+                             if c not in INDEX_NAMES and c not in PARTITION_COLUMNS
+                             and c not in (ZONE_ID_COLUMN, geometry_column)]
+    else:
+        attribute_columns = [c for c in attributes if c in available and c not in PARTITION_COLUMNS]
+    columns = PARTITION_COLUMNS + [ZONE_ID_COLUMN] + attribute_columns + index_columns
+    if geometry:
+        columns.append(geometry_column)
+
+    table = dataset.to_table(columns=columns, filter=_build_filter(filters))
+    df = table.to_pandas()
+    if geometry:
+        df[geometry_column] = gpd.GeoSeries.from_wkb(df[geometry_column])
+        df = gpd.GeoDataFrame(df, geometry=geometry_column, crs=_dataset_crs(dataset))
+
+    if not wide:
+        return df.sort_values(PARTITION_COLUMNS + [ZONE_ID_COLUMN]).reset_index(drop=True)
+
+    key = ['field_code', ZONE_ID_COLUMN]
+    base_columns = key + attribute_columns + ([geometry_column] if geometry else [])
+    base = df[base_columns].drop_duplicates(subset=key).set_index(key)
+
+    values = df.set_index(key + ['session'])[index_columns].unstack('session')
+    # 기존 GeoJSON과 같이 회차 순서, 회차 안에서는 지수 이름 순서로 컬럼을 배치합니다.
+    ordered = sorted(values.columns, key=lambda column: (column[1], column[0]))
+    values = values[ordered]
+    values.columns = [f"{index_name}_{session}" for index_name, session in ordered]
+
+    wide_df = base.join(values).sort_index().reset_index().drop(columns=[ZONE_ID_COLUMN])
+    if geometry:
+        wide_df = gpd.GeoDataFrame(wide_df, geometry=geometry_column, crs=df.crs)
+    return wide_df
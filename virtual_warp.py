@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import os
+import hashlib
+import contextlib
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+
+# 재투영 타일 캐시의 기본 전체 용량 한도(MB)
+DEFAULT_TILE_CACHE_MB = 256
+TILE_CACHE_VERSION = 1
+
+
+def needs_warp(source_crs, target_crs):
+    """원본 좌표계를 target_crs로 바꿔 읽어야 하는지 확인하는 함수 (좌표계 정보가 없으면 그대로 읽음)"""
+    if source_crs is None or target_crs is None:
+        return False
+    return CRS.from_user_input(source_crs) != CRS.from_user_input(target_crs)
+
+
+class TileCache:
+    """재투영된 윈도우를 .npy 파일로 보관하는 작은 디스크 캐시 클래스
+
+    같은 윈도우(예: 같은 필드를 다시 계산할 때의 구역 윈도우)는 다시 워프하지 않고 파일에서 읽습니다.
+    전체 용량이 max_size_mb를 넘으면 가장 오래 사용하지 않은 파일부터 지웁니다.
+    """
+
+    def __init__(self, folder, max_size_mb=DEFAULT_TILE_CACHE_MB):
+        self.folder = folder
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(folder, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(folder) if entry.name.endswith('.npy'))
+
+    def path_for(self, source_key, indexes, window):
+        """(원본/변환 조건, 밴드, 윈도우)에 해당하는 캐시 파일 경로를 만드는 함수"""
+        digest = hashlib.sha1(repr((TILE_CACHE_VERSION, source_key, indexes, window)).encode('utf-8'))
+        return os.path.join(self.folder, digest.hexdigest() + '.npy')
+
+    def get(self, path):
+        """캐시된 배열을 반환하는 함수 (없거나 읽을 수 없으면 None)"""
+        try:
+            data = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # 최근 사용 시각을 갱신해 삭제 순서를 뒤로 미룹니다.
+        except OSError:
+            pass
+        return data
+
+    def put(self, path, data):
+        """배열을 캐시에 저장하고 용량 한도를 넘으면 오래된 파일을 지우는 함수"""
+        tmp_path = path + f".{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, data, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"   [경고] 재투영 타일 캐시를 저장할 수 없습니다: {e}")
+            return
+        self._size += data.nbytes
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """용량 한도의 90% 아래가 될 때까지 가장 오래 사용하지 않은 캐시 파일을 지우는 함수"""
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                         for entry in os.scandir(self.folder) if entry.name.endswith('.npy'))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+
+class CachedWarpedRaster:
+    """WarpedVRT의 read()를 TileCache로 감싸는 클래스 (그 외 속성은 WarpedVRT 그대로 사용)
+
+    정수 픽셀 윈도우를 그대로 읽는 경우만 캐시하고, out_shape 등으로 축소해 읽는 경우는 바로 워프합니다.
+    """
+
+    def __init__(self, dataset, cache, source_key):
+        self._dataset = dataset
+        self._cache = cache
+        self._source_key = source_key
+
+    def __getattr__(self, name):
+        return getattr(self._dataset, name)
+
+    def read(self, indexes=None, window=None, **kwargs):
+        if window is None or kwargs:
+            return self._dataset.read(indexes, window=window, **kwargs)
+        window_key = (window.col_off, window.row_off, window.width, window.height)
+        if any(int(v) != v for v in window_key):
+            return self._dataset.read(indexes, window=window)
+
+        index_key = tuple(indexes) if isinstance(indexes, (list, tuple)) else indexes
+        path = self._cache.path_for(self._source_key, index_key, tuple(int(v) for v in window_key))
+        data = self._cache.get(path)
+        if data is None:
+            data = self._dataset.read(indexes, window=window)
+            self._cache.put(path, data)
+        return data
+
+
+def _source_key(raster_path, target_crs, resampling):
+    """원본 파일 지문과 변환 조건으로 타일 캐시 키를 만드는 함수 (원본이 바뀌면 캐시가 자동으로 무효화)"""
+    stat = os.stat(raster_path)
+    return (os.path.abspath(raster_path), stat.st_size, stat.st_mtime_ns, target_crs.to_wkt(), resampling)
+
+
+@contextlib.contextmanager
+def open_raster(raster_path, target_crs=None, resampling='nearest', tile_cache=None):
+    """래스터를 여는 함수 (target_crs가 원본과 다르면 재투영 사본 없이 읽는 윈도우만 즉석에서 재투영)
+
+    target_crs: 읽을 때 사용할 좌표계 (None이면 원본 그대로)
+    resampling: rasterio Resampling 이름 (1_1.reproject_rasters.py의 RESAMPLING과 같게 맞춤)
+    tile_cache: TileCache를 넘기면 워프한 윈도우를 디스크에 보관해 다시 읽을 때 재사용
+    반환되는 객체는 rasterio 데이터셋처럼 read/transform/crs/nodatavals/block_shapes를 제공합니다.
+    """
+    with rasterio.open(raster_path) as src:
+        if not needs_warp(src.crs, target_crs):
+            yield src
+            return
+
+        target_crs = CRS.from_user_input(target_crs)
+        options = {'crs': target_crs, 'resampling': Resampling[resampling]}
+        if src.nodata is None:
+            # nodata가 없는 래스터는 원본 범위 밖을 0 대신 NaN으로 채워 통계에 섞이지 않게 합니다.
+            # 정수형은 NaN을 담을 수 없으므로 float32로 워프합니다.
+            options['nodata'] = np.nan
+            if not np.issubdtype(np.dtype(src.dtypes[0]), np.floating):
+                options['dtype'] = 'float32'
+        with WarpedVRT(src, **options) as vrt:
+            if tile_cache is None:
+                yield vrt
+            else:
+                yield CachedWarpedRaster(vrt, tile_cache, _source_key(raster_path, target_crs, resampling))
+
+
+# 폴더별로 한 번만 만드는 타일 캐시 (프로세스마다 따로 보관)
+_TILE_CACHES = {}
+
+
+def shared_tile_cache(folder, max_size_mb=DEFAULT_TILE_CACHE_MB):
+    """폴더의 TileCache를 반환하는 함수 (folder가 None이면 캐시를 쓰지 않으므로 None)"""
+    if folder is None:
+        return None
+    if folder not in _TILE_CACHES:
+        _TILE_CACHES[folder] = TileCache(folder, max_size_mb)
+    return _TILE_CACHES[folder]
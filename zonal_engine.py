@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import math
+
+import numpy as np
+from rasterio import features
+from rasterio.windows import Window, from_bounds, transform as window_transform
+
+from raster_reader import DEFAULT_MEMORY_BUDGET_MB, clip_window, iter_band_stack_blocks, valid_mask
+
+# 계산할 수 있는 구역 통계 항목
+ZONAL_STATS = ('count', 'min', 'max', 'mean', 'std')
+
+# (도형 집합, 래스터 격자)별 구역 라벨 캐시와 최대 보관 개수
+# (보관하는 라벨 배열의 전체 크기는 호출 시의 memory_budget_mb를 넘지 않음)
+ZONE_LABEL_CACHE_SIZE = 32
+_ZONE_LABEL_CACHE = {}
+
+
+def _pixel_bbox(bounds, transform):
+    """지리 좌표 경계를 (시작 행, 시작 열, 끝 행, 끝 열) 픽셀 범위로 변환하는 함수 (1픽셀 여유 포함)"""
+    minx, miny, maxx, maxy = bounds
+    inverse = ~transform
+    cols, rows = zip(*[inverse * (x, y) for x, y in ((minx, miny), (minx, maxy), (maxx, miny), (maxx, maxy))])
+    return (int(math.floor(min(rows))) - 1, int(math.floor(min(cols))) - 1,
+            int(math.ceil(max(rows))) + 1, int(math.ceil(max(cols))) + 1)
+
+
+def _bbox_overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def assign_zone_layers(geometries, transform):
+    """all_touched 래스터화에서 픽셀을 공유할 수 있는 구역들을 서로 겹치지 않는 레이어로 나누는 함수
+
+    한 레이어 안의 구역들은 픽셀 범위가 겹치지 않으므로 하나의 라벨 배열로 래스터화해도
+    각 구역이 자신의 all_touched 픽셀을 모두 가집니다 (rasterstats와 동일한 결과).
+    """
+    layers = []
+    layer_bboxes = []
+    for zone_index, geometry in enumerate(geometries):
+        if geometry is None or geometry.is_empty:
+            continue
+        bbox = _pixel_bbox(geometry.bounds, transform)
+        for layer, bboxes in zip(layers, layer_bboxes):
+            if not any(_bbox_overlaps(bbox, other) for other in bboxes):
+                layer.append(zone_index)
+                bboxes.append(bbox)
+                break
+        else:
+            layers.append([zone_index])
+            layer_bboxes.append([bbox])
+    return layers
+
+
+def zones_bounds(geometries):
+    """모든 구역을 포함하는 (minx, miny, maxx, maxy) 범위를 반환하는 함수 (유효한 도형이 없으면 None)"""
+    valid = [g for g in geometries if g is not None and not g.is_empty]
+    if not valid:
+        return None
+    return (min(g.bounds[0] for g in valid), min(g.bounds[1] for g in valid),
+            max(g.bounds[2] for g in valid), max(g.bounds[3] for g in valid))
+
+
+def geometry_digest(geometries):
+    """구역 도형 집합을 구별하는 해시 문자열을 만드는 함수 (라벨 캐시 키에 사용)"""
+    digest = hashlib.sha1()
+    for geometry in geometries:
+        digest.update(b'' if geometry is None else geometry.wkb)
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+class ZoneGeometries(list):
+    """한 좌표계로 변환된 구역 도형 목록 (전체 범위와 도형 해시를 한 번만 계산해 보관)"""
+
+    def __init__(self, geometries):
+        super().__init__(geometries)
+        self.total_bounds = zones_bounds(self)
+        self.digest = geometry_digest(self)
+
+
+class ZoneSet:
+    """필드 하나의 구역 도형을 좌표계별로 한 번만 변환해 재사용하는 클래스
+
+    래스터마다 GeoDataFrame 전체를 to_crs로 변환하지 않고, 처음 보는 좌표계일 때만
+    도형(GeoSeries)을 변환해 범위/해시와 함께 캐시합니다.
+    """
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+        self._by_crs = {}
+
+    def __len__(self):
+        return len(self.geometry)
+
+    def in_crs(self, crs):
+        """crs 좌표계의 ZoneGeometries를 반환하는 함수 (래스터 좌표계가 없거나 같으면 변환하지 않음)
+
+        래스터에는 좌표계가 있는데 구역(GeoJSON)에 좌표계가 없으면, 잘못된 좌표로 모든 구역이
+        래스터 밖에 놓이지 않도록 기존 to_crs와 같이 ValueError를 발생시킵니다.
+        """
+        key = crs.to_wkt() if crs is not None else None
+        zones = self._by_crs.get(key)
+        if zones is None:
+            geometry = self.geometry
+            if crs is not None and geometry.crs is None:
+                raise ValueError("구역 GeoJSON에 좌표계(CRS) 정보가 없어 래스터 좌표계로 변환할 수 없습니다.")
+            if crs is not None and geometry.crs != crs:
+                geometry = geometry.to_crs(crs)
+            zones = self._by_crs[key] = ZoneGeometries(geometry)
+        return zones
+
+
+def zones_window(geometries, src):
+    """모든 구역을 포함하는 래스터 윈도우를 반환하는 함수 (없으면 None)
+
+    ZoneGeometries면 미리 계산한 전체 범위를 사용하므로 도형을 다시 훑지 않습니다.
+    """
+    bounds = geometries.total_bounds if isinstance(geometries, ZoneGeometries) else zones_bounds(geometries)
+    if bounds is None:
+        return None
+    window = from_bounds(*bounds, transform=src.transform)
+    return Window(window.col_off - 1, window.row_off - 1, window.width + 2, window.height + 2)
+
+
+def _zone_label_key(geometries, src, all_touched):
+    """구역 도형 집합과 래스터 격자(transform, 크기)로 라벨 캐시 키를 만드는 함수"""
+    digest = geometries.digest if isinstance(geometries, ZoneGeometries) else geometry_digest(geometries)
+    return digest, tuple(src.transform)[:6], src.width, src.height, all_touched
+
+
+class ZoneLabels:
+    """구역 윈도우의 레이어별 라벨 (라벨 0은 배경, 구역 i는 라벨 i + 1)
+
+    윈도우 전체 라벨 배열이 메모리 한도 안이면 한 번 래스터화해 보관하고, 한도를 넘으면
+    (큰 정사영상 모자이크 등) 배열을 보관하지 않고 읽는 블록마다 그 블록과 겹치는 구역만 래스터화합니다.
+    """
+
+    def __init__(self, geometries, src, window, all_touched, memory_budget_mb):
+        self.window = window
+        self.geometries = geometries
+        self.all_touched = all_touched
+        self.transform = src.transform
+        self.layers = assign_zone_layers(geometries, src.transform) if window is not None else []
+        self.dtype = 'uint16' if len(geometries) < np.iinfo('uint16').max else 'int32'
+        self.arrays = None
+
+        full_bytes = 0 if window is None else (
+            len(self.layers) * window.height * window.width * np.dtype(self.dtype).itemsize)
+        if window is not None and full_bytes <= memory_budget_mb * 1024 * 1024:
+            self.arrays = [self._rasterize(layer, window) for layer in self.layers]
+        else:
+            # 블록마다 겹치는 구역만 고를 수 있도록 구역별 픽셀 범위를 미리 계산해 둡니다.
+            self.bboxes = {i: _pixel_bbox(geometries[i].bounds, src.transform)
+                           for layer in self.layers for i in layer}
+
+    @property
+    def nbytes(self):
+        return sum(labels.nbytes for labels in self.arrays) if self.arrays is not None else 0
+
+    def _rasterize(self, zone_indexes, window):
+        return features.rasterize(
+            [(self.geometries[i], i + 1) for i in zone_indexes],
+            out_shape=(window.height, window.width), transform=window_transform(window, self.transform),
+            fill=0, all_touched=self.all_touched, dtype=self.dtype)
+
+    def for_block(self, block_window):
+        """블록 윈도우에 해당하는 레이어별 라벨 배열 목록을 반환하는 함수"""
+        if self.arrays is not None:
+            row_start = block_window.row_off - self.window.row_off
+            col_start = block_window.col_off - self.window.col_off
+            block_slice = (slice(row_start, row_start + block_window.height),
+                           slice(col_start, col_start + block_window.width))
+            return [labels[block_slice] for labels in self.arrays]
+
+        block_bbox = (block_window.row_off, block_window.col_off,
+                      block_window.row_off + block_window.height, block_window.col_off + block_window.width)
+        block_labels = []
+        for layer in self.layers:
+            zone_indexes = [i for i in layer if _bbox_overlaps(self.bboxes[i], block_bbox)]
+            if zone_indexes:
+                block_labels.append(self._rasterize(zone_indexes, block_window))
+        return block_labels
+
+
+def build_zone_labels(geometries, src, all_touched=True, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """구역 윈도우의 라벨(ZoneLabels)을 만들고 캐시하는 함수
+
+    같은 도형 집합과 같은 격자를 쓰는 래스터(예: 같은 회차의 6개 지수)는
+    래스터화를 다시 하지 않고 캐시된 라벨을 재사용합니다.
+    캐시에 보관하는 라벨 배열의 전체 크기는 memory_budget_mb를 넘지 않도록 오래된 항목부터 지웁니다.
+    """
+    key = _zone_label_key(geometries, src, all_touched)
+    cached = _ZONE_LABEL_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    window = zones_window(geometries, src)
+    if window is not None:
+        col_off, row_off, width, height = clip_window(src, window)
+        window = Window(col_off, row_off, width, height) if width and height else None
+    labels = ZoneLabels(geometries, src, window, all_touched, memory_budget_mb)
+
+    budget_bytes = memory_budget_mb * 1024 * 1024
+    while _ZONE_LABEL_CACHE and (len(_ZONE_LABEL_CACHE) >= ZONE_LABEL_CACHE_SIZE or
+                                 sum(c.nbytes for c in _ZONE_LABEL_CACHE.values()) + labels.nbytes > budget_bytes):
+        _ZONE_LABEL_CACHE.pop(next(iter(_ZONE_LABEL_CACHE)))
+    _ZONE_LABEL_CACHE[key] = labels
+    return labels
+
+
+def clear_zone_label_cache():
+    """구역 라벨 캐시를 비우는 함수 (필드 하나를 다 계산한 뒤 라벨 배열을 메모리에서 내림)"""
+    _ZONE_LABEL_CACHE.clear()
+
+
+def zonal_statistics(geometries, src, band=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, all_touched=True,
+                     stats=ZONAL_STATS):
+    """구역(폴리곤)별 count/min/max/mean/std를 한 번의 블록 순회로 계산하는 함수
+
+    구역 라벨은 build_zone_labels로 한 번만 래스터화하고, 각 블록에서 bincount로
+    모든 구역의 합계/제곱합/픽셀 수를 동시에 누적합니다.
+    rasterstats.zonal_stats와 같은 형식([{'count': ..., 'mean': ...}, ...])으로 반환하며,
+    유효 픽셀이 없는 구역의 통계값은 None입니다 (count는 0).
+    """
+    return zonal_statistics_bands(geometries, src, [band], memory_budget_mb, all_touched, stats)[0]
+
+
+def zonal_statistics_bands(geometries, src, bands, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, all_touched=True,
+                           stats=ZONAL_STATS):
+    """여러 밴드(예: 지수 스택)의 구역 통계를 블록마다 한 번의 읽기로 함께 계산하는 함수
+
+    반환값은 bands 순서대로 zonal_statistics와 같은 형식의 결과 목록입니다.
+    """
+    if not isinstance(geometries, ZoneGeometries):
+        geometries = ZoneGeometries(geometries)
+    bands = list(bands)
+    n_bands = len(bands)
+    n_labels = len(geometries) + 1
+    need_minmax = 'min' in stats or 'max' in stats
+    need_std = 'std' in stats
+
+    counts = np.zeros((n_bands, n_labels), dtype='int64')
+    sums = np.zeros((n_bands, n_labels), dtype='float64')
+    sums_sq = np.zeros((n_bands, n_labels), dtype='float64') if need_std else None
+    mins = np.full((n_bands, n_labels), np.inf) if need_minmax else None
+    maxs = np.full((n_bands, n_labels), -np.inf) if need_minmax else None
+
+    label_set = build_zone_labels(geometries, src, all_touched, memory_budget_mb)
+    nodatas = [src.nodatavals[band - 1] for band in bands]
+
+    if label_set.layers:
+        for block_window, block in iter_band_stack_blocks(src, bands, memory_budget_mb, label_set.window):
+            block_labels = label_set.for_block(block_window)
+
+            for k, data in enumerate(block):
+                mask = valid_mask(data, nodatas[k])
+                if not mask.any():
+                    continue
+                values = data[mask].astype('float64', copy=False)
+
+                for labels in block_labels:
+                    zone_labels = labels[mask]
+                    counts[k] += np.bincount(zone_labels, minlength=n_labels)
+                    sums[k] += np.bincount(zone_labels, weights=values, minlength=n_labels)
+                    if need_std:
+                        sums_sq[k] += np.bincount(zone_labels, weights=values * values, minlength=n_labels)
+                    if need_minmax:
+                        np.minimum.at(mins[k], zone_labels, values)
+                        np.maximum.at(maxs[k], zone_labels, values)
+
+    band_results = []
+    for k in range(n_bands):
+        results = []
+        for i in range(1, n_labels):
+            count = int(counts[k, i])
+            zone_stats = {}
+            for stat in stats:
+                if stat == 'count':
+                    zone_stats['count'] = count
+                elif count == 0:
+                    zone_stats[stat] = None
+                elif stat == 'mean':
+                    zone_stats['mean'] = float(sums[k, i] / count)
+                elif stat == 'min':
+                    zone_stats['min'] = float(mins[k, i])
+                elif stat == 'max':
+                    zone_stats['max'] = float(maxs[k, i])
+                elif stat == 'std':
+                    # 모집단 표준편차 (rasterstats/np.std와 동일, 음수 오차는 0으로 보정)
+                    mean = sums[k, i] / count
+                    zone_stats['std'] = float(np.sqrt(max(sums_sq[k, i] / count - mean * mean, 0.0)))
+            results.append(zone_stats)
+        band_results.append(results)
+    return band_results